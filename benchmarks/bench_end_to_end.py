@@ -0,0 +1,359 @@
+"""End-to-end throughput and peak memory of the pipeline stages on synthetic data from
+`benchmarks.synthetic_data`, compared to a stored baseline.
+
+Stages, each step runs in its own process from the generated `run` folder:
+    amazon:  amazon_parsing, hashing, intermediate_writing
+    pdfs:    pdf_extraction, pdf_parsing, export_parsing
+    loading: loading, dwh_refresh (only with --load)
+
+Every step runs `--repeat` times and the fastest run of each stage is reported. Peak
+RSS is the maximum resident memory of the step's process up to the end of the stage.
+
+`--load` runs `init_db(full_reload=True)` and all ingestors against the database of the
+environment variables of `.env.sh`, which drops its data, so point them at a scratch
+database. A stage whose throughput drops or whose peak RSS grows by more than
+`--tolerance` against the baseline is reported as a regression and the exit code is 1.
+
+Run from the repository root:
+    python -m benchmarks.bench_end_to_end --scale 2 --load --save-baseline
+    python -m benchmarks.bench_end_to_end --scale 2 --load
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import List
+
+from ingestors.metrics import peak_rss_bytes
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(
+    REPOSITORY_ROOT, "benchmarks", "baseline_end_to_end.json"
+)
+STEPS = ["amazon", "pdfs", "loading"]
+
+
+@contextmanager
+def measure(stages: List[dict], name: str, unit: str):
+    """Times the block and records its `units` (set by the block), throughput and the
+    peak RSS of the process at its end.
+    """
+    stage = {"stage": name, "unit": unit, "units": 0}
+    start = time.perf_counter()
+    yield stage
+    stage["seconds"] = time.perf_counter() - start
+    stage["throughput"] = stage["units"] / max(stage["seconds"], 1e-9)
+    stage["peak_rss_mb"] = peak_rss_bytes() / 2**20
+    stages.append(stage)
+
+
+def run_amazon_step() -> List[dict]:
+    """Parses the settlement reports, hashes and writes the rows like
+    `scripts/amazon_raw_sales_data.py`.
+    """
+    from database.tables import AmazonSalesTable
+    from scripts.amazon_raw_sales_data import (
+        concat_sales_data,
+        hash_sales_data,
+        parse_sales_data_from_amazon_csvs,
+    )
+    from utils.intermediate_files import write_intermediate
+
+    stages = []
+    with measure(stages, "amazon_parsing", "rows") as stage:
+        country_data = parse_sales_data_from_amazon_csvs()
+        data = concat_sales_data(
+            [data["all_data"] for data in country_data.values()], ignore_index=True
+        )
+        del country_data
+        stage["units"] = len(data)
+    with measure(stages, "hashing", "rows") as stage:
+        data["hash_id"] = hash_sales_data(data)
+        stage["units"] = len(data)
+    with measure(stages, "intermediate_writing", "rows") as stage:
+        write_intermediate(
+            data,
+            os.path.join("data", "amazon_sales", "all_sales_data_combined"),
+            [AmazonSalesTable],
+        )
+        stage["units"] = len(data)
+    return stages
+
+
+def run_pdfs_step() -> List[dict]:
+    """Extracts the text of all PDFs, parses the invoice tables from it and cleans the
+    monthly exports like `scripts/external_invoices_reimbursements.py`.
+    """
+    from scripts.external_invoices_reimbursements import (
+        INVOICES_DIR,
+        add_metadata_to_extracted_data,
+        extract_text_from_pdfs,
+        get_invoice_reimbursement_table_from_extracted_text,
+        parse_external_invoices_folder,
+        parse_invoice_reimbursement_info_from_filename,
+        parse_monthly_parent_folder,
+        save_combined_pdf_data,
+    )
+
+    folders = parse_external_invoices_folder()
+    pdf_files = [
+        (folder_name, file_name)
+        for folder_name, metadata in folders.items()
+        if "RE" in folder_name or "GS" in folder_name
+        for file_name in sorted(metadata["files"])
+        if file_name.lower().endswith(".pdf")
+    ]
+    stages = []
+    with measure(stages, "pdf_extraction", "pdfs") as stage:
+        pdf_texts = [
+            list(
+                extract_text_from_pdfs(
+                    os.path.join(INVOICES_DIR, folder_name, file_name)
+                )
+            )
+            for folder_name, file_name in pdf_files
+        ]
+        stage["units"] = len(pdf_files)
+    with measure(stages, "pdf_parsing", "pdfs") as stage:
+        folder_pdfs = {}
+        for (folder_name, file_name), lines in zip(pdf_files, pdf_texts):
+            extracted_data = get_invoice_reimbursement_table_from_extracted_text(
+                file_name, lines
+            )
+            table_data = add_metadata_to_extracted_data(
+                extracted_data,
+                parse_invoice_reimbursement_info_from_filename(folder_name, file_name),
+                folder_name,
+                file_name,
+            )
+            folder_pdfs.setdefault(folder_name, []).append((table_data, lines))
+        for folder_name, parsed_pdfs in folder_pdfs.items():
+            os.makedirs(
+                os.path.join("data", "external_invoices", folder_name), exist_ok=True
+            )
+            save_combined_pdf_data(folder_name, parsed_pdfs)
+        stage["units"] = len(pdf_files)
+    with measure(stages, "export_parsing", "files") as stage:
+        for folder_name, metadata in folders.items():
+            if folder_name and "RE" not in folder_name and "GS" not in folder_name:
+                parse_monthly_parent_folder(folder_name, metadata["files"])
+                stage["units"] += len(metadata["files"])
+    return stages
+
+
+def _count_rows(schema: str) -> int:
+    from sqlalchemy import text
+
+    from database.base import Base, engine
+
+    with engine.connect() as connection:
+        return sum(
+            connection.execute(
+                text(f"SELECT count(*) FROM {table.schema}.{table.name}")
+            ).scalar()
+            for table in Base.metadata.sorted_tables
+            if table.schema == schema
+        )
+
+
+def run_loading_step() -> List[dict]:
+    """Loads all intermediates into a freshly initialised database and refreshes the
+    star schema, like `entry_point.py --full-reload --max-concurrency 1`.
+    """
+    import logging
+
+    from entry_point import get_ingestion_tasks
+    from ingestors.scheduler import TaskStatus, run_tasks
+    from transformations.dwh_refresh import refresh_dwh
+    from definitions.schemas import Schemas
+
+    logging.getLogger().setLevel(logging.WARNING)
+    *ingestion_tasks, _ = get_ingestion_tasks(full_reload=True)
+    stages = []
+    with measure(stages, "loading", "rows") as stage:
+        results = run_tasks(ingestion_tasks, max_concurrency=1)
+        failed = [
+            name
+            for name, result in results.items()
+            if result.status != TaskStatus.succeeded
+        ]
+        if failed:
+            raise Exception(f"Ingestion did not complete for: {failed}")
+        stage["units"] = _count_rows(Schemas.RAW.value)
+    with measure(stages, "dwh_refresh", "rows") as stage:
+        refresh_dwh()
+        stage["units"] = _count_rows(Schemas.DWH.value)
+    return stages
+
+
+STEP_FUNCTIONS = {
+    "amazon": run_amazon_step,
+    "pdfs": run_pdfs_step,
+    "loading": run_loading_step,
+}
+
+
+def run_step_in_process(step: str, run_dir: str) -> List[dict]:
+    """Runs a step in a new interpreter started in `run_dir`, as the scripts resolve
+    their input folders from the working directory when they are imported.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".json") as results_file:
+        python_path = os.environ.get("PYTHONPATH")
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.bench_end_to_end",
+                "--step",
+                step,
+                "--step-results",
+                results_file.name,
+            ],
+            cwd=run_dir,
+            env={
+                **os.environ,
+                "PYTHONPATH": os.pathsep.join(
+                    filter(None, [REPOSITORY_ROOT, python_path])
+                ),
+            },
+            check=True,
+        )
+        with open(results_file.name) as file:
+            return json.load(file)
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Prints every stage next to its baseline and returns the regressed stages."""
+    baseline_stages = {stage["stage"]: stage for stage in baseline["stages"]}
+    regressions = []
+    print(
+        f"\n{'stage':<22}{'throughput':>16}{'baseline':>16}{'change':>9}"
+        f"{'peak RSS':>12}{'baseline':>11}{'change':>9}"
+    )
+    for stage in results["stages"]:
+        base = baseline_stages.get(stage["stage"])
+        if base is None:
+            print(f"{stage['stage']:<22} not in the baseline")
+            continue
+        throughput_change = stage["throughput"] / base["throughput"] - 1
+        rss_change = stage["peak_rss_mb"] / base["peak_rss_mb"] - 1
+        regressed = throughput_change < -tolerance or rss_change > tolerance
+        if regressed:
+            regressions.append(stage["stage"])
+        print(
+            f"{stage['stage']:<22}{stage['throughput']:>11.1f} {stage['unit']:<4}/s"
+            f"{base['throughput']:>12.1f}/s{throughput_change:>+9.0%}"
+            f"{stage['peak_rss_mb']:>10.0f}MB{base['peak_rss_mb']:>9.0f}MB"
+            f"{rss_change:>+9.0%}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--output", help="Folder for the synthetic data, a temporary one by default."
+    )
+    parser.add_argument(
+        "--load",
+        action="store_true",
+        help="Also load the data into the database of .env.sh, drops its data.",
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the new baseline instead of comparing to it.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Relative throughput drop or peak RSS growth reported as regression.",
+    )
+    parser.add_argument("--step", choices=STEPS, help=argparse.SUPPRESS)
+    parser.add_argument("--step-results", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step:
+        with open(args.step_results, "w") as file:
+            json.dump(STEP_FUNCTIONS[args.step](), file)
+        return
+
+    from benchmarks.synthetic_data import RUN_DIR, SyntheticScale, generate
+
+    output = args.output or tempfile.mkdtemp(prefix="bench_end_to_end_")
+    scale = SyntheticScale(months=args.months).scaled(args.scale)
+    parameters = {**asdict(scale), "seed": args.seed}
+    try:
+        start = time.perf_counter()
+        counts = generate(output, scale, args.seed)
+        print(f"Generated {counts} in {time.perf_counter() - start:.1f}s: {output}")
+        stages = []
+        for step in STEPS:
+            if step == "loading" and not args.load:
+                continue
+            runs = [
+                run_step_in_process(step, os.path.join(output, RUN_DIR))
+                for _ in range(args.repeat)
+            ]
+            for stage_runs in zip(*runs):
+                stages.append(min(stage_runs, key=lambda stage: stage["seconds"]))
+    finally:
+        if not args.output:
+            shutil.rmtree(output)
+
+    results = {
+        "parameters": parameters,
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "stages": stages,
+    }
+    print(
+        f"\n{'stage':<22}{'units':>10}{'seconds':>10}{'throughput':>16}{'peak RSS':>12}"
+    )
+    for stage in stages:
+        print(
+            f"{stage['stage']:<22}{stage['units']:>10}{stage['seconds']:>10.2f}"
+            f"{stage['throughput']:>11.1f} {stage['unit']:<4}/s"
+            f"{stage['peak_rss_mb']:>10.0f}MB"
+        )
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nSaved baseline: {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, store one with --save-baseline.")
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline["parameters"] != parameters:
+        print(
+            f"\nBaseline was measured with other parameters, not comparing: "
+            f"{baseline['parameters']}"
+        )
+        return
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegressed by more than {args.tolerance:.0%}: {regressions}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
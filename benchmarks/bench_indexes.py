@@ -0,0 +1,169 @@
+"""Query plans of the dashboard filters and joins with and without the indexes declared
+on the models in `database.tables`.
+
+The raw tables are copied with their indexes (`CREATE TABLE ... (LIKE ... INCLUDING
+INDEXES)`) into a scratch schema and filled with generated rows. Every query is run
+with `EXPLAIN ANALYZE` once with index scans disabled, i.e. the plan before the
+indexes existed, and once with them enabled. The scratch schema is dropped at the end.
+
+Needs the database environment variables of `.env.sh`. Run from the repository root:
+    python -m benchmarks.bench_indexes --rows 1000000
+"""
+import re
+import argparse
+
+from sqlalchemy import text
+
+from database.base import engine
+from database.db import init_db
+
+BENCH_SCHEMA = "bench_indexes"
+TABLES = ["amazon_sales_data", "external_invoices", "external_invoice_headers"]
+DISABLE_INDEXES = ["enable_indexscan", "enable_bitmapscan", "enable_indexonlyscan"]
+
+QUERIES = {
+    "amazon sales of a week": f"""
+        SELECT count(*), sum(total_price) FROM {BENCH_SCHEMA}.amazon_sales_data
+        WHERE date_time >= '2021-03-01' AND date_time < '2021-03-08'""",
+    "amazon sales of a SKU": f"""
+        SELECT * FROM {BENCH_SCHEMA}.amazon_sales_data WHERE sku = 'SKU-42'""",
+    "amazon sales of an order": f"""
+        SELECT * FROM {BENCH_SCHEMA}.amazon_sales_data
+        WHERE order_id = '302-0004242-0004242'""",
+    "amazon SKU totals of a country and month": f"""
+        SELECT sku, sum(quantity), sum(total_price)
+        FROM {BENCH_SCHEMA}.amazon_sales_data
+        WHERE country_code = 'FR' AND date_time >= '2021-03-01'
+            AND date_time < '2021-04-01'
+        GROUP BY sku""",
+    "amazon rows inserted in an hour": f"""
+        SELECT count(*) FROM {BENCH_SCHEMA}.amazon_sales_data
+        WHERE date_inserted >= '2022-01-02' AND date_inserted < '2022-01-02 01:00'""",
+    "invoice with its PDF header": f"""
+        SELECT i.invoice_number, i.total, h.net_total, h.vat_amount
+        FROM {BENCH_SCHEMA}.external_invoices i
+        JOIN {BENCH_SCHEMA}.external_invoice_headers h
+            ON h.order_number = i.order_number
+        WHERE i.order_number = 'AU4242'""",
+}
+
+
+def create_bench_tables(connection, rows: int):
+    connection.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+    connection.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+    for table in TABLES:
+        connection.execute(
+            f"CREATE TABLE {BENCH_SCHEMA}.{table} (LIKE raw.{table} INCLUDING INDEXES)"
+        )
+
+    # date_inserted grows with the row number like in the append only raw tables.
+    connection.execute(
+        text(
+            f"""
+        INSERT INTO {BENCH_SCHEMA}.amazon_sales_data (
+            unique_id, hash_id, date_time, settlement_id, type, order_id, sku,
+            quantity, total_price, marketplace, fulfilment, country_code, currency,
+            source_file, date_inserted
+        )
+        SELECT
+            i, i, timestamp '2020-01-01' + random() * interval '1000 days',
+            (i / 5000)::text, (ARRAY['Order', 'Refund', 'Transfer'])[1 + i % 3],
+            format('302-%s-%s', lpad((i % 500000)::text, 7, '0'),
+                lpad((i % 500000)::text, 7, '0')),
+            'SKU-' || (i % 2000), 1 + i % 3, round((random() * 200)::numeric, 2),
+            'amazon', 'Amazon', (ARRAY['DE', 'FR', 'IT', 'ES', 'UK'])[1 + i % 5],
+            'EUR', 'report.csv', timestamp '2022-01-01' + i * interval '1 second'
+        FROM generate_series(1, {rows}) AS i
+        """
+        )
+    )
+    connection.execute(
+        text(
+            f"""
+        INSERT INTO {BENCH_SCHEMA}.external_invoices (
+            unique_id, hash_id, invoice_number, order_number, total,
+            invoice_create_date, date_inserted
+        )
+        SELECT
+            i, i, 'RE' || lpad(i::text, 6, '0'), 'AU' || i,
+            round((random() * 500)::numeric, 2),
+            date '2020-01-01' + i / 100, timestamp '2022-01-01' + i * interval '1 second'
+        FROM generate_series(1, {rows // 10}) AS i
+        """
+        )
+    )
+    connection.execute(
+        text(
+            f"""
+        INSERT INTO {BENCH_SCHEMA}.external_invoice_headers (
+            unique_id, internal_id, invoice_number, order_number, net_total,
+            vat_amount, date_inserted
+        )
+        SELECT
+            i, i, 'RE' || lpad(i::text, 6, '0'), 'AU' || i,
+            round((random() * 400)::numeric, 2), round((random() * 80)::numeric, 2),
+            timestamp '2022-01-01' + i * interval '1 second'
+        FROM generate_series(1, {rows // 10}) AS i
+        """
+        )
+    )
+    # index only scans need an up to date visibility map.
+    for table in TABLES:
+        connection.execute(f"VACUUM ANALYZE {BENCH_SCHEMA}.{table}")
+
+
+def explain(connection, query: str, use_indexes: bool):
+    if not use_indexes:
+        for setting in DISABLE_INDEXES:
+            connection.execute(f"SET {setting} = off")
+    try:
+        plan = [
+            line
+            for (line,) in connection.execute(
+                text(f"EXPLAIN (ANALYZE, BUFFERS) {query}")
+            )
+        ]
+    finally:
+        for setting in DISABLE_INDEXES:
+            connection.execute(f"RESET {setting}")
+    execution_ms = float(re.search(r"([0-9.]+) ms", plan[-1]).group(1))
+    return plan, execution_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument(
+        "--keep", action="store_true", help=f"Keep the {BENCH_SCHEMA} schema."
+    )
+    args = parser.parse_args()
+
+    init_db()
+    connection = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        create_bench_tables(connection, args.rows)
+        summary = []
+        for name, query in QUERIES.items():
+            print(f"\n=== {name} ===")
+            results = {}
+            for label, use_indexes in (("before", False), ("after", True)):
+                plan, execution_ms = explain(connection, query, use_indexes)
+                results[label] = execution_ms
+                print(f"--- {label} ---")
+                print("\n".join(plan))
+            summary.append((name, results["before"], results["after"]))
+
+        print(f"\nrows: {args.rows}")
+        for name, before, after in summary:
+            print(
+                f"{name:<45} {before:10.2f}ms {after:10.2f}ms "
+                f"{before / max(after, 1e-3):8.1f}x"
+            )
+    finally:
+        if not args.keep:
+            connection.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Size and read time of the Amazon sales hand-off file as CSV and as Parquet typed
+with the schema of `AmazonSalesTable`, read back with the ingestor's column projection.
+
+Run from the repository root:
+    python -m benchmarks.bench_intermediates --rows 500000
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from benchmarks.bench_row_hashing import make_sales_like_frame
+from database.tables import AmazonSalesTable
+from utils.common import create_int_hash_from_df
+from utils.intermediate_files import (
+    INTERMEDIATE_FORMATS,
+    read_intermediate,
+    write_intermediate,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_sales_like_frame(args.rows)
+    df["date_time"] = df["date_time"].dt.tz_localize("UTC")
+    df["hash_id"] = create_int_hash_from_df(df)
+    table_columns = [c.name for c in AmazonSalesTable.__table__.columns]
+
+    print(f"rows: {args.rows}")
+    with tempfile.TemporaryDirectory() as folder:
+        for file_format in INTERMEDIATE_FORMATS:
+            start = time.perf_counter()
+            path = write_intermediate(
+                df,
+                os.path.join(folder, f"all_sales_data_combined_{file_format}"),
+                [AmazonSalesTable],
+                file_format,
+            )
+            write_seconds = time.perf_counter() - start
+            read_seconds = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                read_intermediate(path, columns=table_columns)
+                read_seconds.append(time.perf_counter() - start)
+            print(
+                f"{file_format:<8} {os.path.getsize(path) / 2**20:8.1f}MB "
+                f"write {write_seconds:6.2f}s read {min(read_seconds):6.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Microbenchmark of the invoice table line matching: the previous sequence of up to
+seven `match` + `findall` calls per line against `classify_invoice_table_line`.
+
+Both are also checked to take the same parser action on every benchmarked line.
+
+Run from the repository root:
+    python -m benchmarks.bench_invoice_line_classifier --lines 200000
+"""
+import argparse
+import random
+import time
+
+from scripts.constants import (
+    standard_row_all_7_columns_regx,
+    incomplete_row_4_columns_regx,
+    only_article_or_description_in_row_regx,
+    neither_article_nor_description_in_row_regx,
+    remaining_description_row_regx,
+    incomplete_row_last_3_columns_regx,
+    invoice_net_total_regx,
+)
+from scripts.external_invoices_reimbursements import classify_invoice_table_line
+
+TABLE_LINES = [
+    "1 1 stk 12345-12-12 Description of some item 050x100 cm 19% 1,11 1,11",
+    "2 1 stk H12345 Other description 100x100 cm rund 19% 2,00 2,00",
+    "3 1 Versand GLS-DB 19% 10,00 10,00",
+    "4 1 stk 12345-05-06 A very long description of some item",
+    "which extends to next line 100x100 cm",
+    "19% 88,88 88,88",
+    "5 1 19% 0,00 0,00",
+    "6 1 Versand 19% 10,00 10,00",
+    "7 2 stück 54321-01-02 Läufer Vintage 19,00% -1.234,56 -2.469,12",
+    "Gesamt Netto (19,00%) € 111,99 (19,00%)",
+    "Ihre Ust-ID: DE310123456",
+]
+
+
+def legacy_table_line_action(row: str, is_invoice_item_complete: bool):
+    """The matching done per line by the table parser before the classifier."""
+    if standard_row_all_7_columns_regx.match(row):
+        return "standard", standard_row_all_7_columns_regx.findall(row)[0]
+    incomplete = None
+    if incomplete_row_4_columns_regx.match(row):
+        incomplete = incomplete_row_4_columns_regx.findall(row)[0]
+        is_invoice_item_complete = False
+    if not is_invoice_item_complete:
+        if (
+            remaining_description_row_regx.match(row)
+            and not incomplete_row_4_columns_regx.match(row)
+            and not incomplete_row_last_3_columns_regx.match(row)
+        ):
+            return "remaining_description", incomplete
+        if incomplete_row_last_3_columns_regx.match(row):
+            return "last_3_columns", incomplete_row_last_3_columns_regx.findall(row)[0]
+    if neither_article_nor_description_in_row_regx.match(row):
+        return (
+            "neither_article_nor_description",
+            neither_article_nor_description_in_row_regx.findall(row)[0],
+        )
+    if only_article_or_description_in_row_regx.match(row):
+        return (
+            "only_article_or_description",
+            only_article_or_description_in_row_regx.findall(row)[0],
+        )
+    if invoice_net_total_regx.match(row):
+        return "net_total", invoice_net_total_regx.findall(row)[0]
+    return None, incomplete
+
+
+def table_line_action(row: str, is_invoice_item_complete: bool):
+    line = classify_invoice_table_line(row)
+    if line.standard:
+        return "standard", line.standard
+    if line.incomplete:
+        is_invoice_item_complete = False
+    if not is_invoice_item_complete:
+        if line.remaining_description:
+            return "remaining_description", line.incomplete
+        if line.last_3_columns:
+            return "last_3_columns", line.last_3_columns
+    if line.neither_article_nor_description:
+        return "neither_article_nor_description", line.neither_article_nor_description
+    if line.only_article_or_description:
+        return "only_article_or_description", line.only_article_or_description
+    if line.net_total:
+        return "net_total", line.net_total
+    return None, line.incomplete
+
+
+def make_lines(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = ["Teppich", "Läufer", "rund", "Wolle", "Vintage", "grau", "cm", "x"]
+    lines = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            lines.append(rng.choice(TABLE_LINES))
+        else:
+            description = " ".join(rng.choice(words) for _ in range(rng.randint(2, 40)))
+            lines.append(
+                f"{rng.randint(1, 99)} {rng.randint(1, 9)} stk "
+                f"{rng.randint(10000, 99999)}-01-02 {description} "
+                f"19% {rng.randint(1, 999)},{rng.randint(10, 99)} "
+                f"{rng.randint(1, 999)},{rng.randint(10, 99)}"
+            )
+    return lines
+
+
+def lines_per_second(function, lines):
+    start = time.perf_counter()
+    for row in lines:
+        function(row, False)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000)
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines)
+    for row in set(lines):
+        for is_invoice_item_complete in (False, True):
+            assert legacy_table_line_action(
+                row, is_invoice_item_complete
+            ) == table_line_action(row, is_invoice_item_complete), row
+
+    before = lines_per_second(legacy_table_line_action, lines)
+    after = lines_per_second(table_line_action, lines)
+    print(f"lines: {len(lines)}")
+    print(f"match + findall per pattern:  {before:12,.0f} lines/s")
+    print(
+        f"classify_invoice_table_line:  {after:12,.0f} lines/s ({after / before:.1f}x)"
+    )
+
+    print("worst case scaling, seconds per line without a VAT column:")
+    for length in (1_000, 10_000, 100_000):
+        row = "1 1 stk H12345 " + "x 1,00 " * (length // 7)
+        start = time.perf_counter()
+        table_line_action(row, False)
+        print(f"  {len(row):>7} chars: {time.perf_counter() - start:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Microbenchmark of the order number extraction from PDF filenames: the previous
+`match` + `findall` per platform pattern against the single search of
+`extract_order_number` and the vectorized `extract_order_numbers`.
+
+All three are also checked to find the same order number in every filename.
+
+Run from the repository root:
+    python -m benchmarks.bench_order_numbers --filenames 500000
+"""
+import re
+import time
+import random
+import argparse
+
+import pandas as pd
+
+from utils.order_numbers import (
+    ORDER_NUMBER_PATTERNS,
+    extract_order_number,
+    extract_order_numbers,
+)
+
+# the patterns tried in turn for a filename before the single extractor.
+LEGACY_ORDER_NUMBER_REGXS = [
+    re.compile(rf"^(?:.*)?({ORDER_NUMBER_PATTERNS[platform]})")
+    for platform in ("amazon", "ebay", "shopify", "au")
+]
+
+
+def legacy_order_number(pdf_filename: str):
+    for regx in LEGACY_ORDER_NUMBER_REGXS:
+        if regx.match(pdf_filename):
+            return regx.findall(pdf_filename)[0]
+    return None
+
+
+def make_filenames(count: int, seed: int = 0):
+    rng = random.Random(seed)
+
+    def digits(length: int) -> str:
+        return "".join(rng.choice("0123456789") for _ in range(length))
+
+    order_numbers = [
+        lambda: f"AMZ-ADA-{digits(3)}-{digits(7)}-{digits(7)}",
+        lambda: f"EBAY-DE-ADA-{digits(2)}-{digits(5)}-{digits(5)}",
+        lambda: f"SHOPIFY-ADA-{digits(13)}",
+        lambda: f"AU{digits(rng.choice((4, 5)))}",
+        lambda: "Kopie",
+    ]
+    return [
+        f"2021{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}_"
+        f"{rng.choice(('RE', 'GS'))}{digits(6)}_{rng.choice(order_numbers)()}.pdf"
+        for _ in range(count)
+    ]
+
+
+def seconds(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filenames", type=int, default=200_000)
+    args = parser.parse_args()
+
+    filenames = make_filenames(args.filenames)
+    before, legacy = seconds(lambda: [legacy_order_number(f) for f in filenames])
+    single, extracted = seconds(lambda: [extract_order_number(f)[0] for f in filenames])
+    vectorized, frame = seconds(extract_order_numbers, pd.Series(filenames))
+    vectorized_order_numbers = frame["order_number"].tolist()
+    assert legacy == extracted == vectorized_order_numbers
+
+    print(f"filenames: {len(filenames)}")
+    for name, duration in [
+        ("match + findall per pattern", before),
+        ("extract_order_number", single),
+        ("extract_order_numbers", vectorized),
+    ]:
+        print(
+            f"{name:<28} {len(filenames) / duration:12,.0f} filenames/s "
+            f"({before / duration:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
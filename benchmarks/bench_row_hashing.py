@@ -0,0 +1,75 @@
+"""Benchmark of the per-row `create_int_hash_from_df_row` against the batched
+`create_int_hash_from_df` on a frame shaped like `all_sales_data_combined`.
+
+Run from the repository root:
+    python -m benchmarks.bench_row_hashing --rows 200000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.common import create_int_hash_from_df, create_int_hash_from_df_row
+
+
+def make_sales_like_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "date_time_original": rng.integers(1, 28, rows).astype(str),
+            "date_time": pd.Timestamp("2021-01-01")
+            + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, rows), unit="s"),
+            "settlement_id": rng.integers(10**9, 10**10, rows).astype(str),
+            "type": rng.choice(["Order", "Refund", "Transfer"], rows),
+            "order_id": [f"{i:03d}-{i * 7:07d}-{i * 13:07d}" for i in range(rows)],
+            "sku": rng.choice([f"SKU-{i}" for i in range(500)], rows),
+            "quantity": rng.integers(0, 5, rows),
+            "total_price": rng.normal(50, 20, rows).round(2),
+            "marketplace": rng.choice(["amazon.de", "amazon.fr", "amazon.it"], rows),
+            "fulfilment": rng.choice(["Amazon", "Seller"], rows),
+            "source_file": rng.choice(
+                ["2021Jan1-2021Dec31CustomTransaction.csv"], rows
+            ),
+            "country_code": rng.choice(["DE", "FR", "IT"], rows),
+        }
+    )
+
+
+def time_it(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    df = make_sales_like_frame(args.rows)
+
+    per_row, per_row_seconds = time_it(
+        df.apply, lambda row: create_int_hash_from_df_row(row), axis=1
+    )
+    compatible, compatible_seconds = time_it(
+        create_int_hash_from_df, df, md5_compatible=True
+    )
+    _, batched_seconds = time_it(create_int_hash_from_df, df)
+
+    assert (per_row == compatible).all(), "MD5 compatible mode diverged."
+
+    print(f"rows: {args.rows}")
+    for name, seconds in (
+        ("apply(create_int_hash_from_df_row)", per_row_seconds),
+        ("create_int_hash_from_df(md5_compatible=True)", compatible_seconds),
+        ("create_int_hash_from_df", batched_seconds),
+    ):
+        print(
+            f"{name:<48} {seconds:8.3f}s {args.rows / seconds:14,.0f} rows/s "
+            f"{per_row_seconds / seconds:8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,569 @@
+"""Generates synthetic source files in the layout the extraction scripts and ingestors
+read, at a configurable scale:
+
+    <output>/data_backup/CarpetRugs/Transaktionen_Amazon/<country>/
+        yearly and monthly settlement reports with the 7 line preamble and the
+        localized headers of `COUNTRY_TO_COLUMNS_MAPPING`
+    <output>/run/data/data_backup/CarpetRugs/Rechnungen_Carpet/<YYYYMM>/
+        RgExport and GsExport as CSV (even months) or XLSX (odd months)
+    <output>/run/data/data_backup/CarpetRugs/Rechnungen_Carpet/<YYYYMM>/RE|GS/
+        invoice and reimbursement PDFs in the German layout of the PDF parser
+    <output>/run/data/returns_amazon/remissions_from_amazon.csv
+    <output>/run/data/amazon_sales/220914_SKU_Artikelpreise_Versandpreise.csv
+
+The scripts and `entry_point.py` run from `<output>/run`. Order numbers, SKUs and dates
+are shared between the files, so the star schema in `dwh` joins them like real data.
+
+Run from the repository root:
+    python -m benchmarks.synthetic_data --output /tmp/synthetic --scale 2
+"""
+import os
+import csv
+import zlib
+import random
+import argparse
+import datetime
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from definitions.common import ArticleShipmentInfoColumnMapping
+from scripts.constants import (
+    COUNTRY_DATE_FORMATS,
+    COUNTRY_TO_COLUMNS_MAPPING,
+    COUNTRY_TO_CURRENCY_AND_AMOUNT_LOCALE,
+    MONTHLY_INVOICE_COLUMN_MAPPING,
+    MONTHLY_REIMBURSEMENT_COLUMN_MAPPING,
+)
+from utils.amounts import AMOUNT_LOCALES
+
+AMAZON_DIR = "data_backup/CarpetRugs/Transaktionen_Amazon"
+RUN_DIR = "run"
+INVOICES_DIR = "data/data_backup/CarpetRugs/Rechnungen_Carpet"
+RETURNS_FILE = "data/returns_amazon/remissions_from_amazon.csv"
+ARTICLE_INFO_FILE = "data/amazon_sales/220914_SKU_Artikelpreise_Versandpreise.csv"
+
+AMAZON_PREAMBLE = [
+    "Includes Amazon Marketplace, Fulfillment by Amazon (FBA), and Amazon Webstore "
+    "transactions",
+    "All amounts in {currency}, unless specified",
+    "Definitions:",
+    "Sales tax collected: Includes sales tax collected from buyers for product sales, "
+    "shipping, and gift wrap.",
+    "Selling fees: Includes variable closing fees and referral fees.",
+    "Other transaction fees: Includes shipping chargebacks, shipping holdbacks, "
+    "per-item fees and sales tax collection fees.",
+    'Other: Includes non-order transaction amounts. For more details, see the "Type" '
+    'and "Description" columns for each order ID.',
+]
+RETURNS_COLUMNS = [
+    "request-date",
+    "order-id",
+    "order-type",
+    "service-speed",
+    "order-status",
+    "last-updated-date",
+    "sku",
+    "fnsku",
+    "disposition",
+    "requested-quantity",
+    "cancelled-quantity",
+    "disposed-quantity",
+    "shipped-quantity",
+    "in-process-quantity",
+    "removal-fee",
+    "currency",
+]
+CARPET_SIZES = ["060x090", "080x150", "120x170", "160x230", "200x290", "100x100"]
+CARPET_MODELS = ["Berber", "Shaggy", "Vintage", "Kelim", "Orient", "Sisal", "Jute"]
+VAT = 0.19
+MARKETPLACES = {"UK": "amazon.co.uk", "SE": "amazon.se", "PL": "amazon.pl"}
+
+
+@dataclass
+class SyntheticScale:
+    """Number of generated records, `--scale` multiplies the defaults."""
+
+    amazon_rows_per_country: int = 5_000
+    pdfs_per_month: int = 100
+    returns_rows: int = 500
+    skus: int = 200
+    months: int = 3
+    countries: int = len(COUNTRY_TO_COLUMNS_MAPPING)
+
+    def scaled(self, factor: float) -> "SyntheticScale":
+        return SyntheticScale(
+            amazon_rows_per_country=int(self.amazon_rows_per_country * factor),
+            pdfs_per_month=max(1, int(self.pdfs_per_month * factor)),
+            returns_rows=int(self.returns_rows * factor),
+            skus=self.skus,
+            months=self.months,
+            countries=self.countries,
+        )
+
+
+def make_skus(count: int) -> List[str]:
+    """Article numbers like "12345-12-12", which the PDF parser recognizes as ArtNr."""
+    return [
+        f"{10000 + i * 37 % 90000:05d}-{i % 13:02d}-{i % 7:02d}" for i in range(count)
+    ]
+
+
+def make_order_ids(rng: np.random.Generator, count: int) -> np.ndarray:
+    return np.array(
+        [
+            f"{a:03d}-{b:07d}-{c:07d}"
+            for a, b, c in zip(
+                rng.integers(100, 1000, count),
+                rng.integers(0, 10**7, count),
+                rng.integers(0, 10**7, count),
+            )
+        ]
+    )
+
+
+def month_starts(months: int) -> List[datetime.date]:
+    return [datetime.date(2021 + i // 12, i % 12 + 1, 1) for i in range(months)]
+
+
+def format_amounts(amounts: np.ndarray, locale: str) -> List[str]:
+    """Formats amounts like the exports of `locale`, e.g. "-1.234,56" in de_DE."""
+    decimal_separator, group_separators = AMOUNT_LOCALES[locale]
+    group_separator = group_separators[0]
+    formatted = []
+    for amount in amounts:
+        text = f"{abs(amount):,.2f}".replace(",", "_").replace(".", decimal_separator)
+        formatted.append(
+            ("-" if amount < 0 else "") + text.replace("_", group_separator)
+        )
+    return formatted
+
+
+def format_amazon_dates(timestamps: pd.Series, country_code: str) -> pd.Series:
+    """Localized "date/time" values in the first format of `COUNTRY_DATE_FORMATS`,
+    with the localized month names where the format uses them.
+    """
+    country_formats = COUNTRY_DATE_FORMATS[country_code]
+    date_format = country_formats["formats"][0]
+    month_names = {}
+    for name, number in country_formats["months"].items():
+        month_names.setdefault(int(number), name)
+    if month_names and date_format.startswith("%d %m %Y"):
+        months = timestamps.dt.month.map(month_names)
+        dates = (
+            timestamps.dt.day.astype(str)
+            + " "
+            + months
+            + " "
+            + timestamps.dt.strftime("%Y %H:%M:%S")
+        )
+    else:
+        dates = timestamps.dt.strftime(date_format.replace("%d ", "%-d "))
+    return dates + " UTC"
+
+
+def write_amazon_settlement_reports(
+    output: str,
+    scale: SyntheticScale,
+    skus: List[str],
+    order_ids: np.ndarray,
+    seed: int,
+) -> int:
+    """Writes a yearly report per country and a monthly report repeating the rows of
+    its last month, which the ingestor deduplicates. Returns the number of rows.
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(month_starts(scale.months)[0])
+    seconds = int(
+        (pd.Timestamp(month_starts(scale.months + 1)[-1]) - start).total_seconds()
+    )
+    rows_written = 0
+    for country_code in list(COUNTRY_TO_COLUMNS_MAPPING)[: scale.countries]:
+        rows = scale.amazon_rows_per_country
+        columns = list(COUNTRY_TO_COLUMNS_MAPPING[country_code])
+        currency, locale = COUNTRY_TO_CURRENCY_AND_AMOUNT_LOCALE[country_code]
+        timestamps = (
+            start + pd.to_timedelta(np.sort(rng.integers(0, seconds, rows)), unit="s")
+        ).to_series(index=range(rows))
+        row_types = rng.choice(
+            ["Order", "Refund", "Transfer"], rows, p=[0.85, 0.1, 0.05]
+        )
+        is_transfer = row_types == "Transfer"
+        quantities = rng.integers(1, 4, rows)
+        amounts = rng.gamma(2.0, 60.0, rows).round(2) * quantities
+        amounts[row_types == "Refund"] *= -1
+        amounts[is_transfer] = -rng.gamma(5.0, 400.0, is_transfer.sum()).round(2)
+        data = pd.DataFrame(
+            {
+                columns[0]: format_amazon_dates(timestamps, country_code),
+                columns[1]: rng.integers(10**10, 10**11, rows).astype(str),
+                columns[2]: row_types,
+                columns[3]: np.where(is_transfer, "", rng.choice(order_ids, rows)),
+                columns[4]: np.where(is_transfer, "", rng.choice(skus, rows)),
+                "description": np.where(
+                    is_transfer,
+                    "To account ending with: 123",
+                    rng.choice(CARPET_MODELS, rows),
+                ),
+                columns[5]: np.where(is_transfer, "", quantities.astype(str)),
+                columns[6]: MARKETPLACES.get(
+                    country_code, f"amazon.{country_code.lower()}"
+                ),
+                columns[7]: np.where(is_transfer, "", "Amazon"),
+                columns[8]: format_amounts(amounts, locale),
+            }
+        )
+        folder = os.path.join(output, AMAZON_DIR, country_code)
+        os.makedirs(folder, exist_ok=True)
+        last_month = timestamps.dt.month == timestamps.dt.month.iloc[-1]
+        for file_name, report in [
+            ("2021Jan1-2021Dec31CustomTransaction.csv", data),
+            ("2021MonthlyTransaction.csv", data[last_month.values]),
+        ]:
+            with open(os.path.join(folder, file_name), "w", newline="") as file:
+                for line in AMAZON_PREAMBLE:
+                    line = line.format(currency=currency).replace('"', '""')
+                    file.write(f'"{line}"\n')
+                report.to_csv(file, index=False, quoting=csv.QUOTE_ALL)
+            rows_written += len(report)
+    return rows_written
+
+
+def write_text_pdf(path: str, lines: List[str], *pages: List[str]) -> None:
+    """Writes a PDF with one text line per entry of `lines` on the first page and of
+    each of `pages` on the following pages, the smallest file PDFium extracts the
+    lines from in order.
+    """
+    font_object_nr = 3
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+        b"/Encoding /WinAnsiEncoding >>",
+    ]
+    page_object_nrs = []
+    for page_lines in [lines, *pages]:
+        content = ["BT", "/F1 8 Tf"]
+        for line_nr, line in enumerate(page_lines):
+            text = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            content.append(f"1 0 0 1 30 {810 - 11 * line_nr} Tm ({text}) Tj")
+        content.append("ET")
+        stream = "\n".join(content).encode("cp1252")
+        page_object_nrs.append(len(objects) + 1)
+        objects += [
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (font_object_nr, len(objects) + 2),
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        ]
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % object_nr for object_nr in page_object_nrs),
+        len(page_object_nrs),
+    )
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for object_nr, pdf_object in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (object_nr, pdf_object)
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref_offset,
+    )
+    with open(path, "wb") as file:
+        file.write(pdf)
+
+
+def customer_number(order_number: str) -> str:
+    return f"K{zlib.crc32(order_number.encode()) % 10**6:06d}"
+
+
+def _german_amount(amount: float) -> str:
+    return format_amounts(np.array([amount]), "de_DE")[0]
+
+
+def invoice_pdf_lines(
+    document_number: str,
+    order_number: str,
+    date_document: datetime.date,
+    items: List[dict],
+    is_reimbursement: bool,
+) -> List[str]:
+    """Text lines of an invoice or reimbursement PDF. Long descriptions are split over
+    two lines and shipping rows have no ArtNr, like in the real documents.
+    """
+    lines = [
+        "This GmbH",
+        "Fantastic Joe",
+        "Hauptweg 1",
+        "12345 Hauptstadt",
+        f"Rechnungsnr. {document_number} bzgl. Auftragsnummer: {order_number}",
+        "Seite: 1",
+        "External GmbH, Adolfstr. 88 , 12345 Keinstadt",
+        "Tel: 01234 1234567",
+        "RECHNUNGSKORREKTUR" if is_reimbursement else "Rechnung",
+        date_document.strftime("%d.%m.%Y"),
+        f"Kundennummer: {customer_number(order_number)}",
+        "Pos. Menge ArtNr Bezeichnung Ust. E-Preis G-Preis",
+    ]
+    for item_nr, item in enumerate(items, 1):
+        prices = (
+            f"19% {_german_amount(item['item_price'])} "
+            f"{_german_amount(item['total_price'])}"
+        )
+        if item["article_id"] is None:
+            lines.append(f"{item_nr} {item['quantity']} Versand GLS-DB {prices}")
+        elif item["split_description"]:
+            lines.append(
+                f"{item_nr} {item['quantity']} stk {item['article_id']} "
+                f"{item['description']}"
+            )
+            lines.append(f"in besonderer Ausführung {item['size']} cm")
+            lines.append(prices)
+        else:
+            lines.append(
+                f"{item_nr} {item['quantity']} stk {item['article_id']} "
+                f"{item['description']} {item['size']} cm {prices}"
+            )
+    net_total = round(sum(item["total_price"] for item in items), 2)
+    vat_amount = round(net_total * VAT, 2)
+    lines += [
+        f"Gesamt Netto (19,00%) € {_german_amount(net_total)} (19,00%)",
+        f"zzgl. 19,00% MwSt. € {_german_amount(vat_amount)}",
+        f"Gesamtbetrag € {_german_amount(net_total + vat_amount)}",
+        "Ihre Ust-ID: DE310123456",
+        "Vielen Dank für Ihren Auftrag.",
+    ]
+    return lines
+
+
+def write_invoices(
+    output: str,
+    scale: SyntheticScale,
+    skus: List[str],
+    order_ids: np.ndarray,
+    seed: int,
+) -> int:
+    """Writes the RE and GS PDFs of each month with the RgExport and GsExport listing
+    them. Returns the number of PDFs.
+    """
+    rng = random.Random(seed)
+    pdf_count = 0
+    for month_nr, month_start in enumerate(month_starts(scale.months)):
+        month = month_start.strftime("%Y%m")
+        month_folder = os.path.join(output, RUN_DIR, INVOICES_DIR, month)
+        exports = {"RE": [], "GS": []}
+        for document_type, documents in [
+            ("RE", scale.pdfs_per_month),
+            ("GS", max(1, scale.pdfs_per_month // 4)),
+        ]:
+            os.makedirs(os.path.join(month_folder, document_type), exist_ok=True)
+            for _ in range(documents):
+                document_number = f"{document_type}{rng.randrange(10**6):06d}"
+                order_number = f"AMZ-ADA-{rng.choice(order_ids)}"
+                date_document = month_start + datetime.timedelta(days=rng.randrange(28))
+                items = []
+                for _ in range(rng.randint(1, 8)):
+                    quantity = rng.randint(1, 3)
+                    item_price = round(rng.uniform(20, 400), 2)
+                    items.append(
+                        {
+                            "quantity": quantity,
+                            "article_id": rng.choice(skus),
+                            "description": f"Teppich {rng.choice(CARPET_MODELS)}",
+                            "size": rng.choice(CARPET_SIZES),
+                            "split_description": rng.random() < 0.15,
+                            "item_price": item_price,
+                            "total_price": round(item_price * quantity, 2),
+                        }
+                    )
+                if rng.random() < 0.5:
+                    items.append(
+                        {
+                            "quantity": 1,
+                            "article_id": None,
+                            "item_price": 5.9,
+                            "total_price": 5.9,
+                        }
+                    )
+                lines = invoice_pdf_lines(
+                    document_number,
+                    order_number,
+                    date_document,
+                    items,
+                    document_type == "GS",
+                )
+                file_name = (
+                    f"{date_document:%Y%m%d}_{document_number}_{order_number}.pdf"
+                )
+                write_text_pdf(
+                    os.path.join(month_folder, document_type, file_name), lines
+                )
+                net_total = sum(item["total_price"] for item in items)
+                exports[document_type].append(
+                    (document_number, order_number, date_document, net_total)
+                )
+                pdf_count += 1
+        write_monthly_exports(month_folder, exports, as_excel=month_nr % 2 == 1)
+    return pdf_count
+
+
+def write_monthly_exports(month_folder: str, exports: dict, as_excel: bool) -> None:
+    """RgExport/GsExport with the German headers and the monthly total row at the end,
+    which the extraction script filters out. CSV exports have German amounts, Excel
+    exports numbers and dates.
+    """
+    invoice_numbers = [number for number, *_ in exports["RE"]] or [""]
+    for document_type, column_mapping, total_column in [
+        ("RE", MONTHLY_INVOICE_COLUMN_MAPPING, "Gesamtsumme"),
+        ("GS", MONTHLY_REIMBURSEMENT_COLUMN_MAPPING, "Gesamtsumme Rechnungskorrektur"),
+    ]:
+        rows = []
+        for number, order_number, date_document, net_total in exports[document_type]:
+            total = round(net_total * (1 + VAT), 2)
+            row = {
+                "Satzart": document_type,
+                "Belegnummer": number,
+                "Währung ISO": "EUR",
+                "Versandart Auftrag": "GLS",
+                "Erstelldatum Rechnung": date_document,
+                "Zahlungsart Auftrag": "Amazon Payments",
+                "Kundennummer Auftrag": customer_number(order_number),
+                "Auftragsnummer": f"AU{int(number[2:]) % 10**5:05d}",
+                "Erstelldatum Auftrag": date_document,
+                "Externe Auftragsnummer": order_number.replace("AMZ-ADA-", "", 1),
+                "Plattform": "Amazon",
+            }
+            if document_type == "RE":
+                row["Datum letzte Zahlung"] = date_document
+                row["Zahlbetrag gesamt"] = total
+                row[total_column] = total
+            else:
+                row["Gesamtsumme Auftrag"] = total
+                row[total_column] = -total
+                row["Rechnungsnummer"] = invoice_numbers[
+                    len(rows) % len(invoice_numbers)
+                ]
+            rows.append(row)
+        rows.append({total_column: round(sum(row[total_column] for row in rows), 2)})
+        export = pd.DataFrame(rows, columns=list(column_mapping))
+        name = "RgExport" if document_type == "RE" else "GsExport"
+        if as_excel:
+            export.to_excel(os.path.join(month_folder, f"{name}.xlsx"), index=False)
+            continue
+        for column in export.columns:
+            values = export[column].dropna()
+            if pd.api.types.is_float_dtype(export[column]):
+                export[column] = export[column].map(
+                    lambda value: "" if pd.isna(value) else _german_amount(value)
+                )
+            elif len(values) and isinstance(values.iloc[0], datetime.date):
+                export[column] = pd.to_datetime(export[column]).dt.strftime("%Y-%m-%d")
+        export.to_csv(os.path.join(month_folder, f"{name}.csv"), sep=";", index=False)
+
+
+def write_returns(
+    output: str,
+    scale: SyntheticScale,
+    skus: List[str],
+    order_ids: np.ndarray,
+    seed: int,
+) -> int:
+    """Remissions report: comma separated quoted values with a trailing ";"."""
+    rng = random.Random(seed)
+    start = datetime.datetime.combine(
+        month_starts(scale.months)[0], datetime.time(), datetime.timezone.utc
+    )
+    path = os.path.join(output, RUN_DIR, RETURNS_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(",".join(f'"{column}"' for column in RETURNS_COLUMNS) + ";\n")
+        for _ in range(scale.returns_rows):
+            request_date = start + datetime.timedelta(
+                seconds=rng.randrange(scale.months * 28 * 24 * 3600)
+            )
+            quantity = rng.randint(1, 3)
+            values = [
+                request_date.isoformat(timespec="seconds"),
+                f"S{rng.randrange(10**8):08d}",
+                rng.choice(["Return", "Disposal"]),
+                "Standard",
+                "Completed",
+                (request_date + datetime.timedelta(days=3)).isoformat(
+                    timespec="seconds"
+                ),
+                rng.choice(skus),
+                f"X00{rng.randrange(10**7):07d}",
+                rng.choice(["Sellable", "Unsellable"]),
+                quantity,
+                0,
+                0,
+                quantity,
+                0,
+                f"{rng.uniform(0.1, 5):.2f}",
+                "EUR",
+            ]
+            file.write(",".join(f'"{value}"' for value in values) + ";\n")
+    return scale.returns_rows
+
+
+def write_article_shipment_info(output: str, skus: List[str], seed: int) -> int:
+    rng = np.random.default_rng(seed)
+    columns = list(ArticleShipmentInfoColumnMapping)
+    data = pd.DataFrame(
+        {
+            "SKU": skus,
+            "Artikelart": rng.choice(["Teppich", "Läufer", "Matte"], len(skus)),
+            "Versandart": rng.choice(["Paket", "Spedition"], len(skus)),
+            "Artikelpreis Netto": rng.gamma(2.0, 50.0, len(skus)).round(2),
+            "Max Items / Shipment": rng.integers(1, 5, len(skus)),
+            **{
+                column: rng.uniform(3, 40, len(skus)).round(2) for column in columns[5:]
+            },
+        }
+    )
+    path = os.path.join(output, RUN_DIR, ARTICLE_INFO_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data.to_csv(path, index=False, encoding="utf-16")
+    return len(data)
+
+
+def generate(output: str, scale: SyntheticScale, seed: int = 0) -> dict:
+    """Writes all source files to `output` and returns the number of records of each."""
+    rng = np.random.default_rng(seed)
+    skus = make_skus(scale.skus)
+    order_ids = make_order_ids(rng, max(100, scale.amazon_rows_per_country // 2))
+    return {
+        "amazon_rows": write_amazon_settlement_reports(
+            output, scale, skus, order_ids, seed
+        ),
+        "pdfs": write_invoices(output, scale, skus, order_ids, seed),
+        "returns_rows": write_returns(output, scale, skus, order_ids, seed),
+        "skus": write_article_shipment_info(output, skus, seed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", required=True)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Multiplies the number of records."
+    )
+    parser.add_argument("--months", type=int, default=SyntheticScale.months)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scale = SyntheticScale(months=args.months).scaled(args.scale)
+    counts = generate(args.output, scale, args.seed)
+    print(f"Generated in {args.output}: {counts}")
+    print(
+        f"Run the scripts and entry_point.py from: {os.path.join(args.output, RUN_DIR)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,25 @@
 import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
-DB_PORT = os.environ["DB_PORT"] or 5432
-DB_HOST = os.environ["DB_HOST"] or "postgres"
-DB_USER = os.environ["POSTGRES_USER"] or "postgres"
-DB_PASSWORD = os.environ["POSTGRES_PASSWORD"] or "postgres"
-DB_NAME = os.environ["POSTGRES_DB"] or "postgres"
+# the extraction scripts import the models without a database, nothing connects
+# before the first query.
+DB_PORT = os.environ.get("DB_PORT") or 5432
+DB_HOST = os.environ.get("DB_HOST") or "postgres"
+DB_USER = os.environ.get("POSTGRES_USER") or "postgres"
+DB_PASSWORD = os.environ.get("POSTGRES_PASSWORD") or "postgres"
+DB_NAME = os.environ.get("POSTGRES_DB") or "postgres"
+# log every SQL statement, bulk loads through COPY are not affected.
+DB_ECHO = os.environ.get("DB_ECHO", "true").lower() in ("1", "true", "yes")
 
 engine = create_engine(
-    f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}", echo=True
+    f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+    echo=DB_ECHO,
 )
 
 # TODO: check what scoped sessions are used for.
@@ -20,3 +28,15 @@ db_session = scoped_session(
 )
 
 Base = declarative_base()
+
+
+@contextmanager
+def transaction(connection: Optional[Connection] = None) -> Iterator[Connection]:
+    """A new connection in a transaction which is committed when the block succeeds,
+    or the given `connection`, whose transaction is committed by its owner.
+    """
+    if connection is not None:
+        yield connection
+        return
+    with engine.begin() as connection:
+        yield connection
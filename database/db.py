@@ -1,8 +1,22 @@
 # from sqlalchemy.schema import CreateSchema, DropSchema
+import logging
+from typing import FrozenSet, List, Set
+
+from sqlalchemy import Index, UniqueConstraint, func, inspect, select, text
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
 from database.base import engine
 from database.base import Base
+from database.tables import SourceMetaDataTable
 from definitions.schemas import Schemas
 from definitions.source_tables import SourceTables  # noqa
+from utils.common import MD5_ID_MODULUS
+import database.dwh_tables  # noqa
+
+logger = logging.getLogger("root")
+
+# `pg_attribute.attcompression` of the TOAST compression methods.
+COMPRESSION_METHODS = {"pglz": "p", "lz4": "l"}
 
 
 def drop_and_create_all_schemas():
@@ -18,10 +32,189 @@ def drop_and_create_all_schemas():
             conn.execute(f"CREATE SCHEMA {schema.value};")
 
 
-def init_db():
-    drop_and_create_all_schemas()
+def create_missing_schemas():
+    """
+    Creates the schemas defined in Schemas Enum which do not exist yet.
+    """
+    for schema in Schemas:
+        with engine.connect() as conn:
+            conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema.value};")
+
+
+def init_db(full_reload: bool = False):
+    """
+    Creates missing schemas and tables. Existing data is kept so that ingestors only
+    load new or changed source files, unless `full_reload` drops everything first.
+    """
+    if full_reload:
+        drop_and_create_all_schemas()
+    else:
+        create_missing_schemas()
 
     # create all tables
     Base.metadata.create_all(
         bind=engine,
     )
+    check_existing_tables()
+    check_id_scheme()
+    create_missing_indexes()
+    set_column_compression()
+
+
+def _unique_column_sets(table) -> Set[FrozenSet[str]]:
+    return {
+        frozenset(column.name for column in constraint.columns)
+        for constraint in [*table.indexes, *table.constraints]
+        if (isinstance(constraint, Index) and constraint.unique)
+        or isinstance(constraint, UniqueConstraint)
+    }
+
+
+def get_schema_drift(table, inspector) -> List[str]:
+    """
+    The differences of an existing table from its model which `create_all` and
+    `create_missing_indexes` do not migrate: missing or removed columns, another
+    primary key, a regular table which is partitioned in the model and unique
+    constraints or indexes which are missing or not unique.
+    """
+    drift = []
+    columns = {
+        column["name"] for column in inspector.get_columns(table.name, table.schema)
+    }
+    model_columns = {column.name for column in table.columns}
+    if model_columns - columns:
+        drift.append(f"columns {sorted(model_columns - columns)} missing")
+    if columns - model_columns:
+        drift.append(f"columns {sorted(columns - model_columns)} not in the model")
+
+    primary_key = inspector.get_pk_constraint(table.name, table.schema)
+    model_primary_key = [column.name for column in table.primary_key.columns]
+    if set(primary_key["constrained_columns"]) != set(model_primary_key):
+        drift.append(
+            f"primary key {primary_key['constrained_columns']} instead of "
+            f"{model_primary_key}"
+        )
+
+    if table.dialect_options["postgresql"]["partition_by"]:
+        relkind = inspector.bind.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": f"{table.schema}.{table.name}"},
+        ).scalar()
+        if relkind != "p":
+            drift.append("not partitioned")
+
+    indexes = inspector.get_indexes(table.name, table.schema)
+    unique_column_sets = {
+        frozenset(constraint["column_names"])
+        for constraint in [
+            *inspector.get_unique_constraints(table.name, table.schema),
+            *[index for index in indexes if index["unique"]],
+        ]
+    }
+    unique_column_sets.add(frozenset(primary_key["constrained_columns"]))
+    # unique indexes which do not exist yet are created by `create_missing_indexes`.
+    index_names = {index["name"] for index in indexes}
+    new_unique_indexes = [
+        frozenset(column.name for column in index.columns)
+        for index in table.indexes
+        if index.unique and index.name not in index_names
+    ]
+    missing_unique = _unique_column_sets(table) - unique_column_sets
+    for column_set in sorted(missing_unique - set(new_unique_indexes), key=sorted):
+        drift.append(f"{sorted(column_set)} not unique")
+    return drift
+
+
+def check_existing_tables():
+    """
+    Raises if tables which already existed differ from their models, `create_all`
+    only creates missing tables and does not change existing ones.
+    """
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        drifted_tables = []
+        for table in Base.metadata.sorted_tables:
+            drift = get_schema_drift(table, inspector)
+            if drift:
+                drifted_tables.append(
+                    f"{table.schema}.{table.name}: {', '.join(drift)}"
+                )
+    if drifted_tables:
+        raise Exception(
+            "Tables differ from their models, load the data again with "
+            f"--full-reload. {'; '.join(drifted_tables)}"
+        )
+
+
+def check_id_scheme():
+    """
+    Raises if sources were loaded with the MD5 based ids `create_int_hash_from_df`
+    computed before it hashed with `hash_pandas_object`. The source_ids, hash_ids and
+    internal_ids of their rows changed, loading them again would duplicate the rows.
+    MD5 ids are below `MD5_ID_MODULUS`, a 64-bit id is with a probability of 5e-8.
+    """
+    with engine.connect() as conn:
+        md5_sources = conn.execute(
+            select(func.count()).where(
+                SourceMetaDataTable.source_id.between(0, MD5_ID_MODULUS - 1)
+            )
+        ).scalar()
+    if md5_sources:
+        raise Exception(
+            f"{md5_sources} sources were loaded with the ids of an older version. "
+            "Load the data again with --full-reload."
+        )
+
+
+def create_missing_indexes():
+    """
+    Creates the indexes of the models which are missing in tables that already existed,
+    `create_all` only creates indexes together with new tables.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except IntegrityError as error:
+                raise Exception(
+                    f"Cannot create unique index {index.name}, {table.name} contains "
+                    "duplicates. Load the data again with --full-reload."
+                ) from error
+
+
+def set_column_compression():
+    """
+    Sets the TOAST compression method given as `info={"compression": ...}` on model
+    columns, for new and existing tables. Already stored values keep their method.
+    Servers before Postgres 14 or built without lz4 keep their default method.
+    """
+    with engine.connect() as conn:
+        if conn.dialect.server_version_info < (14,):
+            logger.warning("Column compression needs Postgres 14, using the default.")
+            return
+        for table in Base.metadata.sorted_tables:
+            for column in table.columns:
+                compression = column.info.get("compression")
+                if compression is None:
+                    continue
+                current = conn.execute(
+                    text(
+                        "SELECT attcompression FROM pg_attribute "
+                        "WHERE attrelid = to_regclass(:table) AND attname = :column"
+                    ),
+                    {"table": f"{table.schema}.{table.name}", "column": column.name},
+                ).scalar()
+                if current == COMPRESSION_METHODS[compression]:
+                    continue
+                try:
+                    conn.execute(
+                        text(
+                            f"ALTER TABLE {table.schema}.{table.name} ALTER COLUMN "
+                            f"{column.name} SET COMPRESSION {compression}"
+                        )
+                    )
+                except DBAPIError as error:
+                    logger.warning(
+                        f"Cannot compress {table.name}.{column.name} with "
+                        f"{compression}, using the default: {error.orig}"
+                    )
@@ -0,0 +1,161 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    SmallInteger,
+    String,
+    DateTime,
+    Float,
+    Date,
+    Index,
+)
+from sqlalchemy.sql import func
+
+from database.base import Base
+from definitions.schemas import Schemas
+
+from sqlalchemy.types import BIGINT
+
+
+class DimDate(Base):
+    __tablename__ = "dim_date"
+    __table_args__ = {"schema": Schemas.DWH.value}
+
+    date_key = Column(Integer, primary_key=True, autoincrement=False)  # YYYYMMDD
+    date = Column(Date, nullable=False, unique=True)
+    year = Column(SmallInteger, nullable=False)
+    quarter = Column(SmallInteger, nullable=False)
+    month = Column(SmallInteger, nullable=False)
+    day = Column(SmallInteger, nullable=False)
+    iso_week = Column(SmallInteger, nullable=False)
+    iso_weekday = Column(SmallInteger, nullable=False)
+
+
+class DimSku(Base):
+    __tablename__ = "dim_sku"
+    __table_args__ = {"schema": Schemas.DWH.value}
+
+    sku_key = Column(Integer, primary_key=True, autoincrement=True)
+    sku = Column(String, nullable=False, unique=True)
+    article_type = Column(String)
+    shipment_type = Column(String)
+    article_net_price = Column(Float)
+    max_items_per_shipment = Column(Integer)
+
+
+class DimOrder(Base):
+    __tablename__ = "dim_order"
+    __table_args__ = {"schema": Schemas.DWH.value}
+
+    order_key = Column(BIGINT, primary_key=True, autoincrement=True)
+    order_number = Column(String, nullable=False, unique=True)
+    platform = Column(String)
+    country_code = Column(String(2))
+    marketplace = Column(String)
+    order_date = Column(Date)
+
+
+class FactSales(Base):
+    __tablename__ = "fact_sales"
+    __table_args__ = (
+        Index("ix_fact_sales_date_key_sku_key", "date_key", "sku_key"),
+        Index("ix_fact_sales_order_key", "order_key"),
+        Index("ix_fact_sales_source_id", "source_id"),
+        {"schema": Schemas.DWH.value},
+    )
+
+    hash_id = Column(BIGINT, primary_key=True, autoincrement=False)
+    date_key = Column(Integer)
+    date_time = Column(DateTime)
+    sku_key = Column(Integer)
+    order_key = Column(BIGINT)
+    type = Column(String)
+    marketplace = Column(String)
+    fulfilment = Column(String)
+    country_code = Column(String(2))
+    currency = Column(String(3))
+    quantity = Column(Integer)
+    total_price = Column(Float)
+    source_id = Column(BIGINT, nullable=False)
+
+
+class FactInvoiceItems(Base):
+    __tablename__ = "fact_invoice_items"
+    __table_args__ = (
+        Index("ix_fact_invoice_items_date_key", "date_key"),
+        Index("ix_fact_invoice_items_order_key", "order_key"),
+        Index("ix_fact_invoice_items_sku_key", "sku_key"),
+        Index("ix_fact_invoice_items_source_id", "source_id"),
+        {"schema": Schemas.DWH.value},
+    )
+
+    # invoice or reimbursement, see `definitions.common.ExternalDocumentType`.
+    document_type = Column(String, primary_key=True)
+    hash_id = Column(BIGINT, primary_key=True, autoincrement=False)
+    document_number = Column(String)
+    internal_id = Column(BIGINT)
+    date_key = Column(Integer)
+    order_key = Column(BIGINT)
+    sku_key = Column(Integer)
+    item_nr = Column(Integer)
+    quantity = Column(Integer)
+    description = Column(String)
+    vat = Column(String)
+    item_price = Column(Float)
+    total_price = Column(Float)
+    source_id = Column(BIGINT, nullable=False)
+
+
+class FactReturns(Base):
+    __tablename__ = "fact_returns"
+    __table_args__ = (
+        Index("ix_fact_returns_date_key_sku_key", "date_key", "sku_key"),
+        Index("ix_fact_returns_order_key", "order_key"),
+        Index("ix_fact_returns_source_id", "source_id"),
+        {"schema": Schemas.DWH.value},
+    )
+
+    # unique_id of the row in raw.returned_from_amazon.
+    return_id = Column(BIGINT, primary_key=True, autoincrement=False)
+    date_key = Column(Integer)
+    request_date = Column(DateTime)
+    sku_key = Column(Integer)
+    order_key = Column(BIGINT)
+    order_type = Column(String)
+    order_status = Column(String)
+    disposition = Column(String)
+    requested_quantity = Column(Integer)
+    cancelled_quantity = Column(Integer)
+    disposed_quantity = Column(Integer)
+    shipped_quantity = Column(Integer)
+    removal_fee = Column(Float)
+    currency = Column(String)
+    source_id = Column(BIGINT, nullable=False)
+
+
+class RefreshWatermarks(Base):
+    """The latest `date_inserted` of each raw table which was transformed into the dwh
+    tables, rows inserted later belong to sources which need to be refreshed.
+    """
+
+    __tablename__ = "refresh_watermarks"
+    __table_args__ = {"schema": Schemas.DWH.value}
+
+    source_table = Column(String, primary_key=True)
+    last_date_inserted = Column(DateTime, nullable=False)
+    date_refreshed = Column(
+        DateTime,
+        server_default=func.current_timestamp(),
+        nullable=False,
+    )
+
+
+class RefreshedSources(Base):
+    """The source_ids of each raw table whose rows are in the dwh tables, used to
+    remove the rows of sources which were deleted from the raw table.
+    """
+
+    __tablename__ = "refreshed_sources"
+    __table_args__ = {"schema": Schemas.DWH.value}
+
+    source_table = Column(String, primary_key=True)
+    source_id = Column(BIGINT, primary_key=True, autoincrement=False)
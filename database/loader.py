@@ -0,0 +1,160 @@
+import io
+import time
+import logging
+from typing import List, Optional
+
+import pandas as pd
+from sqlalchemy import Integer, Float
+from sqlalchemy.engine import Connection
+
+from database.base import engine
+
+logger = logging.getLogger("root")
+
+COPY_NULL_MARKER = "\\N"
+COPY_CHUNK_ROWS = 100_000
+
+
+def _cast_to_table_dtypes(df: pd.DataFrame, table) -> pd.DataFrame:
+    """Cast DataFrame columns to the dtypes implied by the SQLAlchemy model columns so
+    that the CSV text written to COPY is accepted by Postgres, e.g. integer columns
+    read back from CSV as floats (because of NaNs) are written as `1` and not `1.0`.
+    """
+    table_columns = table.__table__.columns
+    unknown_columns = [c for c in df.columns if c not in table_columns]
+    if unknown_columns:
+        raise Exception(
+            f"Columns not found in table {table.__tablename__}: {unknown_columns}"
+        )
+
+    casted = {}
+    for column_name in df.columns:
+        column_type = table_columns[column_name].type
+        values = df[column_name]
+        if isinstance(column_type, Integer):
+            casted[column_name] = pd.to_numeric(values).astype("Int64")
+        elif isinstance(column_type, Float):
+            casted[column_name] = pd.to_numeric(values).astype("float64")
+        elif pd.api.types.is_datetime64_any_dtype(values):
+            # pandas formats timestamps one by one when writing CSV, numpy's ISO
+            # conversion is much faster. Timezone aware values are stored as UTC.
+            if getattr(values.dt, "tz", None) is not None:
+                values = values.dt.tz_convert("UTC").dt.tz_localize(None)
+            iso_values = values.to_numpy().astype("datetime64[us]").astype(str)
+            casted[column_name] = pd.Series(iso_values, index=df.index).where(
+                values.notna()
+            )
+        else:
+            # strings, date objects and ISO timestamps are already valid COPY input.
+            casted[column_name] = values
+    return pd.DataFrame(casted, index=df.index)
+
+
+def _qualified_table_name(table) -> str:
+    return f'"{table.__table__.schema}"."{table.__tablename__}"'
+
+
+def _copy_dataframe(df: pd.DataFrame, table_name: str, dbapi_connection) -> None:
+    columns = ", ".join(f'"{column}"' for column in df.columns)
+    copy_sql = (
+        f"COPY {table_name} ({columns}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL_MARKER}')"
+    )
+    with dbapi_connection.cursor() as cursor:
+        for start in range(0, len(df), COPY_CHUNK_ROWS):
+            end = start + COPY_CHUNK_ROWS
+            buffer = io.StringIO()
+            df.iloc[start:end].to_csv(
+                buffer, index=False, header=False, na_rep=COPY_NULL_MARKER
+            )
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+
+
+def _upsert_dataframe(
+    df: pd.DataFrame, table, table_name: str, upsert_keys: List[str], dbapi_connection
+) -> int:
+    """COPY the rows into a temporary staging table with the columns of `df` and insert
+    them from there, skipping rows whose `upsert_keys` already exist in the table.
+    """
+    staging_table_name = f'"staging_{table.__tablename__}"'
+    columns = ", ".join(f'"{column}"' for column in df.columns)
+    keys = ", ".join(f'"{key}"' for key in upsert_keys)
+    with dbapi_connection.cursor() as cursor:
+        # only the column types are copied, not the constraints and defaults.
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {staging_table_name} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {table_name} WITH NO DATA"
+        )
+    _copy_dataframe(df, staging_table_name, dbapi_connection)
+    with dbapi_connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table_name} ({columns}) "
+            f"SELECT {columns} FROM {staging_table_name} "
+            f"ON CONFLICT ({keys}) DO NOTHING"
+        )
+        inserted_rows = cursor.rowcount
+        cursor.execute(f"DROP TABLE {staging_table_name}")
+    return inserted_rows
+
+
+def _load_dataframe(
+    df: pd.DataFrame,
+    table,
+    table_name: str,
+    upsert_keys: Optional[List[str]],
+    dbapi_connection,
+) -> int:
+    if upsert_keys:
+        return _upsert_dataframe(df, table, table_name, upsert_keys, dbapi_connection)
+    _copy_dataframe(df, table_name, dbapi_connection)
+    return len(df)
+
+
+def copy_dataframe_to_table(
+    df: pd.DataFrame,
+    table,
+    connection: Optional[Connection] = None,
+    upsert_keys: Optional[List[str]] = None,
+    table_name: Optional[str] = None,
+) -> int:
+    """Bulk load a DataFrame into the table of a `database.tables` model using Postgres
+    `COPY ... FROM STDIN`, streaming the rows as CSV from an in-memory buffer.
+
+    If `upsert_keys` are given, the table needs a unique index on them and rows whose
+    keys already exist in the table (or earlier in `df`) are skipped instead of
+    failing the load, using `INSERT ... ON CONFLICT DO NOTHING` from a staging table.
+
+    `table_name` loads into another table with the columns of the model, e.g. a
+    partition which is being built, instead of the model's table.
+
+    If `connection` is given, the rows are copied within its transaction and it is up
+    to the caller to commit, otherwise a new transaction is opened and committed.
+    Returns the number of rows inserted.
+    """
+    if df.empty:
+        logger.info(f"Nothing to load into {table.__tablename__}.")
+        return 0
+
+    start = time.perf_counter()
+    data = _cast_to_table_dtypes(df, table)
+    table_name = table_name or _qualified_table_name(table)
+    if connection is None:
+        with engine.begin() as connection:
+            inserted_rows = _load_dataframe(
+                data, table, table_name, upsert_keys, connection.connection
+            )
+    else:
+        inserted_rows = _load_dataframe(
+            data, table, table_name, upsert_keys, connection.connection
+        )
+    elapsed = time.perf_counter() - start
+
+    skipped = (
+        f", skipped {len(data) - inserted_rows} existing rows" if upsert_keys else ""
+    )
+    logger.info(
+        f"Loaded {inserted_rows} rows into {table.__tablename__} in {elapsed:.2f}s "
+        f"({len(data) / max(elapsed, 1e-9):,.0f} rows/s{skipped})."
+    )
+    return inserted_rows
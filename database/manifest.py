@@ -0,0 +1,273 @@
+import os
+import hashlib
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+from sqlalchemy import delete, select, update
+from sqlalchemy.engine import Connection
+
+from database.base import Base, engine
+from database.loader import copy_dataframe_to_table
+from database.tables import SourceFileManifestTable, SourceMetaDataTable
+from definitions.schemas import Schemas
+from utils.intermediate_files import intermediate_file_variants
+
+logger = logging.getLogger("root")
+
+CHECKSUM_CHUNK_BYTES = 1024 * 1024
+
+
+def compute_file_checksum(file_path: str) -> str:
+    """SHA-256 of the file content, read in chunks."""
+    checksum = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHECKSUM_CHUNK_BYTES), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def _manifest_path(file_path: str) -> str:
+    return os.path.relpath(file_path)
+
+
+def get_changed_files(file_paths: Iterable[str]) -> List[str]:
+    """Returns the files which are new or whose content changed since they were last
+    recorded in the manifest.
+
+    Files with the same size and mtime as recorded are unchanged without reading them.
+    Only if those differ the checksum is computed, a file which was merely touched is
+    unchanged and its new mtime is recorded so the next run skips the checksum.
+    """
+    file_paths = list(file_paths)
+    manifest_paths = [_manifest_path(file_path) for file_path in file_paths]
+    with engine.begin() as connection:
+        recorded = {
+            row.file_path: row
+            for row in connection.execute(
+                select(
+                    SourceFileManifestTable.file_path,
+                    SourceFileManifestTable.file_size,
+                    SourceFileManifestTable.file_mtime,
+                    SourceFileManifestTable.checksum,
+                ).where(SourceFileManifestTable.file_path.in_(manifest_paths))
+            )
+        }
+
+        changed_files = []
+        for file_path, manifest_path in zip(file_paths, manifest_paths):
+            stat = os.stat(file_path)
+            row = recorded.get(manifest_path)
+            if row is None or row.file_size != stat.st_size:
+                changed_files.append(file_path)
+            elif row.file_mtime == stat.st_mtime:
+                continue
+            elif row.checksum == compute_file_checksum(file_path):
+                connection.execute(
+                    update(SourceFileManifestTable)
+                    .where(SourceFileManifestTable.file_path == manifest_path)
+                    .values(file_mtime=stat.st_mtime)
+                )
+            else:
+                changed_files.append(file_path)
+
+    logger.info(
+        f"{len(changed_files)} of {len(file_paths)} source files new or changed."
+    )
+    return changed_files
+
+
+def get_files_to_load(
+    file_paths: Iterable[str], source_files: Optional[List[str]] = None
+) -> List[str]:
+    """The new or changed files of `get_changed_files`. When a source is reloaded its
+    `source_files` (paths as recorded in the manifest) are loaded again instead, even
+    if they did not change, and no other file is.
+    """
+    if source_files is None:
+        return get_changed_files(file_paths)
+    return [
+        file_path
+        for file_path in file_paths
+        if _manifest_path(file_path) in source_files
+    ]
+
+
+def _manifest_paths_of_variants(file_paths: Iterable[str]) -> List[str]:
+    return [
+        _manifest_path(variant)
+        for file_path in file_paths
+        for variant in intermediate_file_variants(file_path)
+    ]
+
+
+def get_recorded_source_ids(file_paths: Iterable[str], connection: Connection):
+    """Returns the source_ids of the rows which were loaded from the given files. For
+    hand-off files this includes the rows loaded from the same file in another
+    intermediate format, which `write_intermediate` removed.
+    """
+    manifest_paths = _manifest_paths_of_variants(file_paths)
+    return [
+        source_id
+        for (source_id,) in connection.execute(
+            select(SourceFileManifestTable.source_id).where(
+                SourceFileManifestTable.file_path.in_(manifest_paths)
+            )
+        )
+    ]
+
+
+def get_source_files(source_ids: Iterable[int], connection: Connection) -> List[str]:
+    """Returns the files, as recorded in the manifest, the given sources were loaded
+    from.
+    """
+    return sorted(
+        {
+            file_path
+            for (file_path,) in connection.execute(
+                select(SourceFileManifestTable.file_path).where(
+                    SourceFileManifestTable.source_id.in_(
+                        [int(source_id) for source_id in source_ids]
+                    )
+                )
+            )
+        }
+    )
+
+
+def record_source_files(
+    file_source_ids: Dict[str, List[int]], connection: Connection
+) -> None:
+    """Replaces the manifest entries of the given files, and of the same hand-off files
+    in another intermediate format, with their current fingerprint, tied to the
+    source_ids of the rows loaded from each file.
+    """
+    records = []
+    for file_path, source_ids in file_source_ids.items():
+        stat = os.stat(file_path)
+        checksum = compute_file_checksum(file_path)
+        for source_id in set(source_ids):
+            records.append(
+                {
+                    "file_path": _manifest_path(file_path),
+                    "source_id": int(source_id),
+                    "file_size": stat.st_size,
+                    "file_mtime": stat.st_mtime,
+                    "checksum": checksum,
+                }
+            )
+    connection.execute(
+        delete(SourceFileManifestTable).where(
+            SourceFileManifestTable.file_path.in_(
+                _manifest_paths_of_variants(file_source_ids)
+            )
+        )
+    )
+    copy_dataframe_to_table(
+        pd.DataFrame(records), SourceFileManifestTable, connection=connection
+    )
+
+
+def insert_missing_source_metadata(
+    source_data: pd.DataFrame, connection: Connection
+) -> None:
+    """Inserts the rows of `source_data` whose source_id is not registered yet."""
+    existing_source_ids = {
+        source_id
+        for (source_id,) in connection.execute(
+            select(SourceMetaDataTable.source_id).where(
+                SourceMetaDataTable.source_id.in_(
+                    source_data[SourceMetaDataTable.source_id.name].tolist()
+                )
+            )
+        )
+    }
+    copy_dataframe_to_table(
+        source_data[
+            ~source_data[SourceMetaDataTable.source_id.name].isin(existing_source_ids)
+        ],
+        SourceMetaDataTable,
+        connection=connection,
+    )
+
+
+def delete_rows_of_sources(
+    table, source_ids: Iterable[int], connection: Connection
+) -> List[int]:
+    """Deletes all rows of a raw table which were loaded from the given sources.
+    Returns the hash_ids of the deleted rows, none for tables without hash_id.
+    """
+    source_ids = [int(source_id) for source_id in set(source_ids)]
+    if not source_ids:
+        return []
+    statement = delete(table).where(table.source_id.in_(source_ids))
+    hash_column = getattr(table, "hash_id", None)
+    if hash_column is not None:
+        statement = statement.returning(hash_column)
+    result = connection.execute(statement)
+    logger.info(
+        f"Deleted {result.rowcount} rows of {len(source_ids)} sources "
+        f"from {table.__tablename__}."
+    )
+    return result.scalars().all() if hash_column is not None else []
+
+
+def delete_child_rows_of_sources(
+    table, parent_table, key: str, source_ids: Iterable[int], connection: Connection
+) -> None:
+    """Deletes the rows of a raw table without source_id (e.g. PDF items) whose parent
+    rows, joined on `key`, were loaded from the given sources.
+    """
+    source_ids = [int(source_id) for source_id in set(source_ids)]
+    if not source_ids:
+        return
+    parent_keys = select(getattr(parent_table, key)).where(
+        parent_table.source_id.in_(source_ids)
+    )
+    result = connection.execute(
+        delete(table).where(getattr(table, key).in_(parent_keys))
+    )
+    logger.info(
+        f"Deleted {result.rowcount} rows of {len(source_ids)} sources "
+        f"from {table.__tablename__}."
+    )
+
+
+def delete_all_rows_of_sources(
+    source_ids: Iterable[int], connection: Connection
+) -> int:
+    """Deletes the rows of the given sources from every raw table through the index on
+    source_id. Rows of tables without source_id (e.g. PDF items) are deleted by the
+    foreign key to their parent rows first. The source metadata and the manifest are
+    kept. Returns the number of deleted rows.
+    """
+    source_ids = [int(source_id) for source_id in set(source_ids)]
+    deleted_rows = 0
+    # children before the tables they reference.
+    for table in reversed(Base.metadata.sorted_tables):
+        if table.schema != Schemas.RAW.value or table.name in (
+            SourceMetaDataTable.__tablename__,
+            SourceFileManifestTable.__tablename__,
+        ):
+            continue
+        if "source_id" in table.c:
+            condition = table.c.source_id.in_(source_ids)
+        else:
+            parent_keys = [
+                foreign_key
+                for foreign_key in table.foreign_keys
+                if "source_id" in foreign_key.column.table.c
+            ]
+            if not parent_keys:
+                continue
+            parent_key = parent_keys[0]
+            condition = parent_key.parent.in_(
+                select(parent_key.column).where(
+                    parent_key.column.table.c.source_id.in_(source_ids)
+                )
+            )
+        result = connection.execute(delete(table).where(condition))
+        if result.rowcount:
+            logger.info(f"Deleted {result.rowcount} rows from {table.name}.")
+        deleted_rows += result.rowcount
+    return deleted_rows
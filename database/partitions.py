@@ -0,0 +1,302 @@
+import re
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+from sqlalchemy import Index, bindparam, text
+from sqlalchemy.engine import Connection
+
+from database.loader import copy_dataframe_to_table
+from definitions.schemas import Schemas
+
+logger = logging.getLogger("root")
+
+
+def month_partition_name(table, month: pd.Period) -> str:
+    return f"{table.__tablename__}_y{month.year}m{month.month:02d}"
+
+
+def _quoted(schema: str, name: str) -> str:
+    return f'"{schema}"."{name}"'
+
+
+def _literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _unique_index_columns(table, column: str) -> List[str]:
+    """Columns of the unique index containing `column`, on a partitioned table they
+    include the partition keys.
+    """
+    for index in table.__table__.indexes:
+        if isinstance(index, Index) and index.unique and column in index.columns:
+            return [c.name for c in index.columns]
+    raise Exception(f"No unique index on {column} in {table.__tablename__}.")
+
+
+def _get_partitions(table, connection: Connection) -> List[str]:
+    return [
+        name
+        for (name,) in connection.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:parent)"
+            ),
+            {"parent": f"{table.__table__.schema}.{table.__tablename__}"},
+        )
+    ]
+
+
+def _is_unchanged(
+    month_data: pd.DataFrame,
+    partition: str,
+    table,
+    hash_column: str,
+    source_ids: List[int],
+    connection: Connection,
+) -> bool:
+    """A month is unchanged if the partition holds exactly the (hash, source_id) pairs
+    of the reloaded sources which loading the new data would give: a row in several
+    sources, e.g. a monthly and a yearly report, is only stored for the first one
+    and not at all if a source which is not reloaded already has it.
+    """
+    existing = pd.DataFrame(
+        connection.execute(
+            text(
+                f"SELECT {hash_column}, source_id "
+                f"FROM {_quoted(table.__table__.schema, partition)}"
+            )
+        ).all(),
+        columns=[hash_column, "source_id"],
+    )
+    replaced = existing["source_id"].isin(source_ids)
+    new = month_data[[hash_column, "source_id"]].drop_duplicates(hash_column)
+    new = new[~new[hash_column].isin(existing.loc[~replaced, hash_column])]
+    return replaced.sum() == len(new) and set(
+        zip(existing.loc[replaced, hash_column], existing.loc[replaced, "source_id"])
+    ) == set(zip(new[hash_column].astype("int64"), new["source_id"].astype("int64")))
+
+
+def _build_month_partition(
+    month_data: pd.DataFrame,
+    month: pd.Period,
+    table,
+    existing_partition: Optional[str],
+    source_ids: List[int],
+    time_column: str,
+    list_column: Optional[str],
+    upsert_keys: List[str],
+    connection: Connection,
+) -> Tuple[List[str], int]:
+    """Creates the partition of a month in the staging schema with the columns,
+    defaults and indexes of the table, copies the rows of other sources from the
+    existing partition and loads `month_data`. Returns the names of the created tables
+    and the number of rows of `month_data` which were inserted.
+    """
+    parent = _quoted(table.__table__.schema, table.__tablename__)
+    staging_schema = Schemas.RAW_STAGING.value
+    name = month_partition_name(table, month)
+    staging_table = _quoted(staging_schema, name)
+    partition_by = f" PARTITION BY LIST ({list_column})" if list_column else ""
+    connection.execute(
+        f"CREATE TABLE {staging_table} (LIKE {parent} INCLUDING DEFAULTS "
+        f"INCLUDING CONSTRAINTS INCLUDING INDEXES){partition_by}"
+    )
+    created_tables = [name]
+    if list_column:
+        for value in sorted(month_data[list_column].dropna().unique()):
+            sub_partition = f"{name}_{re.sub(r'[^a-z0-9]', '', str(value).lower())}"
+            connection.execute(
+                f"CREATE TABLE {_quoted(staging_schema, sub_partition)} "
+                f"PARTITION OF {staging_table} FOR VALUES IN ({_literal(value)})"
+            )
+            created_tables.append(sub_partition)
+
+    if existing_partition:
+        connection.execute(
+            text(
+                f"INSERT INTO {staging_table} "
+                f"SELECT * FROM {_quoted(table.__table__.schema, existing_partition)} "
+                "WHERE source_id IS NULL OR source_id NOT IN :source_ids"
+            ).bindparams(bindparam("source_ids", expanding=True)),
+            {"source_ids": source_ids},
+        )
+    inserted_rows = copy_dataframe_to_table(
+        month_data,
+        table,
+        connection=connection,
+        upsert_keys=upsert_keys,
+        table_name=staging_table,
+    )
+
+    # the constraint matches the partition bounds, attaching does not scan the rows.
+    start, end = month.start_time, (month + 1).start_time
+    connection.execute(
+        f"ALTER TABLE {staging_table} ADD CONSTRAINT {name}_bounds CHECK "
+        f"({time_column} IS NOT NULL AND {time_column} >= '{start}' "
+        f"AND {time_column} < '{end}')"
+    )
+    return created_tables, inserted_rows
+
+
+def _swap_month_partition(
+    table,
+    month: pd.Period,
+    created_tables: List[str],
+    existing_partition: Optional[str],
+    connection: Connection,
+) -> None:
+    schema = table.__table__.schema
+    parent = _quoted(schema, table.__tablename__)
+    name = month_partition_name(table, month)
+    if existing_partition:
+        connection.execute(
+            f"ALTER TABLE {parent} DETACH PARTITION {_quoted(schema, existing_partition)}"
+        )
+        connection.execute(f"DROP TABLE {_quoted(schema, existing_partition)}")
+    for created_table in created_tables:
+        connection.execute(
+            f"ALTER TABLE {_quoted(Schemas.RAW_STAGING.value, created_table)} "
+            f"SET SCHEMA {schema}"
+        )
+    start, end = month.start_time, (month + 1).start_time
+    connection.execute(
+        f"ALTER TABLE {parent} ATTACH PARTITION {_quoted(schema, name)} "
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+    connection.execute(
+        f"ALTER TABLE {_quoted(schema, name)} DROP CONSTRAINT {name}_bounds"
+    )
+
+
+def _lock_tables_for_swaps(table, connection: Connection) -> None:
+    """Detaching, dropping and attaching partitions lock the table and, through the
+    foreign keys of its partitions, the referenced tables in ACCESS EXCLUSIVE mode
+    until commit. The other ingestors lock the source metadata before their own
+    tables, so the referenced tables are locked first, then the table, once before
+    all swaps. The swaps wait for the running ingestors which inserted source
+    metadata to commit, ingestors starting meanwhile wait for the swaps.
+    """
+    referenced_tables = sorted(
+        {
+            _quoted(foreign_key.column.table.schema, foreign_key.column.table.name)
+            for foreign_key in table.__table__.foreign_keys
+        }
+    )
+    for locked_table in [
+        *referenced_tables,
+        _quoted(table.__table__.schema, table.__tablename__),
+    ]:
+        connection.execute(f"LOCK TABLE {locked_table} IN ACCESS EXCLUSIVE MODE")
+
+
+def swap_month_partitions(
+    table,
+    built_partitions: Dict[pd.Period, List[str]],
+    existing_partitions: Set[str],
+    connection: Connection,
+) -> None:
+    """Swaps the partitions built in the staging schema in for the existing partitions
+    of their months, see `_lock_tables_for_swaps` for the locks taken.
+    """
+    if not built_partitions:
+        return
+    _lock_tables_for_swaps(table, connection)
+    for month, created_tables in built_partitions.items():
+        partition = month_partition_name(table, month)
+        _swap_month_partition(
+            table,
+            month,
+            created_tables,
+            partition if partition in existing_partitions else None,
+            connection,
+        )
+
+
+def replace_month_partitions(
+    data: pd.DataFrame,
+    table,
+    source_ids: Iterable[int],
+    connection: Connection,
+    time_column: str,
+    list_column: Optional[str] = None,
+    hash_column: str = "hash_id",
+) -> int:
+    """Replaces the rows of the given sources in a table partitioned by month of
+    `time_column` with the rows of `data`, instead of deleting and inserting them.
+
+    Each month of `data` is built as a new partition in the staging schema and swapped
+    in for the existing partition (detach, drop, attach), so the table is only locked
+    for the swaps at the end and no dead rows are left behind. The swaps also lock the
+    tables referenced by foreign keys, e.g. the source metadata, until commit, see
+    `_lock_tables_for_swaps`. Partitions for new months are created the same way.
+    `data` must not have rows without `time_column`. If `list_column` is given, the new partitions
+    are sub-partitioned by its values. Months whose rows did not change are kept,
+    rows of the sources in months which are not in `data` anymore are deleted.
+    Returns the number of rows inserted, which excludes the rows of unchanged months
+    and the rows skipped as duplicates of another source.
+    """
+    source_ids = [int(source_id) for source_id in set(source_ids)]
+    table_name = table.__tablename__
+    start_time = time.perf_counter()
+    months = pd.to_datetime(data[time_column], utc=True)
+    if months.isna().any():
+        raise Exception(
+            f"{months.isna().sum()} rows without {time_column} cannot be loaded into "
+            f"the partitions of {table_name}."
+        )
+    months = months.dt.tz_convert(None).dt.to_period("M")
+
+    month_starts = [month.start_time.to_pydatetime() for month in months.unique()]
+    result = connection.execute(
+        text(
+            f"DELETE FROM {_quoted(table.__table__.schema, table_name)} "
+            f"WHERE source_id IN :source_ids "
+            f"AND date_trunc('month', {time_column}) NOT IN :month_starts"
+        ).bindparams(
+            bindparam("source_ids", expanding=True),
+            bindparam("month_starts", expanding=True),
+        ),
+        {"source_ids": source_ids, "month_starts": month_starts},
+    )
+    if result.rowcount:
+        logger.info(
+            f"Deleted {result.rowcount} rows of months no longer in the sources "
+            f"from {table_name}."
+        )
+
+    # rows in several sources, e.g. monthly and yearly reports, are loaded once.
+    upsert_keys = _unique_index_columns(table, hash_column)
+    existing_partitions = set(_get_partitions(table, connection))
+    built_partitions: Dict[pd.Period, List[str]] = {}
+    unchanged_months = 0
+    inserted_rows = 0
+    for month, month_data in data.groupby(months, sort=True):
+        partition = month_partition_name(table, month)
+        existing_partition = partition if partition in existing_partitions else None
+        if existing_partition and _is_unchanged(
+            month_data, partition, table, hash_column, source_ids, connection
+        ):
+            unchanged_months += 1
+            continue
+        built_partitions[month], month_inserted_rows = _build_month_partition(
+            month_data,
+            month,
+            table,
+            existing_partition,
+            source_ids,
+            time_column,
+            list_column,
+            upsert_keys,
+            connection,
+        )
+        inserted_rows += month_inserted_rows
+
+    swap_month_partitions(table, built_partitions, existing_partitions, connection)
+    logger.info(
+        f"Replaced {len(built_partitions)} month partitions of {table_name}, kept "
+        f"{unchanged_months} unchanged, in {time.perf_counter() - start_time:.2f}s."
+    )
+    return inserted_rows
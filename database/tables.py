@@ -6,6 +6,7 @@ from sqlalchemy import (
     ForeignKey,
     Float,
     Date,
+    Index,
 )
 from sqlalchemy.sql import func
 
@@ -33,9 +34,35 @@ class SourceMetaDataTable(Base):
     )
 
 
+class SourceFileManifestTable(Base):
+    __tablename__ = "source_file_manifest"
+    __table_args__ = {"schema": Schemas.RAW.value}
+
+    file_path = Column(String, primary_key=True)
+    source_id = Column(
+        BIGINT, ForeignKey(SourceMetaDataTable.source_id), primary_key=True
+    )
+    file_size = Column(BIGINT, nullable=False)
+    file_mtime = Column(Float, nullable=False)
+    checksum = Column(String, nullable=False)
+    date_inserted = Column(
+        DateTime,
+        server_default=func.current_timestamp(),
+        nullable=False,
+    )
+
+
 class ExternalPDFReimbursementHeaders(Base):
     __tablename__ = "external_reimbursement_headers"
-    __table_args__ = {"schema": Schemas.RAW.value}
+    __table_args__ = (
+        Index("ix_external_reimbursement_headers_order_number", "order_number"),
+        Index(
+            "ix_external_reimbursement_headers_reimbursement_number",
+            "reimbursement_number",
+        ),
+        Index("ix_external_reimbursement_headers_source_id", "source_id"),
+        {"schema": Schemas.RAW.value},
+    )
 
     unique_id = Column(BIGINT, primary_key=True, autoincrement=True, unique=True)
     internal_id = Column(BIGINT, unique=True)
@@ -51,7 +78,6 @@ class ExternalPDFReimbursementHeaders(Base):
     date_filename = Column(Date)
     reimbursement_number_filename = Column(String)
     order_number_filename = Column(String)
-    pdf_text = Column(String)
     notes = Column(String)
     source_id = Column(BIGINT, ForeignKey(SourceMetaDataTable.source_id))
     date_inserted = Column(
@@ -63,10 +89,13 @@ class ExternalPDFReimbursementHeaders(Base):
 
 class ExternalPDFReimbursementItems(Base):
     __tablename__ = "external_reimbursement_items"
-    __table_args__ = {"schema": Schemas.RAW.value}
+    __table_args__ = (
+        Index("ix_external_reimbursement_items_internal_id", "internal_id"),
+        {"schema": Schemas.RAW.value},
+    )
 
     unique_id = Column(BIGINT, primary_key=True, autoincrement=True, unique=True)
-    hash_id = Column(BIGINT, nullable=False)
+    hash_id = Column(BIGINT, nullable=False, unique=True, index=True)
     internal_id = Column(
         BIGINT, ForeignKey(ExternalPDFReimbursementHeaders.internal_id)
     )
@@ -80,9 +109,27 @@ class ExternalPDFReimbursementItems(Base):
     total_price = Column(Float)
 
 
+class ExternalPDFReimbursementTexts(Base):
+    __tablename__ = "external_reimbursement_pdf_texts"
+    __table_args__ = {"schema": Schemas.RAW.value}
+
+    internal_id = Column(
+        BIGINT,
+        ForeignKey(ExternalPDFReimbursementHeaders.internal_id),
+        primary_key=True,
+    )
+    # full text of the PDF, stored once per document and compressed when TOASTed.
+    pdf_text = Column(String, nullable=False, info={"compression": "lz4"})
+
+
 class ExternalPDFInvoiceHeaders(Base):
     __tablename__ = "external_invoice_headers"
-    __table_args__ = {"schema": Schemas.RAW.value}
+    __table_args__ = (
+        Index("ix_external_invoice_headers_order_number", "order_number"),
+        Index("ix_external_invoice_headers_invoice_number", "invoice_number"),
+        Index("ix_external_invoice_headers_source_id", "source_id"),
+        {"schema": Schemas.RAW.value},
+    )
 
     unique_id = Column(BIGINT, primary_key=True, autoincrement=True, unique=True)
     internal_id = Column(BIGINT, unique=True)
@@ -98,7 +145,6 @@ class ExternalPDFInvoiceHeaders(Base):
     date_filename = Column(Date)
     invoice_number_filename = Column(String)
     order_number_filename = Column(String)
-    pdf_text = Column(String)
     notes = Column(String)
     source_id = Column(BIGINT, ForeignKey(SourceMetaDataTable.source_id))
     date_inserted = Column(
@@ -110,10 +156,13 @@ class ExternalPDFInvoiceHeaders(Base):
 
 class ExternalPDFInvoiceItems(Base):
     __tablename__ = "external_invoice_items"
-    __table_args__ = {"schema": Schemas.RAW.value}
+    __table_args__ = (
+        Index("ix_external_invoice_items_internal_id", "internal_id"),
+        {"schema": Schemas.RAW.value},
+    )
 
     unique_id = Column(BIGINT, primary_key=True, autoincrement=True, unique=True)
-    hash_id = Column(BIGINT, nullable=False)
+    hash_id = Column(BIGINT, nullable=False, unique=True, index=True)
     internal_id = Column(BIGINT, ForeignKey(ExternalPDFInvoiceHeaders.internal_id))
     invoice_number = Column(String)
     item_nr = Column(Integer)
@@ -125,12 +174,38 @@ class ExternalPDFInvoiceItems(Base):
     total_price = Column(Float)
 
 
+class ExternalPDFInvoiceTexts(Base):
+    __tablename__ = "external_invoice_pdf_texts"
+    __table_args__ = {"schema": Schemas.RAW.value}
+
+    internal_id = Column(
+        BIGINT, ForeignKey(ExternalPDFInvoiceHeaders.internal_id), primary_key=True
+    )
+    # full text of the PDF, stored once per document and compressed when TOASTed.
+    pdf_text = Column(String, nullable=False, info={"compression": "lz4"})
+
+
 class ExternalInvoices(Base):
     __tablename__ = "external_invoices"
-    __table_args__ = {"schema": Schemas.RAW.value}
+    __table_args__ = (
+        Index("ix_external_invoices_order_number", "order_number"),
+        Index("ix_external_invoices_invoice_number", "invoice_number"),
+        Index("ix_external_invoices_source_id", "source_id"),
+        Index(
+            "brin_external_invoices_invoice_create_date",
+            "invoice_create_date",
+            postgresql_using="brin",
+        ),
+        Index(
+            "brin_external_invoices_date_inserted",
+            "date_inserted",
+            postgresql_using="brin",
+        ),
+        {"schema": Schemas.RAW.value},
+    )
 
     unique_id = Column(BIGINT, primary_key=True, autoincrement=True, unique=True)
-    hash_id = Column(BIGINT)
+    hash_id = Column(BIGINT, unique=True, index=True)
     record_type = Column(String)
     invoice_number = Column(String)
     currency = Column(String)
@@ -160,10 +235,28 @@ class ExternalInvoices(Base):
 
 class ExternalReimbursements(Base):
     __tablename__ = "external_reimbursements"
-    __table_args__ = {"schema": Schemas.RAW.value}
+    __table_args__ = (
+        Index("ix_external_reimbursements_order_number", "order_number"),
+        Index(
+            "ix_external_reimbursements_reimbursement_number", "reimbursement_number"
+        ),
+        Index("ix_external_reimbursements_invoice_number", "invoice_number"),
+        Index("ix_external_reimbursements_source_id", "source_id"),
+        Index(
+            "brin_external_reimbursements_invoice_create_date",
+            "invoice_create_date",
+            postgresql_using="brin",
+        ),
+        Index(
+            "brin_external_reimbursements_date_inserted",
+            "date_inserted",
+            postgresql_using="brin",
+        ),
+        {"schema": Schemas.RAW.value},
+    )
 
     unique_id = Column(BIGINT, primary_key=True, autoincrement=True, unique=True)
-    hash_id = Column(BIGINT)
+    hash_id = Column(BIGINT, unique=True, index=True)
     record_type = Column(String)
     reimbursement_number = Column(String)
     currency = Column(String)
@@ -188,12 +281,44 @@ class ExternalReimbursements(Base):
 
 class AmazonSalesTable(Base):
     __tablename__ = "amazon_sales_data"
-    __table_args__ = {"schema": Schemas.RAW.value}
+    __table_args__ = (
+        # the combined CSV is ordered by country and file, not by time, so date_time
+        # gets a B-tree. The covering index answers the per SKU aggregates of a
+        # country and period from the index alone.
+        Index("ix_amazon_sales_data_date_time", "date_time"),
+        Index("ix_amazon_sales_data_sku", "sku"),
+        Index("ix_amazon_sales_data_order_id", "order_id"),
+        Index("ix_amazon_sales_data_source_id", "source_id"),
+        Index(
+            "ix_amazon_sales_data_country_code_date_time",
+            "country_code",
+            "date_time",
+            postgresql_include=["sku", "type", "quantity", "total_price"],
+        ),
+        Index(
+            "brin_amazon_sales_data_date_inserted",
+            "date_inserted",
+            postgresql_using="brin",
+        ),
+        # unique keys of a partitioned table contain the partition keys, the month
+        # partitions may be sub-partitioned by country, see `database.partitions`.
+        Index(
+            "ix_amazon_sales_data_hash_id",
+            "hash_id",
+            "date_time",
+            "country_code",
+            unique=True,
+        ),
+        {
+            "schema": Schemas.RAW.value,
+            "postgresql_partition_by": "RANGE (date_time)",
+        },
+    )
 
-    unique_id = Column(BIGINT, primary_key=True, autoincrement=True, unique=True)
+    unique_id = Column(BIGINT, primary_key=True, autoincrement=True)
     hash_id = Column(BIGINT, nullable=False)
     date_time_original = Column(String)
-    date_time = Column(DateTime)
+    date_time = Column(DateTime, primary_key=True)
     settlement_id = Column(String)
     type = Column(String)
     order_id = Column(String)
@@ -202,7 +327,7 @@ class AmazonSalesTable(Base):
     total_price = Column(Float)
     marketplace = Column(String)
     fulfilment = Column(String)
-    country_code = Column(String(2))
+    country_code = Column(String(2), primary_key=True)
     currency = Column(String(3))
     source_file = Column(String)
     source_id = Column(BIGINT, ForeignKey(SourceMetaDataTable.source_id))
@@ -215,7 +340,17 @@ class AmazonSalesTable(Base):
 
 class ReturnedFromAmazon(Base):
     __tablename__ = "returned_from_amazon"
-    __table_args__ = {"schema": Schemas.RAW.value}
+    __table_args__ = (
+        Index("ix_returned_from_amazon_order_id", "order_id"),
+        Index("ix_returned_from_amazon_sku", "sku"),
+        Index("ix_returned_from_amazon_source_id", "source_id"),
+        Index(
+            "brin_returned_from_amazon_request_date",
+            "request_date",
+            postgresql_using="brin",
+        ),
+        {"schema": Schemas.RAW.value},
+    )
 
     unique_id = Column(BIGINT, primary_key=True, autoincrement=True, unique=True)
     request_date = Column(DateTime)
@@ -244,7 +379,10 @@ class ReturnedFromAmazon(Base):
 
 class ArticleShipmentInfo(Base):
     __tablename__ = "article_shipment_info"
-    __table_args__ = {"schema": Schemas.RAW.value}
+    __table_args__ = (
+        Index("ix_article_shipment_info_source_id", "source_id"),
+        {"schema": Schemas.RAW.value},
+    )
 
     unique_id = Column(BIGINT, primary_key=True, autoincrement=True, unique=True)
     sku = Column(String, nullable=False)
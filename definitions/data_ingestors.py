@@ -1,16 +1,97 @@
-from enum import Enum
-
-from ingestors.source_data_ingestors.amazon_sales_data import AmazonSalesSourceIngestor
-from ingestors.source_data_ingestors.external_pdfs_ingestor import (
-    ExternalInvoicesReimbursementsIngestor,
-)
-
-
-class SourceDataIngestors(Enum):
-    AMAZON_SALES_INGESTOR = AmazonSalesSourceIngestor()
-    EXTERNAL_REMIBURSEMENT_PDFS_INGESTOR = ExternalInvoicesReimbursementsIngestor(
-        file_type="GS"
-    )
-    EXTERNAL_INVOICE_PDFS_INGESTOR = ExternalInvoicesReimbursementsIngestor(
-        file_type="RE"
-    )
+from fnmatch import fnmatchcase
+from functools import partial
+from importlib import import_module
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class IngestorDefinition:
+    """An ingestor declared by the module and name of its class, the module is only
+    imported when the ingestor is loaded. `file_patterns` match the lower case paths
+    of the files the ingestor loads one source at a time, as recorded in the manifest.
+    """
+
+    name: str
+    module: str
+    class_name: str
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    file_patterns: Tuple[str, ...] = ()
+
+    def loads_file(self, file_path: str) -> bool:
+        return any(
+            fnmatchcase(file_path.lower(), pattern) for pattern in self.file_patterns
+        )
+
+    def load(self) -> Callable[[], Any]:
+        """The ingestor class bound to its arguments, calling it runs the ingestion."""
+        ingestor_class = getattr(import_module(self.module), self.class_name)
+        return partial(ingestor_class, **self.kwargs)
+
+
+_INGESTORS_PACKAGE = "ingestors.source_data_ingestors"
+
+SOURCE_DATA_INGESTORS = [
+    # the sales reports are loaded together from one combined file into partitions of
+    # all reports, they cannot be reloaded one report at a time.
+    IngestorDefinition(
+        "amazon_sales",
+        f"{_INGESTORS_PACKAGE}.amazon_sales_data",
+        "AmazonSalesSourceIngestor",
+    ),
+    IngestorDefinition(
+        "external_pdfs_RE",
+        f"{_INGESTORS_PACKAGE}.external_pdfs_ingestor",
+        "ExternalPDFInvoicesReimbursementsIngestor",
+        {"file_type": "RE"},
+        ("data/external_invoices/*/re/*",),
+    ),
+    IngestorDefinition(
+        "external_pdfs_GS",
+        f"{_INGESTORS_PACKAGE}.external_pdfs_ingestor",
+        "ExternalPDFInvoicesReimbursementsIngestor",
+        {"file_type": "GS"},
+        ("data/external_invoices/*/gs/*",),
+    ),
+    IngestorDefinition(
+        "external_invoices_RE",
+        f"{_INGESTORS_PACKAGE}.external_invoices_ingestor",
+        "ExternalInvoicesReimbursementsIngestor",
+        {"file_type": "RE"},
+        ("data/external_invoices/*rgexport*",),
+    ),
+    IngestorDefinition(
+        "external_invoices_GS",
+        f"{_INGESTORS_PACKAGE}.external_invoices_ingestor",
+        "ExternalInvoicesReimbursementsIngestor",
+        {"file_type": "GS"},
+        ("data/external_invoices/*gsexport*",),
+    ),
+    IngestorDefinition(
+        "returns_from_amazon",
+        f"{_INGESTORS_PACKAGE}.remissions_from_amazon_ingestor",
+        "ReturnsFromAmazonIngestor",
+        file_patterns=("data/returns_amazon/remissions_from_amazon.csv",),
+    ),
+    IngestorDefinition(
+        "article_shipment_info",
+        f"{_INGESTORS_PACKAGE}.article_shipment_info_ingestor",
+        "ArticleShipmentInfoIngestor",
+        file_patterns=("data/amazon_sales/220914_sku_artikelpreise_versandpreise.csv",),
+    ),
+]
+SOURCE_DATA_INGESTOR_NAMES = [ingestor.name for ingestor in SOURCE_DATA_INGESTORS]
+
+
+def get_ingestor_definitions(
+    names: Optional[List[str]] = None,
+) -> List[IngestorDefinition]:
+    """The definitions of the given ingestors in registry order, all if None."""
+    if names is None:
+        return list(SOURCE_DATA_INGESTORS)
+    unknown = sorted(set(names) - set(SOURCE_DATA_INGESTOR_NAMES))
+    if unknown:
+        raise Exception(
+            f"Unknown ingestors: {unknown}, known: {SOURCE_DATA_INGESTOR_NAMES}"
+        )
+    return [ingestor for ingestor in SOURCE_DATA_INGESTORS if ingestor.name in names]
@@ -4,3 +4,5 @@ from enum import Enum
 class Schemas(Enum):
     RAW = "raw"
     DWH = "dwh"
+    # partitions are built here before they are attached to their table in raw.
+    RAW_STAGING = "raw_staging"
@@ -1,20 +1,11 @@
 import sys
+import argparse
+from functools import partial
+from typing import List, Optional
 
-from database.base import db_session
-from database.db import init_db
-
-from ingestors.source_data_ingestors.amazon_sales_data import AmazonSalesSourceIngestor
-from ingestors.source_data_ingestors.external_pdfs_ingestor import (
-    ExternalPDFInvoicesReimbursementsIngestor,
-)
-from ingestors.source_data_ingestors.external_invoices_ingestor import (
-    ExternalInvoicesReimbursementsIngestor,
-)
-from ingestors.source_data_ingestors.remissions_from_amazon_ingestor import (
-    ReturnsFromAmazonIngestor,
-)
-from ingestors.source_data_ingestors.article_shipment_info_ingestor import (
-    ArticleShipmentInfoIngestor,
+from definitions.data_ingestors import (
+    SOURCE_DATA_INGESTOR_NAMES,
+    get_ingestor_definitions,
 )
 
 import logging
@@ -27,21 +18,124 @@ logging.basicConfig(
 logger = logging.getLogger("root")
 
 
-def setup():
-    logger.info("Initialising database...")
+def get_ingestion_tasks(full_reload: bool = False, sources: Optional[List[str]] = None):
+    """The database initialisation, which also creates the source metadata table, runs
+    first. The ingestors load disjoint tables and only share the idempotent insert of
+    their own rows into the source metadata, so they run concurrently afterwards.
+    The dwh tables are refreshed last from the rows all ingestors committed.
+    Only the modules of the given `sources` (all if None) are imported.
+    """
+    from database.db import init_db
+    from ingestors.scheduler import Task
+    from transformations.dwh_refresh import refresh_dwh
+
+    init_task = Task("init_db", partial(init_db, full_reload=full_reload))
+    # loaded here and not in the worker threads, which would import them concurrently.
+    ingestion_tasks = [
+        Task(ingestor.name, ingestor.load(), [init_task.name])
+        for ingestor in get_ingestor_definitions(sources)
+    ]
+    dwh_task = Task("dwh_refresh", refresh_dwh, [task.name for task in ingestion_tasks])
+    return [init_task] + ingestion_tasks + [dwh_task]
 
-    init_db()
 
-    AmazonSalesSourceIngestor()
-    ExternalPDFInvoicesReimbursementsIngestor(file_type="RE")
-    ExternalPDFInvoicesReimbursementsIngestor(file_type="GS")
-    ExternalInvoicesReimbursementsIngestor(file_type="RE")
-    ExternalInvoicesReimbursementsIngestor(file_type="GS")
-    ReturnsFromAmazonIngestor()
-    ArticleShipmentInfoIngestor()
+def setup(
+    full_reload: bool = False,
+    max_concurrency: int = 4,
+    sources: Optional[List[str]] = None,
+):
+    # pandas, SQLAlchemy and the ingestors are imported once a run starts, not for
+    # `--help` or `--list-sources`.
+    from database.base import db_session
+    from ingestors.metrics import run_metrics
+    from ingestors.scheduler import TaskStatus, run_tasks, log_task_summary
+
+    logger.info("Initialising database...")
+
+    results = run_tasks(get_ingestion_tasks(full_reload, sources), max_concurrency)
+    log_task_summary(results)
+    run_metrics.log_summary()
+    run_metrics.write_report(
+        "ingestion",
+        tasks=[
+            {
+                "name": result.name,
+                "status": result.status.value,
+                "seconds": result.seconds,
+            }
+            for result in results.values()
+        ],
+    )
 
     db_session.commit()
 
+    failed = [
+        name
+        for name, result in results.items()
+        if result.status != TaskStatus.succeeded
+    ]
+    if failed:
+        raise Exception(f"Ingestion did not complete for: {failed}")
+
+
+def reload(source: str):
+    """Loads one source again, see `reload_source`, and refreshes the dwh tables."""
+    from ingestors.metrics import run_metrics
+    from ingestors.reload import reload_source
+    from transformations.dwh_refresh import refresh_dwh
+
+    reload_source(source)
+    refresh_dwh()
+    run_metrics.log_summary()
+    run_metrics.write_report("reload")
+
 
 if __name__ == "__main__":
-    setup()
+    parser = argparse.ArgumentParser(description="Load source data into the database.")
+    parser.add_argument(
+        "--full-reload",
+        action="store_true",
+        help="Drop all schemas and load every source file again.",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=4,
+        help="Number of ingestors loading data at the same time, each on its own "
+        "pooled connection.",
+    )
+    parser.add_argument(
+        "--sources",
+        nargs="+",
+        choices=SOURCE_DATA_INGESTOR_NAMES,
+        metavar="SOURCE",
+        help="Only run the ingestors of these sources (default: all), see "
+        "--list-sources.",
+    )
+    parser.add_argument(
+        "--list-sources",
+        action="store_true",
+        help="Print the names of the ingestors and exit.",
+    )
+    parser.add_argument(
+        "--reload-source",
+        metavar="SOURCE_ID_OR_FILENAME",
+        help="Delete the rows of a single source, e.g. a monthly export or a PDF "
+        "folder like 202102/RE, and load its files again.",
+    )
+    args = parser.parse_args()
+    if args.list_sources:
+        print("\n".join(SOURCE_DATA_INGESTOR_NAMES))
+        sys.exit(0)
+    if args.full_reload and args.sources:
+        parser.error("--full-reload drops the data of all sources, not only --sources")
+    if args.reload_source:
+        if args.full_reload or args.sources:
+            parser.error("--reload-source only loads one source")
+        reload(args.reload_source)
+        sys.exit(0)
+    setup(
+        full_reload=args.full_reload,
+        max_concurrency=args.max_concurrency,
+        sources=args.sources,
+    )
@@ -10,9 +10,9 @@ class BaseIngestor:
     source_name: SourceNames
 
     @abstractmethod
-    def add_source_metadata():
+    def add_source_metadata(self, connection):
         pass
 
     @abstractmethod
-    def insert_into_db():
+    def insert_into_db(self, connection):
         pass
@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import time
+import resource
+import logging
+import datetime
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("root")
+
+# the stages of an ingestor or extraction script which are timed.
+READ = "read"
+TRANSFORM = "transform"
+HASH = "hash"
+METADATA = "metadata"
+LOAD = "load"
+WRITE = "write"
+STAGES = [READ, TRANSFORM, HASH, METADATA, LOAD, WRITE]
+
+METRICS_DIR = os.environ.get("METRICS_DIR") or os.path.join("data", "metrics")
+PROMETHEUS_PREFIX = "carpet_invoices"
+
+
+@dataclass
+class StageMetrics:
+    source: str
+    stage: str
+    seconds: float = 0.0
+    rows_in: int = 0
+    rows_out: int = 0
+    bytes_read: int = 0
+    calls: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        rows = self.rows_in or self.rows_out
+        return rows / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "rows_per_second": self.rows_per_second}
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident memory of the process so far."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS.
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+class RunMetrics:
+    """Collects the wall time, rows and bytes of each stage per source of a run. The
+    ingestors record their stages from several threads, stages which are recorded
+    more than once for a source, e.g. once per file, are summed up.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[Tuple[str, str], StageMetrics] = {}
+
+    @contextmanager
+    def stage(
+        self, source: str, stage: str, rows_in: int = 0, bytes_read: int = 0
+    ) -> Iterator[StageMetrics]:
+        """Times the block, which can set the `rows_in`, `rows_out` and `bytes_read`
+        of the yielded metrics. The stage is only recorded if the block succeeds.
+        """
+        metrics = StageMetrics(source, stage, rows_in=rows_in, bytes_read=bytes_read)
+        start = time.perf_counter()
+        yield metrics
+        metrics.seconds = time.perf_counter() - start
+        metrics.calls = 1
+        self.add([metrics])
+
+    def add(self, stages: Iterable[StageMetrics]) -> None:
+        """Adds stages recorded elsewhere, e.g. in a worker process."""
+        with self._lock:
+            for metrics in stages:
+                key = (metrics.source, metrics.stage)
+                if key not in self._stages:
+                    self._stages[key] = StageMetrics(metrics.source, metrics.stage)
+                total = self._stages[key]
+                total.seconds += metrics.seconds
+                total.rows_in += metrics.rows_in
+                total.rows_out += metrics.rows_out
+                total.bytes_read += metrics.bytes_read
+                total.calls += metrics.calls
+
+    @property
+    def stages(self) -> List[StageMetrics]:
+        """The stages ordered by source and position in the pipeline."""
+        with self._lock:
+            return sorted(
+                self._stages.values(),
+                key=lambda metrics: (
+                    metrics.source,
+                    STAGES.index(metrics.stage)
+                    if metrics.stage in STAGES
+                    else len(STAGES),
+                    metrics.stage,
+                ),
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+    def log_summary(self) -> None:
+        logger.info("Stage summary:")
+        for metrics in self.stages:
+            logger.info(
+                f"\t{metrics.source:<30} {metrics.stage:<10} {metrics.seconds:8.2f}s "
+                f"{metrics.rows_in:>10} in {metrics.rows_out:>10} out "
+                f"{metrics.rows_per_second:12,.0f} rows/s"
+            )
+
+    def write_report(
+        self,
+        run_name: str,
+        tasks: Optional[List[dict]] = None,
+        directory: str = METRICS_DIR,
+    ) -> Tuple[str, str]:
+        """Writes the stages, the `tasks` of the scheduler if given and the peak memory
+        of the process as `<run_name>.json` and in the Prometheus textfile format as
+        `<run_name>.prom` into `directory`. Returns the paths of both files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        finished_at = datetime.datetime.now(datetime.timezone.utc)
+        stages = self.stages
+        peak_rss = peak_rss_bytes()
+        json_path = os.path.join(directory, f"{run_name}.json")
+        _write_atomically(
+            json_path,
+            json.dumps(
+                {
+                    "run": run_name,
+                    "finished_at": finished_at.isoformat(),
+                    "peak_rss_bytes": peak_rss,
+                    "stages": [metrics.to_dict() for metrics in stages],
+                    "tasks": tasks or [],
+                },
+                indent=2,
+            ),
+        )
+        prometheus_path = os.path.join(directory, f"{run_name}.prom")
+        _write_atomically(
+            prometheus_path,
+            prometheus_text(
+                run_name, stages, tasks or [], finished_at.timestamp(), peak_rss
+            ),
+        )
+        logger.info(
+            f"Saved metrics of run {run_name} to: {json_path}, peak memory: "
+            f"{peak_rss / 2**20:.0f} MiB"
+        )
+        return json_path, prometheus_path
+
+
+def _write_atomically(path: str, content: str) -> None:
+    # the textfile collector of the node exporter must not read half written files.
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w") as file:
+        file.write(content)
+    os.replace(temporary_path, path)
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_label_value(value)}"' for name, value in labels.items())
+
+
+def prometheus_text(
+    run_name: str,
+    stages: List[StageMetrics],
+    tasks: List[dict],
+    finished_at: float,
+    peak_rss: int,
+) -> str:
+    """The stages and tasks of a run as gauges in the Prometheus text format."""
+    stage_gauges = [
+        ("stage_seconds", "Wall time of the stage.", "seconds"),
+        ("stage_rows_in", "Rows going into the stage.", "rows_in"),
+        ("stage_rows_out", "Rows coming out of the stage.", "rows_out"),
+        ("stage_bytes_read", "Bytes of the files read in the stage.", "bytes_read"),
+        ("stage_rows_per_second", "Rows per second of the stage.", "rows_per_second"),
+    ]
+    lines = []
+    for name, help_text, attribute in stage_gauges:
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} gauge")
+        for metrics in stages:
+            labels = _labels(run=run_name, source=metrics.source, stage=metrics.stage)
+            lines.append(
+                f"{PROMETHEUS_PREFIX}_{name}{{{labels}}} "
+                f"{float(getattr(metrics, attribute))!r}"
+            )
+    if tasks:
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_task_seconds Wall time of the task.")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_task_seconds gauge")
+        for task in tasks:
+            labels = _labels(run=run_name, task=task["name"], status=task["status"])
+            lines.append(
+                f"{PROMETHEUS_PREFIX}_task_seconds{{{labels}}} {float(task['seconds'])!r}"
+            )
+    lines.append(
+        f"# HELP {PROMETHEUS_PREFIX}_run_peak_rss_bytes "
+        "Peak resident memory of the process."
+    )
+    lines.append(f"# TYPE {PROMETHEUS_PREFIX}_run_peak_rss_bytes gauge")
+    lines.append(
+        f"{PROMETHEUS_PREFIX}_run_peak_rss_bytes{{{_labels(run=run_name)}}} {peak_rss}"
+    )
+    lines.append(
+        f"# HELP {PROMETHEUS_PREFIX}_run_finished_timestamp_seconds "
+        "Unix time the run finished at."
+    )
+    lines.append(f"# TYPE {PROMETHEUS_PREFIX}_run_finished_timestamp_seconds gauge")
+    lines.append(
+        f"{PROMETHEUS_PREFIX}_run_finished_timestamp_seconds"
+        f"{{{_labels(run=run_name)}}} {finished_at!r}"
+    )
+    return "\n".join(lines) + "\n"
+
+
+# the metrics of the current process, the ingestors and scripts record into it.
+run_metrics = RunMetrics()
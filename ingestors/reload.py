@@ -0,0 +1,63 @@
+import os
+import logging
+
+from sqlalchemy import or_, select
+from sqlalchemy.engine import Connection
+
+from database.base import engine
+from database.manifest import delete_all_rows_of_sources, get_source_files
+from database.tables import SourceMetaDataTable
+from definitions.data_ingestors import get_ingestor_definitions
+
+logger = logging.getLogger("root")
+
+
+def get_source_id(source: str, connection: Connection) -> int:
+    """The source_id of a source given by its id or by its `source_filename`, e.g.
+    `202102/RE` for a PDF folder or the path of a cleaned monthly export.
+    """
+    condition = SourceMetaDataTable.source_filename == source
+    if source.lstrip("-").isdigit():
+        condition = or_(condition, SourceMetaDataTable.source_id == int(source))
+    source_ids = (
+        connection.execute(select(SourceMetaDataTable.source_id).where(condition))
+        .scalars()
+        .all()
+    )
+    if len(source_ids) != 1:
+        raise Exception(f"Found {len(source_ids)} sources for: {source}")
+    return source_ids[0]
+
+
+def reload_source(source: str) -> None:
+    """Loads a single source file or PDF folder again, e.g. after a correction, in one
+    transaction: the rows of the source are deleted from all raw tables and only the
+    files the source was loaded from are ingested again, by the ingestor of the
+    registry whose `file_patterns` match them. The files are loaded even if they did
+    not change.
+    """
+    with engine.begin() as connection:
+        source_id = get_source_id(source, connection)
+        source_files = get_source_files([source_id], connection)
+        if not source_files:
+            raise Exception(f"No files are recorded for source: {source}")
+        missing_files = [path for path in source_files if not os.path.exists(path)]
+        if missing_files:
+            raise Exception(f"Files of source {source} do not exist: {missing_files}")
+        ingestors = [
+            ingestor
+            for ingestor in get_ingestor_definitions()
+            if all(map(ingestor.loads_file, source_files))
+        ]
+        if len(ingestors) != 1:
+            raise Exception(
+                f"Source {source} cannot be reloaded on its own, its files are loaded "
+                f"by {len(ingestors)} ingestors: {source_files}"
+            )
+        ingestor = ingestors[0]
+        logger.info(
+            f"Reloading source {source_id} from {source_files} with: {ingestor.name}"
+        )
+        deleted_rows = delete_all_rows_of_sources([source_id], connection)
+        logger.info(f"Deleted {deleted_rows} rows of source {source_id}.")
+        ingestor.load()(source_files=source_files, connection=connection)
@@ -0,0 +1,119 @@
+import time
+import logging
+from enum import Enum
+from dataclasses import dataclass, field
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("root")
+
+
+class TaskStatus(Enum):
+    succeeded = "succeeded"
+    failed = "failed"
+    skipped = "skipped"
+
+
+@dataclass
+class Task:
+    name: str
+    function: Callable[[], Any]
+    depends_on: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TaskResult:
+    name: str
+    status: TaskStatus
+    seconds: float = 0.0
+    error: Optional[BaseException] = None
+
+
+def _check_tasks(tasks: List[Task]) -> None:
+    names = [task.name for task in tasks]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise Exception(f"Duplicate task names: {sorted(duplicates)}")
+    for task in tasks:
+        unknown = [name for name in task.depends_on if name not in names]
+        if unknown:
+            raise Exception(f"Task {task.name} depends on unknown tasks: {unknown}")
+
+    # Kahn's algorithm, tasks left over are part of a cycle.
+    remaining = {task.name: set(task.depends_on) for task in tasks}
+    ready = [name for name, depends_on in remaining.items() if not depends_on]
+    while ready:
+        done = ready.pop()
+        del remaining[done]
+        for name, depends_on in remaining.items():
+            if done in depends_on:
+                depends_on.discard(done)
+                if not depends_on:
+                    ready.append(name)
+    if remaining:
+        raise Exception(f"Cyclic task dependencies between: {sorted(remaining)}")
+
+
+def _run_task(task: Task) -> TaskResult:
+    logger.info(f"Starting task: {task.name}")
+    start = time.perf_counter()
+    try:
+        task.function()
+    except Exception as error:
+        logger.exception(f"Task {task.name} failed.")
+        return TaskResult(
+            task.name, TaskStatus.failed, time.perf_counter() - start, error
+        )
+    return TaskResult(task.name, TaskStatus.succeeded, time.perf_counter() - start)
+
+
+def run_tasks(tasks: List[Task], max_concurrency: int = 4) -> Dict[str, TaskResult]:
+    """Runs the tasks on a pool of `max_concurrency` threads, each task as soon as all
+    tasks it depends on succeeded. Tasks depending on a failed or skipped task are
+    skipped. Failures do not stop independent tasks.
+
+    Returns the result of every task in the order of `tasks`.
+    """
+    _check_tasks(tasks)
+    results = {}
+    waiting = {task.name: set(task.depends_on) for task in tasks}
+    tasks_by_name = {task.name: task for task in tasks}
+
+    def skip_dependents(name: str) -> None:
+        for dependent, depends_on in list(waiting.items()):
+            if dependent in waiting and name in depends_on:
+                del waiting[dependent]
+                logger.warning(f"Skipping task: {dependent}, {name} did not succeed.")
+                results[dependent] = TaskResult(dependent, TaskStatus.skipped)
+                skip_dependents(dependent)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        running = {}
+        while waiting or running:
+            for name in [
+                name for name, depends_on in waiting.items() if not depends_on
+            ]:
+                del waiting[name]
+                running[executor.submit(_run_task, tasks_by_name[name])] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                del running[future]
+                results[result.name] = result
+                if result.status == TaskStatus.succeeded:
+                    for depends_on in waiting.values():
+                        depends_on.discard(result.name)
+                else:
+                    skip_dependents(result.name)
+
+    return {task.name: results[task.name] for task in tasks}
+
+
+def log_task_summary(results: Dict[str, TaskResult]) -> None:
+    logger.info("Task summary:")
+    for result in results.values():
+        error = f" ({result.error})" if result.error is not None else ""
+        logger.info(
+            f"\t{result.name:<40} {result.status.value:<10} "
+            f"{result.seconds:8.2f}s{error}"
+        )
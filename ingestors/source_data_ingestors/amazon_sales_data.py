@@ -1,58 +1,113 @@
 import os
+import datetime
 import pandas as pd
 
 from database.tables import AmazonSalesTable, SourceMetaDataTable
 
 from database.base import engine
-from definitions.schemas import Schemas
+from database.partitions import replace_month_partitions
+from database.manifest import (
+    get_changed_files,
+    get_recorded_source_ids,
+    record_source_files,
+    insert_missing_source_metadata,
+)
 
 from definitions.common import SourceTypes, SourceNames
-from utils.common import create_int_hash_from_df_row
+from utils.common import create_int_hash_from_df
+from utils.intermediate_files import find_intermediate_file, read_intermediate
 
 from ingestors.base_ingestor import BaseIngestor
+from ingestors.metrics import LOAD, METADATA, READ, run_metrics
 
 import logging
 
 logger = logging.getLogger("root")
 
+# split the month partitions of new and reloaded months further by country.
+PARTITION_BY_COUNTRY = os.environ.get(
+    "AMAZON_SALES_PARTITION_BY_COUNTRY", "false"
+).lower() in ("1", "true", "yes")
+
 
 class AmazonSalesSourceIngestor(BaseIngestor):
-    table_name = AmazonSalesTable.__tablename__
+    table = AmazonSalesTable
     source_type = SourceTypes.original_csv_xl.value
     source_name = SourceNames.amazon_aws.value
+    metrics_source = "amazon_sales"
 
     def __init__(self):
         logger.info("Starting data ingestor for Amazon sales data...")
-        csv_path = os.path.join(
-            os.getcwd(), "data/amazon_sales/all_sales_data_combined.csv"
+        data_path = find_intermediate_file(
+            os.path.join(os.getcwd(), "data/amazon_sales"), "all_sales_data_combined"
         )
-        if os.path.exists(csv_path):
-            self.data = pd.read_csv(csv_path)
-        else:
-            raise Exception(f"Path does not exist: {csv_path}")
-        self.add_source_metadata()
-        self.insert_into_db()
+        if data_path is None:
+            raise Exception(
+                "Path does not exist: data/amazon_sales/all_sales_data_combined"
+                ".parquet or .csv"
+            )
+        if not get_changed_files([data_path]):
+            logger.info(f"Amazon sales data unchanged, skipping: {data_path}")
+            return
+        with run_metrics.stage(
+            self.metrics_source, READ, bytes_read=os.path.getsize(data_path)
+        ) as stage:
+            self.data = read_intermediate(
+                data_path, columns=[c.name for c in self.table.__table__.columns]
+            )
+            stage.rows_out = len(self.data)
+        self.reject_rows_without_date(os.path.dirname(data_path))
+        with engine.begin() as connection:
+            with run_metrics.stage(
+                self.metrics_source, METADATA, rows_in=len(self.data)
+            ) as stage:
+                self.add_source_metadata(connection)
+                stage.rows_out = len(self.source_data)
+            with run_metrics.stage(
+                self.metrics_source, LOAD, rows_in=len(self.data)
+            ) as stage:
+                stage.rows_out = self.insert_into_db(
+                    connection,
+                    [
+                        *get_recorded_source_ids([data_path], connection),
+                        *self.source_data[SourceMetaDataTable.source_id.name],
+                    ],
+                )
+            record_source_files(
+                {data_path: self.source_data[SourceMetaDataTable.source_id.name]},
+                connection,
+            )
 
-    def add_source_metadata(self):
+    def reject_rows_without_date(self, report_dir):
+        """Rows without date_time have no month partition, they are written to a
+        rejected rows report in `report_dir` instead of being loaded.
+        """
+        rejected = self.data[self.table.date_time.name].isna()
+        if not rejected.any():
+            return
+        current_date = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_path = os.path.join(report_dir, f"rejected_dates_{current_date}.csv")
+        logger.warning(
+            f"{rejected.sum()} rows without date_time cannot be loaded, saving them "
+            f"to: {report_path}"
+        )
+        self.data[rejected].to_csv(report_path, index=False)
+        self.data = self.data[~rejected]
+
+    def add_source_metadata(self, connection):
         self.source_data = pd.DataFrame(self.data["source_file"].unique())
         self.source_data.rename(
             columns={0: SourceMetaDataTable.source_filename.name}, inplace=True
         )
         self.source_data[SourceMetaDataTable.source_type.name] = self.source_type
         self.source_data[SourceMetaDataTable.source_name.name] = self.source_name
-        self.source_data[SourceMetaDataTable.source_id.name] = self.source_data.apply(
-            lambda row: create_int_hash_from_df_row(row), axis=1
+        self.source_data[SourceMetaDataTable.source_id.name] = create_int_hash_from_df(
+            self.source_data
         )
 
-        self.source_data.to_sql(
-            name=SourceMetaDataTable.__tablename__,
-            con=engine,
-            schema=Schemas.RAW.value,
-            if_exists="append",
-            index=False,
-        )
+        insert_missing_source_metadata(self.source_data, connection)
 
-    def insert_into_db(self):
+    def insert_into_db(self, connection, replaced_source_ids):
         self.data = self.data.merge(
             self.source_data,
             how="inner",
@@ -73,10 +128,12 @@ class AmazonSalesSourceIngestor(BaseIngestor):
             inplace=True,
         )
 
-        self.data.to_sql(
-            name=self.table_name,
-            con=engine,
-            schema=Schemas.RAW.value,
-            if_exists="append",
-            index=False,
+        return replace_month_partitions(
+            self.data,
+            self.table,
+            replaced_source_ids,
+            connection,
+            time_column=self.table.date_time.name,
+            list_column=self.table.country_code.name if PARTITION_BY_COUNTRY else None,
+            hash_column=self.table.hash_id.name,
         )
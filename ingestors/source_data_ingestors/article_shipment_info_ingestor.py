@@ -1,23 +1,33 @@
 import os
+from typing import List, Optional
 
 import pandas as pd
+from sqlalchemy.engine import Connection
 
 from database.tables import (
     SourceMetaDataTable,
     ArticleShipmentInfo,
 )
 
-from database.base import engine
-from definitions.schemas import Schemas
+from database.base import transaction
+from database.loader import copy_dataframe_to_table
+from database.manifest import (
+    get_files_to_load,
+    get_recorded_source_ids,
+    record_source_files,
+    insert_missing_source_metadata,
+    delete_rows_of_sources,
+)
 
 from definitions.common import (
     SourceTypes,
     SourceNames,
     ArticleShipmentInfoColumnMapping,
 )
-from utils.common import create_int_hash_from_df_row
+from utils.common import create_int_hash_from_df
 
 from ingestors.base_ingestor import BaseIngestor
+from ingestors.metrics import LOAD, METADATA, READ, run_metrics
 
 import logging
 
@@ -25,11 +35,17 @@ logger = logging.getLogger("root")
 
 
 class ArticleShipmentInfoIngestor(BaseIngestor):
-    table_name = ArticleShipmentInfo.__tablename__
+    table = ArticleShipmentInfo
     source_type = SourceTypes.original_csv_xl.value
     source_name = SourceNames.self_enriched.value
+    metrics_source = "article_shipment_info"
 
-    def __init__(self):
+    def __init__(
+        self,
+        *,
+        source_files: Optional[List[str]] = None,
+        connection: Optional[Connection] = None,
+    ):
         csv_path = os.path.join(
             os.getcwd(), "data/amazon_sales/220914_SKU_Artikelpreise_Versandpreise.csv"
         )
@@ -37,12 +53,39 @@ class ArticleShipmentInfoIngestor(BaseIngestor):
             raise Exception(f"Path does not exist: {csv_path}")
 
         logger.info("Starting data ingestor for Article shipment price info...")
-        self.data = pd.read_csv(csv_path, encoding="utf-16")
+        if not get_files_to_load([csv_path], source_files):
+            logger.info(f"Article shipment price info unchanged, skipping: {csv_path}")
+            return
+        with run_metrics.stage(
+            self.metrics_source, READ, bytes_read=os.path.getsize(csv_path)
+        ) as stage:
+            self.data = pd.read_csv(csv_path, encoding="utf-16")
+            stage.rows_out = len(self.data)
         self.data.rename(columns=ArticleShipmentInfoColumnMapping, inplace=True)
-        self.add_source_metadata()
-        self.insert_into_db()
+        with transaction(connection) as connection:
+            with run_metrics.stage(
+                self.metrics_source, METADATA, rows_in=len(self.data)
+            ) as stage:
+                self.add_source_metadata(connection)
+                stage.rows_out = len(self.source_data)
+            with run_metrics.stage(
+                self.metrics_source, LOAD, rows_in=len(self.data)
+            ) as stage:
+                delete_rows_of_sources(
+                    self.table,
+                    [
+                        *get_recorded_source_ids([csv_path], connection),
+                        *self.source_data[SourceMetaDataTable.source_id.name],
+                    ],
+                    connection,
+                )
+                stage.rows_out = self.insert_into_db(connection)
+            record_source_files(
+                {csv_path: self.source_data[SourceMetaDataTable.source_id.name]},
+                connection,
+            )
 
-    def add_source_metadata(self):
+    def add_source_metadata(self, connection):
         self.source_data = pd.DataFrame(
             {
                 "source_filename": ["220914_SKU_Artikelpreise_Versandpreise"],
@@ -50,19 +93,13 @@ class ArticleShipmentInfoIngestor(BaseIngestor):
                 "source_name": [self.source_name],
             }
         )
-        self.source_data[SourceMetaDataTable.source_id.name] = self.source_data.apply(
-            lambda row: create_int_hash_from_df_row(row), axis=1
+        self.source_data[SourceMetaDataTable.source_id.name] = create_int_hash_from_df(
+            self.source_data
         )
 
-        self.source_data.to_sql(
-            name=SourceMetaDataTable.__tablename__,
-            con=engine,
-            schema=Schemas.RAW.value,
-            if_exists="append",
-            index=False,
-        )
+        insert_missing_source_metadata(self.source_data, connection)
 
-    def insert_into_db(self):
+    def insert_into_db(self, connection):
         self.data = self.data.merge(
             self.source_data,
             how="cross",
@@ -81,10 +118,4 @@ class ArticleShipmentInfoIngestor(BaseIngestor):
             inplace=True,
         )
 
-        self.data.to_sql(
-            name=self.table_name,
-            con=engine,
-            schema=Schemas.RAW.value,
-            if_exists="append",
-            index=False,
-        )
+        return copy_dataframe_to_table(self.data, self.table, connection=connection)
@@ -1,7 +1,7 @@
 import os
-from typing import Union
+from typing import List, Optional, Set, Union
 import pandas as pd
-
+from sqlalchemy.engine import Connection
 
 from database.tables import (
     SourceMetaDataTable,
@@ -9,16 +9,25 @@ from database.tables import (
     ExternalReimbursements,
 )
 
-from database.base import engine
-from definitions.schemas import Schemas
+from database.base import transaction
+from database.loader import copy_dataframe_to_table
+from database.manifest import (
+    get_files_to_load,
+    get_recorded_source_ids,
+    record_source_files,
+    insert_missing_source_metadata,
+    delete_rows_of_sources,
+)
 
 from definitions.common import (
     SourceTypes,
     SourceNames,
 )
-from utils.common import create_int_hash_from_df_row
+from utils.common import create_int_hash_from_df
+from utils.intermediate_files import is_intermediate_file, read_intermediate
 
 from ingestors.base_ingestor import BaseIngestor
+from ingestors.metrics import LOAD, METADATA, READ, run_metrics
 
 import logging
 
@@ -29,73 +38,157 @@ class ExternalInvoicesReimbursementsIngestor(BaseIngestor):
     source_type = SourceTypes.original_csv_xl.value
     source_name = SourceNames.carpets_external.value
 
-    def __init__(self, *, file_type: Union["RE", "GS"]):
+    def __init__(
+        self,
+        *,
+        file_type: Union["RE", "GS"],
+        source_files: Optional[List[str]] = None,
+        connection: Optional[Connection] = None,
+    ):
         logger.info(f"Starting ingestor for External invoices of type: {file_type} ...")
         self.file_type = file_type
         if not self.file_type or self.file_type not in ["RE", "GS"]:
             raise Exception(
                 f"Cannot create ingestor without correct type: {self.file_type}"
             )
-        self.table_name = (
-            ExternalInvoices.__tablename__
-            if self.file_type == "RE"
-            else ExternalReimbursements.__tablename__
+        self.table = (
+            ExternalInvoices if self.file_type == "RE" else ExternalReimbursements
         )
+        self.metrics_source = f"external_invoices_{self.file_type}"
         data_folders = [i[0] for i in os.walk("data/external_invoices")]
-        monthly_data = []
+        monthly_files = []
         for folder in data_folders:
             if "RE" not in folder and "GS" not in folder:
-                for file in os.listdir(folder):
+                for file in filter(is_intermediate_file, os.listdir(folder)):
                     if self.file_type == "RE":
                         if "rgexport" in file.lower():
-                            logger.info(f"Reading monthly CSV from: {file}")
-                            monthly_df = pd.read_csv(
-                                os.path.join(os.getcwd(), folder, file)
-                            )
-                            monthly_df["source_file"] = os.path.join(folder, file)
-                            monthly_data.append(monthly_df)
+                            monthly_files.append(os.path.join(folder, file))
                     else:
                         if "gsexport" in file.lower():
-                            logger.info(f"Reading monthly CSV from: {file}")
-                            monthly_df = pd.read_csv(
-                                os.path.join(os.getcwd(), folder, file)
-                            )
-                            monthly_df["source_file"] = os.path.join(folder, file)
-                            monthly_data.append(monthly_df)
-        if len(monthly_data) > 0:
-            self.data = pd.concat(monthly_data, ignore_index=True)
-        else:
+                            monthly_files.append(os.path.join(folder, file))
+        if len(monthly_files) < 1:
             raise Exception("No monthly invoice or reimbursement files found.")
-        self.add_source_metadata()
-        self.insert_into_db()
+        changed_files = get_files_to_load(monthly_files, source_files)
+        if not changed_files:
+            logger.info(f"No new or changed monthly files of type: {file_type}")
+            return
+
+        self.data = pd.concat(
+            map(self.read_monthly_file, changed_files), ignore_index=True
+        )
+        with transaction(connection) as connection:
+            with run_metrics.stage(
+                self.metrics_source, METADATA, rows_in=len(self.data)
+            ) as stage:
+                self.add_source_metadata(connection)
+                stage.rows_out = len(self.source_data)
+            file_source_ids = {
+                file_path: [source_id]
+                for file_path, source_id in self.source_data[
+                    [
+                        SourceMetaDataTable.source_filename.name,
+                        SourceMetaDataTable.source_id.name,
+                    ]
+                ].itertuples(index=False)
+            }
+            with run_metrics.stage(
+                self.metrics_source, LOAD, rows_in=len(self.data)
+            ) as stage:
+                deleted_hash_ids = delete_rows_of_sources(
+                    self.table,
+                    [
+                        *get_recorded_source_ids(changed_files, connection),
+                        *self.source_data[SourceMetaDataTable.source_id.name],
+                    ],
+                    connection,
+                )
+                stage.rows_out = self.insert_into_db(connection)
+                # a reloaded source's rows were already deleted by `reload_source`.
+                lost_hash_ids = (
+                    None
+                    if source_files is not None
+                    else set(deleted_hash_ids).difference(
+                        self.data[self.table.hash_id.name]
+                    )
+                )
+                if lost_hash_ids is None or lost_hash_ids:
+                    stage.rows_out += self.restore_shared_rows(
+                        [path for path in monthly_files if path not in changed_files],
+                        lost_hash_ids,
+                        connection,
+                    )
+            record_source_files(file_source_ids, connection)
+
+    def read_monthly_file(self, file_path: str) -> pd.DataFrame:
+        logger.info(f"Reading monthly file from: {file_path}")
+        with run_metrics.stage(
+            self.metrics_source, READ, bytes_read=os.path.getsize(file_path)
+        ) as stage:
+            monthly_df = read_intermediate(
+                os.path.join(os.getcwd(), file_path),
+                columns=[c.name for c in self.table.__table__.columns],
+            )
+            stage.rows_out = len(monthly_df)
+        monthly_df["source_file"] = file_path
+        return monthly_df
 
-    def add_source_metadata(self):
-        self.source_data = pd.DataFrame(self.data["source_file"].unique())
-        self.source_data.rename(
+    def restore_shared_rows(
+        self,
+        file_paths: List[str],
+        hash_ids: Optional[Set[int]],
+        connection: Connection,
+    ) -> int:
+        """Rows in several exports, e.g. a monthly and a yearly one, are stored once for
+        the export loaded first, deleting its rows deleted them for the other exports.
+        The rows with the given `hash_ids` (all if None) are loaded again from the
+        other, unchanged exports which contain them. Returns the number of rows.
+        """
+        restored_data = []
+        for file_path in file_paths:
+            monthly_df = self.read_monthly_file(file_path)
+            if hash_ids is not None:
+                monthly_df = monthly_df[
+                    monthly_df[self.table.hash_id.name].isin(hash_ids)
+                ]
+            restored_data.append(monthly_df)
+        if not restored_data:
+            return 0
+        data = pd.concat(restored_data, ignore_index=True)
+        source_data = self._get_source_data(data)
+        insert_missing_source_metadata(source_data, connection)
+        restored_rows = self._insert_data(data, source_data, connection)
+        logger.info(f"Restored {restored_rows} rows shared with other exports.")
+        return restored_rows
+
+    def _get_source_data(self, data: pd.DataFrame) -> pd.DataFrame:
+        source_data = pd.DataFrame(data["source_file"].unique())
+        source_data.rename(
             columns={0: SourceMetaDataTable.source_filename.name}, inplace=True
         )
-        self.source_data[SourceMetaDataTable.source_type.name] = self.source_type
-        self.source_data[SourceMetaDataTable.source_name.name] = self.source_name
-        self.source_data[SourceMetaDataTable.source_id.name] = self.source_data.apply(
-            lambda row: create_int_hash_from_df_row(row), axis=1
+        source_data[SourceMetaDataTable.source_type.name] = self.source_type
+        source_data[SourceMetaDataTable.source_name.name] = self.source_name
+        source_data[SourceMetaDataTable.source_id.name] = create_int_hash_from_df(
+            source_data
         )
+        return source_data
 
-        self.source_data.to_sql(
-            name=SourceMetaDataTable.__tablename__,
-            con=engine,
-            schema=Schemas.RAW.value,
-            if_exists="append",
-            index=False,
-        )
+    def add_source_metadata(self, connection):
+        self.source_data = self._get_source_data(self.data)
+        insert_missing_source_metadata(self.source_data, connection)
+
+    def insert_into_db(self, connection):
+        return self._insert_data(self.data, self.source_data, connection)
 
-    def insert_into_db(self):
-        self.data = self.data.merge(
-            self.source_data,
+    def _insert_data(
+        self, data: pd.DataFrame, source_data: pd.DataFrame, connection: Connection
+    ) -> int:
+        data = data.merge(
+            source_data,
             how="inner",
             left_on="source_file",
             right_on=SourceMetaDataTable.source_filename.name,
         )
-        self.data.drop(
+        data.drop(
             columns=[
                 *[
                     c.name
@@ -111,10 +204,9 @@ class ExternalInvoicesReimbursementsIngestor(BaseIngestor):
             axis=1,
             inplace=True,
         )
-        self.data.to_sql(
-            name=self.table_name,
-            con=engine,
-            schema=Schemas.RAW.value,
-            if_exists="append",
-            index=False,
+        return copy_dataframe_to_table(
+            data,
+            self.table,
+            connection=connection,
+            upsert_keys=[self.table.hash_id.name],
         )
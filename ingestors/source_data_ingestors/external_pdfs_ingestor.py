@@ -1,18 +1,28 @@
 import os
-from typing import Union
+from typing import List, Optional, Union
 import pandas as pd
-
+from sqlalchemy.engine import Connection
 
 from database.tables import (
     SourceMetaDataTable,
     ExternalPDFReimbursementHeaders,
     ExternalPDFReimbursementItems,
+    ExternalPDFReimbursementTexts,
     ExternalPDFInvoiceHeaders,
     ExternalPDFInvoiceItems,
+    ExternalPDFInvoiceTexts,
 )
 
-from database.base import engine
-from definitions.schemas import Schemas
+from database.base import transaction
+from database.loader import copy_dataframe_to_table
+from database.manifest import (
+    get_files_to_load,
+    get_recorded_source_ids,
+    record_source_files,
+    insert_missing_source_metadata,
+    delete_rows_of_sources,
+    delete_child_rows_of_sources,
+)
 
 from definitions.common import (
     SourceTypes,
@@ -22,9 +32,11 @@ from definitions.common import (
     InvoiceItemTableColumns,
     ReimbursementItemTableColumns,
 )
-from utils.common import create_int_hash_from_df_row
+from utils.common import create_int_hash_from_df
+from utils.intermediate_files import find_intermediate_file, read_intermediate
 
 from ingestors.base_ingestor import BaseIngestor
+from ingestors.metrics import LOAD, METADATA, READ, TRANSFORM, run_metrics
 
 import logging
 
@@ -32,12 +44,19 @@ logger = logging.getLogger("root")
 
 
 class ExternalPDFInvoicesReimbursementsIngestor(BaseIngestor):
-    header_table_name = ""
-    item_table_name = ""
+    header_table = None
+    item_table = None
+    text_table = None
     source_type = SourceTypes.extracted_pdf_csv.value
     source_name = SourceNames.carpets_external.value
 
-    def __init__(self, *, file_type: Union["RE", "GS"]):
+    def __init__(
+        self,
+        *,
+        file_type: Union["RE", "GS"],
+        source_files: Optional[List[str]] = None,
+        connection: Optional[Connection] = None,
+    ):
         self.file_type = file_type
         if not self.file_type or self.file_type not in ["RE", "GS"]:
             raise Exception(
@@ -46,67 +65,156 @@ class ExternalPDFInvoicesReimbursementsIngestor(BaseIngestor):
         logger.info(
             f"Starting data ingestor for External data of type: {self.file_type}..."
         )
-        self.header_table_name = (
-            ExternalPDFInvoiceHeaders.__tablename__
+        self.metrics_source = f"external_pdfs_{self.file_type}"
+        self.header_table = (
+            ExternalPDFInvoiceHeaders
             if self.file_type == "RE"
-            else ExternalPDFReimbursementHeaders.__tablename__
+            else ExternalPDFReimbursementHeaders
         )
-        self.item_table_name = (
-            ExternalPDFInvoiceItems.__tablename__
+        self.item_table = (
+            ExternalPDFInvoiceItems
             if self.file_type == "RE"
-            else ExternalPDFReimbursementItems.__tablename__
+            else ExternalPDFReimbursementItems
+        )
+        self.text_table = (
+            ExternalPDFInvoiceTexts
+            if self.file_type == "RE"
+            else ExternalPDFReimbursementTexts
         )
         data_folders = [i[0] for i in os.walk("data/external_invoices")]
-        monthly_pdf_invoices = []
+        # the items and headers of a folder are in `combined_data`, the text of each
+        # PDF once in `pdf_texts`, both are loaded again if either of them changed.
+        folder_files = {}
         for folder in data_folders:
-            if self.file_type in folder and "combined_data.csv" in os.listdir(folder):
-                monthly_df = pd.read_csv(
-                    os.path.join(os.getcwd(), folder, "combined_data.csv")
+            combined_file = find_intermediate_file(folder, "combined_data")
+            if self.file_type not in folder or combined_file is None:
+                continue
+            text_file = find_intermediate_file(folder, "pdf_texts")
+            if text_file is None:
+                raise Exception(
+                    f"No pdf_texts file next to {combined_file}, run "
+                    "scripts/external_invoices_reimbursements.py again."
+                )
+            folder_files[folder] = (combined_file, text_file)
+        changed_files = set(
+            get_files_to_load(
+                [file_path for files in folder_files.values() for file_path in files],
+                source_files,
+            )
+        )
+        changed_folder_files = [
+            files
+            for files in folder_files.values()
+            if changed_files.intersection(files)
+        ]
+        if not changed_folder_files:
+            logger.info(f"No new or changed PDF data of type: {self.file_type}")
+            return
+
+        header_columns, item_columns = (
+            (InvoiceHeaderTableColumns, InvoiceItemTableColumns)
+            if self.file_type == "RE"
+            else (ReimbursementHeaderTableColumns, ReimbursementItemTableColumns)
+        )
+        monthly_pdf_invoices = []
+        monthly_pdf_texts = []
+        file_foldernames = {}
+        for combined_file, text_file in changed_folder_files:
+            with run_metrics.stage(
+                self.metrics_source,
+                READ,
+                bytes_read=os.path.getsize(combined_file) + os.path.getsize(text_file),
+            ) as stage:
+                monthly_df = read_intermediate(
+                    os.path.join(os.getcwd(), combined_file),
+                    columns=[*header_columns, *item_columns],
                 )
                 monthly_pdf_invoices.append(monthly_df)
+                monthly_pdf_texts.append(
+                    read_intermediate(os.path.join(os.getcwd(), text_file))
+                )
+                stage.rows_out = len(monthly_df)
+            foldernames = monthly_df["foldername"].unique()
+            file_foldernames[combined_file] = foldernames
+            file_foldernames[text_file] = foldernames
         all_pdf_invoices = pd.concat(monthly_pdf_invoices, ignore_index=True)
-        self._separate_headers_and_items(all_pdf_invoices)
-        self.add_source_metadata()
-        self.insert_into_db()
+        with run_metrics.stage(
+            self.metrics_source, TRANSFORM, rows_in=len(all_pdf_invoices)
+        ) as stage:
+            self._separate_headers_and_items(all_pdf_invoices)
+            stage.rows_out = len(self.data_headers) + len(self.data_items)
+        self.data_texts = pd.concat(monthly_pdf_texts, ignore_index=True)
+        with transaction(connection) as connection:
+            with run_metrics.stage(
+                self.metrics_source, METADATA, rows_in=len(self.data_headers)
+            ) as stage:
+                self.add_source_metadata(connection)
+                stage.rows_out = len(self.source_data)
+            with run_metrics.stage(
+                self.metrics_source,
+                LOAD,
+                rows_in=sum(
+                    map(len, [self.data_headers, self.data_items, self.data_texts])
+                ),
+            ) as stage:
+                replaced_source_ids = [
+                    *get_recorded_source_ids(file_foldernames, connection),
+                    *self.source_data[SourceMetaDataTable.source_id.name],
+                ]
+                for child_table in [self.item_table, self.text_table]:
+                    delete_child_rows_of_sources(
+                        child_table,
+                        self.header_table,
+                        "internal_id",
+                        replaced_source_ids,
+                        connection,
+                    )
+                delete_rows_of_sources(
+                    self.header_table, replaced_source_ids, connection
+                )
+                stage.rows_out = self.insert_into_db(connection)
+            folder_source_ids = dict(
+                self.source_data[
+                    [
+                        SourceMetaDataTable.source_filename.name,
+                        SourceMetaDataTable.source_id.name,
+                    ]
+                ].itertuples(index=False)
+            )
+            record_source_files(
+                {
+                    file_path: [folder_source_ids[folder] for folder in foldernames]
+                    for file_path, foldernames in file_foldernames.items()
+                },
+                connection,
+            )
 
     def _separate_headers_and_items(self, pdf_invoices: pd.DataFrame):
         if self.file_type == "RE":
-            pdf_invoices["internal_id"] = pdf_invoices[InvoiceHeaderTableColumns].apply(
-                lambda row: create_int_hash_from_df_row(row), axis=1
-            )
             self.data_headers = pdf_invoices[
-                [*InvoiceHeaderTableColumns, "internal_id", "pdf_text"]
+                [*InvoiceHeaderTableColumns, "internal_id"]
             ].drop_duplicates()
             self.data_items = pdf_invoices[InvoiceItemTableColumns].copy()
         else:
-            pdf_invoices["internal_id"] = pdf_invoices[
-                ReimbursementHeaderTableColumns
-            ].apply(lambda row: create_int_hash_from_df_row(row), axis=1)
             self.data_headers = pdf_invoices[
-                [*ReimbursementHeaderTableColumns, "internal_id", "pdf_text"]
+                [*ReimbursementHeaderTableColumns, "internal_id"]
             ].drop_duplicates()
             self.data_items = pdf_invoices[ReimbursementItemTableColumns].copy()
 
-    def add_source_metadata(self):
+    def add_source_metadata(self, connection):
         self.source_data = pd.DataFrame(self.data_headers["foldername"].unique())
         self.source_data.rename(
             columns={0: SourceMetaDataTable.source_filename.name}, inplace=True
         )
         self.source_data[SourceMetaDataTable.source_type.name] = self.source_type
         self.source_data[SourceMetaDataTable.source_name.name] = self.source_name
-        self.source_data[SourceMetaDataTable.source_id.name] = self.source_data.apply(
-            lambda row: create_int_hash_from_df_row(row), axis=1
+        self.source_data[SourceMetaDataTable.source_id.name] = create_int_hash_from_df(
+            self.source_data
         )
 
-        self.source_data.to_sql(
-            name=SourceMetaDataTable.__tablename__,
-            con=engine,
-            schema=Schemas.RAW.value,
-            if_exists="append",
-            index=False,
-        )
+        insert_missing_source_metadata(self.source_data, connection)
 
-    def insert_into_db(self):
+    def insert_into_db(self, connection):
         self.data_headers = self.data_headers.merge(
             self.source_data,
             how="inner",
@@ -127,17 +235,25 @@ class ExternalPDFInvoicesReimbursementsIngestor(BaseIngestor):
             inplace=True,
         )
 
-        self.data_headers.to_sql(
-            name=self.header_table_name,
-            con=engine,
-            schema=Schemas.RAW.value,
-            if_exists="append",
-            index=False,
-        )
-        self.data_items.to_sql(
-            name=self.item_table_name,
-            con=engine,
-            schema=Schemas.RAW.value,
-            if_exists="append",
-            index=False,
+        return sum(
+            [
+                copy_dataframe_to_table(
+                    self.data_headers,
+                    self.header_table,
+                    connection=connection,
+                    upsert_keys=[self.header_table.internal_id.name],
+                ),
+                copy_dataframe_to_table(
+                    self.data_texts,
+                    self.text_table,
+                    connection=connection,
+                    upsert_keys=[self.text_table.internal_id.name],
+                ),
+                copy_dataframe_to_table(
+                    self.data_items,
+                    self.item_table,
+                    connection=connection,
+                    upsert_keys=[self.item_table.hash_id.name],
+                ),
+            ]
         )
@@ -1,82 +1,195 @@
 import os
+import csv
+from typing import Iterator, List, Optional
 
-import datetime
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.compute as pa_compute
+from sqlalchemy.engine import Connection
 
 from database.tables import (
     SourceMetaDataTable,
     ReturnedFromAmazon,
 )
 
-from database.base import engine
-from definitions.schemas import Schemas
+from database.base import transaction
+from database.loader import copy_dataframe_to_table
+from database.manifest import (
+    get_files_to_load,
+    get_recorded_source_ids,
+    record_source_files,
+    insert_missing_source_metadata,
+    delete_rows_of_sources,
+)
 
 from definitions.common import (
     SourceTypes,
     SourceNames,
 )
-from utils.common import create_int_hash_from_df_row
+from utils.common import create_int_hash_from_df
 
 from ingestors.base_ingestor import BaseIngestor
+from ingestors.metrics import LOAD, METADATA, READ, TRANSFORM, run_metrics
 
 import logging
 
 logger = logging.getLogger("root")
 
+# bytes of the report which are parsed, transformed and loaded at a time.
+CSV_BLOCK_SIZE = 16 * 2**20
+REQUEST_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+
+def _parse_numbers(values: pa.Array) -> pa.Array:
+    """Values which are no numbers are null, like with `pd.to_numeric(errors="coerce")`.
+    The strings are only converted to Python objects if any of them is no number.
+    """
+    try:
+        return pa_compute.cast(
+            pa_compute.if_else(
+                pa_compute.equal(values, ""), pa.scalar(None, pa.string()), values
+            ),
+            pa.float64(),
+        )
+    except pa.ArrowInvalid:
+        return pa.array(
+            pd.to_numeric(values.to_pandas(), errors="coerce"), type=pa.float64()
+        )
+
 
 class ReturnsFromAmazonIngestor(BaseIngestor):
-    table_name = ReturnedFromAmazon.__tablename__
+    table = ReturnedFromAmazon
     source_type = SourceTypes.original_csv_xl.value
     source_name = SourceNames.amazon_aws.value
+    metrics_source = "returns_from_amazon"
 
-    def __init__(self):
+    def __init__(
+        self,
+        *,
+        source_files: Optional[List[str]] = None,
+        connection: Optional[Connection] = None,
+    ):
         csv_path = os.path.join(
             os.getcwd(), "data/returns_amazon/remissions_from_amazon.csv"
         )
         if not os.path.exists(csv_path):
             raise Exception(f"Path does not exist: {csv_path}")
         logger.info("Starting data ingestor for remissions from Amazon data...")
-        self._read_and_transform_data(csv_path)
-        self.add_source_metadata()
-        self.insert_into_db()
+        if not get_files_to_load([csv_path], source_files):
+            logger.info(f"Remissions from Amazon unchanged, skipping: {csv_path}")
+            return
+        with transaction(connection) as connection:
+            with run_metrics.stage(self.metrics_source, METADATA) as stage:
+                self.add_source_metadata(connection)
+                stage.rows_out = len(self.source_data)
+            with run_metrics.stage(self.metrics_source, LOAD):
+                delete_rows_of_sources(
+                    self.table,
+                    [
+                        *get_recorded_source_ids([csv_path], connection),
+                        *self.source_data[SourceMetaDataTable.source_id.name],
+                    ],
+                    connection,
+                )
+            for data in self._read_and_transform_data(csv_path):
+                self.data = data
+                with run_metrics.stage(
+                    self.metrics_source, LOAD, rows_in=len(self.data)
+                ) as stage:
+                    stage.rows_out = self.insert_into_db(connection)
+            record_source_files(
+                {csv_path: self.source_data[SourceMetaDataTable.source_id.name]},
+                connection,
+            )
+
+    def _read_and_transform_data(self, csv_path: str) -> Iterator[pd.DataFrame]:
+        """Reads the report in blocks of `CSV_BLOCK_SIZE` bytes with the CSV reader of
+        pyarrow and yields each block as a DataFrame with parsed dates and numbers.
 
-    def _read_and_transform_data(self, csv_path: str):
-        data = []
-        lines = []
+        The values are quoted and separated by commas, every line ends with a ";".
+        Rows with more or fewer values than the header are skipped and logged.
+        """
         with open(csv_path) as file:
-            for line in file:
-                row_data = line.rstrip(";\n").split(",")
-                row_data = [column_value.strip('"') for column_value in row_data]
-                lines.append(row_data)
-        data_headers = lines[0]
-        data_headers = [header.replace("-", "_") for header in data_headers]
-        lines = lines[1:].copy()
-        for line in lines:
-            if len(line) == len(data_headers):
-                data.append(line)
-        data_df = pd.DataFrame(data, columns=data_headers)
-        for column in data_df.columns:
+            header = next(csv.reader([file.readline().rstrip("\n").rstrip(";")]))
+        column_names = [column.replace("-", "_") for column in header]
+        bad_rows = []
+
+        def skip_bad_row(row) -> str:
+            bad_rows.append(row)
+            return "skip"
+
+        with run_metrics.stage(
+            self.metrics_source, READ, bytes_read=os.path.getsize(csv_path)
+        ):
+            reader = pa_csv.open_csv(
+                csv_path,
+                read_options=pa_csv.ReadOptions(
+                    column_names=column_names,
+                    skip_rows=1,
+                    block_size=CSV_BLOCK_SIZE,
+                ),
+                parse_options=pa_csv.ParseOptions(invalid_row_handler=skip_bad_row),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={column: pa.string() for column in column_names}
+                ),
+            )
+        batches = iter(reader)
+        try:
+            while True:
+                with run_metrics.stage(self.metrics_source, READ) as stage:
+                    batch = next(batches, None)
+                    stage.rows_out = 0 if batch is None else batch.num_rows
+                if batch is None:
+                    break
+                with run_metrics.stage(
+                    self.metrics_source, TRANSFORM, rows_in=batch.num_rows
+                ) as stage:
+                    data = self._transform_data(batch)
+                    stage.rows_out = len(data)
+                yield data
+        finally:
+            reader.close()
+        if bad_rows:
+            self._log_bad_rows(csv_path, bad_rows, len(column_names))
+
+    @staticmethod
+    def _transform_data(batch: pa.RecordBatch) -> pd.DataFrame:
+        columns = []
+        for position, column in enumerate(batch.schema.names):
+            values = batch.column(position)
+            if position == batch.num_columns - 1:
+                # the ";" at the end of each line is read as part of the last value.
+                values = pa_compute.utf8_rtrim(values, characters=";")
+            if "quantity" in column or "removal_fee" == column:
+                values = _parse_numbers(values)
+            columns.append(values)
+        data = pa.RecordBatch.from_arrays(columns, names=batch.schema.names).to_pandas()
+        for column in data.columns:
             if "date" in column:
-                data_df[column] = (
-                    data_df[column]
-                    .astype(str)
-                    .apply(
-                        lambda d: datetime.datetime.strptime(d, "%Y-%m-%dT%H:%M:%S%z")
-                    )
+                data[column] = pd.to_datetime(
+                    data[column], format=REQUEST_DATE_FORMAT, utc=True
                 )
                 continue
             if "quantity" in column:
-                data_df[column] = pd.to_numeric(data_df[column], errors="coerce")
-                data_df[column].fillna(0, inplace=True)
-                data_df[column] = data_df[column].astype(int)
+                data[column] = data[column].fillna(0).astype(int)
                 continue
             if "removal_fee" == column:
-                data_df[column] = pd.to_numeric(data_df[column], errors="coerce")
-                data_df[column].fillna(0, inplace=True)
+                data[column] = data[column].fillna(0)
                 continue
-        self.data = data_df.copy()
+        return data
+
+    @staticmethod
+    def _log_bad_rows(csv_path: str, bad_rows: List, expected_columns: int):
+        examples = "; ".join(
+            f"line {row.number}: {row.actual_columns} values" for row in bad_rows[:5]
+        )
+        logger.warning(
+            f"Skipped {len(bad_rows)} rows of {csv_path} which do not have "
+            f"{expected_columns} values, e.g. {examples}"
+        )
 
-    def add_source_metadata(self):
+    def add_source_metadata(self, connection):
         self.source_data = pd.DataFrame(
             {
                 "source_filename": ["remissions_from_amazon"],
@@ -84,19 +197,13 @@ class ReturnsFromAmazonIngestor(BaseIngestor):
                 "source_name": [self.source_name],
             }
         )
-        self.source_data[SourceMetaDataTable.source_id.name] = self.source_data.apply(
-            lambda row: create_int_hash_from_df_row(row), axis=1
+        self.source_data[SourceMetaDataTable.source_id.name] = create_int_hash_from_df(
+            self.source_data
         )
 
-        self.source_data.to_sql(
-            name=SourceMetaDataTable.__tablename__,
-            con=engine,
-            schema=Schemas.RAW.value,
-            if_exists="append",
-            index=False,
-        )
+        insert_missing_source_metadata(self.source_data, connection)
 
-    def insert_into_db(self):
+    def insert_into_db(self, connection):
         self.data = self.data.merge(
             self.source_data,
             how="cross",
@@ -115,10 +222,4 @@ class ReturnsFromAmazonIngestor(BaseIngestor):
             inplace=True,
         )
 
-        self.data.to_sql(
-            name=self.table_name,
-            con=engine,
-            schema=Schemas.RAW.value,
-            if_exists="append",
-            index=False,
-        )
+        return copy_dataframe_to_table(self.data, self.table, connection=connection)
@@ -1,4 +1,9 @@
 import os
+import re
+import argparse
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
 
 import pandas as pd
 
@@ -6,19 +11,245 @@ import logging
 import dateparser
 import datetime
 
-# TODO: add data parallelisation.
-# from multiprocessing import Pool
-# pool = Pool()
-
-from constants import AMAZON_SALES_DATA_DIR, COUNTRY_TO_COLUMNS_MAPPING
-from utils.common import create_int_hash_from_df_row
+from scripts.constants import (
+    AMAZON_SALES_DATA_DIR,
+    COUNTRY_TO_COLUMNS_MAPPING,
+    COUNTRY_TO_CURRENCY_AND_AMOUNT_LOCALE,
+    COUNTRY_DATE_FORMATS,
+    UTC_DATE_SUFFIX_REGX,
+)
+from database.tables import AmazonSalesTable
+from ingestors.metrics import (
+    HASH,
+    READ,
+    TRANSFORM,
+    WRITE,
+    StageMetrics,
+    run_metrics,
+)
+from utils.amounts import parse_amounts
+from utils.common import create_int_hash_from_df
+from utils.intermediate_files import (
+    INTERMEDIATE_FORMATS,
+    PARQUET,
+    write_intermediate,
+)
 
 logger = logging.getLogger()
 
+METRICS_SOURCE = "amazon_sales"
+
+# the parsed reports are held in memory for all countries at once, low cardinality
+# columns are kept as categoricals and quantities as float32. Amounts stay float64,
+# float32 cannot hold cents exactly.
+CATEGORY_COLUMNS = [
+    "type",
+    "sku",
+    "marketplace",
+    "fulfilment",
+    "country_code",
+    "currency",
+    "source_file",
+]
+DOWNCAST_FLOAT_COLUMNS = ["quantity"]
+# the dtypes the rows are hashed with, so that `hash_id` does not depend on the
+# downcasts. Categoricals hash like the values they hold.
+HASH_DTYPES = {"quantity": "float64"}
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_date_with_dateparser(date_string: str) -> pd.Timestamp:
+    """dateparser detects the language on every call, so it is only used for dates
+    none of the registry formats match and memoized per distinct string.
+    """
+    date = dateparser.parse(date_string)
+    if date is None:
+        return pd.NaT
+    date = pd.Timestamp(date)
+    if date.tzinfo is None:
+        return date.tz_localize("UTC")
+    return date.tz_convert("UTC")
+
+
+def parse_amazon_dates(date_strings: pd.Series, country_code: str) -> pd.Series:
+    """Parses the "date/time" column of a settlement report to UTC timestamps using
+    the formats of `COUNTRY_DATE_FORMATS`. Dates which cannot be parsed are NaT.
+    """
+    country_formats = COUNTRY_DATE_FORMATS[country_code]
+    months = country_formats["months"]
+    normalized = (
+        date_strings.astype(str)
+        .str.strip()
+        .str.lower()
+        .str.replace(UTC_DATE_SUFFIX_REGX, "", case=False, regex=True)
+    )
+    if months:
+        month_names = sorted(map(re.escape, months), key=len, reverse=True)
+        normalized = normalized.str.replace(
+            r"(?<=\s)(" + "|".join(month_names) + r")\.?(?=\s)",
+            lambda match: months[match.group(1)],
+            regex=True,
+        )
+
+    parsed = pd.Series(pd.NaT, index=date_strings.index, dtype="datetime64[ns, UTC]")
+    for date_format in country_formats["formats"]:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(
+            normalized[missing], format=date_format, errors="coerce", utc=True
+        )
+
+    missing = parsed.isna() & date_strings.notna()
+    if missing.any():
+        fallback = {
+            date_string: _parse_date_with_dateparser(str(date_string))
+            for date_string in date_strings[missing].unique()
+        }
+        logger.info(
+            f"Parsing {missing.sum()} dates ({len(fallback)} distinct) "
+            f"for country: {country_code} with dateparser."
+        )
+        parsed[missing] = pd.to_datetime(date_strings[missing].map(fallback), utc=True)
+    return parsed.where(date_strings.notna())
+
+
+def parse_amazon_csv(
+    folder_path: str, country_code: str, country_filename: str
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Reads a single settlement report and parses its dates and amounts.
+
+    Returns the parsed rows and the rows whose date could not be parsed.
+    """
+    logger.info(f"\tFile: {country_filename}")
+    csv_path = os.path.join(AMAZON_SALES_DATA_DIR, folder_path, country_filename)
+    with run_metrics.stage(
+        METRICS_SOURCE, READ, bytes_read=os.path.getsize(csv_path)
+    ) as stage:
+        data = pd.read_csv(
+            csv_path,
+            skiprows=7,
+            usecols=list(COUNTRY_TO_COLUMNS_MAPPING[country_code]),
+            low_memory=False,
+        )
+        stage.rows_out = len(data)
+    with run_metrics.stage(METRICS_SOURCE, TRANSFORM, rows_in=len(data)) as stage:
+        data, rejected_data = _parse_dates_and_amounts(
+            data, country_code, country_filename
+        )
+        stage.rows_out = len(data)
+    return data, rejected_data
+
+
+def _parse_dates_and_amounts(
+    data: pd.DataFrame, country_code: str, country_filename: str
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    data = data[COUNTRY_TO_COLUMNS_MAPPING[country_code].keys()].copy()
+    data.rename(columns=COUNTRY_TO_COLUMNS_MAPPING[country_code], inplace=True)
+    data["country_code"] = country_code
+    data["date_time"] = parse_amazon_dates(data["date_time_original"], country_code)
+    rejected = data["date_time"].isna() & data["date_time_original"].notna()
+    rejected_data = data[rejected].assign(source_file=country_filename)
+    if rejected.any():
+        logger.warning(
+            f"Could not parse {rejected.sum()} dates for: {country_code} "
+            f"in file: {country_filename}, rejecting the rows."
+        )
+        data = data[~rejected].copy()
+    currency, amount_locale = COUNTRY_TO_CURRENCY_AND_AMOUNT_LOCALE[country_code]
+    data["currency"] = currency
+    total_prices = data["total_price"]
+    data["total_price"], invalid_amounts = parse_amounts(total_prices, amount_locale)
+    if invalid_amounts.any():
+        logger.warning(
+            f"Could not parse {invalid_amounts.sum()} amounts for: "
+            f"{country_code} in file: {country_filename}. "
+            f"Values: {total_prices[invalid_amounts].unique()[:5]}"
+        )
+    assert (
+        data["date_time_original"].count() == data["date_time"].count()
+    ), f"Could not convert all dates for: {country_code}."
+    return compact_dtypes(data), rejected_data
+
+
+def compact_dtypes(data: pd.DataFrame) -> pd.DataFrame:
+    """Converts the columns of `CATEGORY_COLUMNS` to categoricals and downcasts the
+    floats of `DOWNCAST_FLOAT_COLUMNS` where no value changes.
+    """
+    for column in CATEGORY_COLUMNS:
+        if column in data.columns:
+            data[column] = data[column].astype("category")
+    for column in DOWNCAST_FLOAT_COLUMNS:
+        if column in data.columns and pd.api.types.is_float_dtype(data[column]):
+            data[column] = pd.to_numeric(data[column], downcast="float")
+    return data
+
+
+def concat_sales_data(frames: List[pd.DataFrame], **concat_kwargs) -> pd.DataFrame:
+    """`pd.concat` which keeps categorical columns categorical, concatenating
+    categoricals with different categories would turn them into object columns.
+    """
+    for column in CATEGORY_COLUMNS:
+        columns = [
+            frame[column]
+            for frame in frames
+            if column in frame.columns
+            and isinstance(frame[column].dtype, pd.CategoricalDtype)
+        ]
+        if len(columns) < 2:
+            continue
+        categories = (
+            columns[0]
+            .cat.categories.append([values.cat.categories for values in columns[1:]])
+            .unique()
+        )
+        for frame in frames:
+            if column in frame.columns:
+                frame[column] = frame[column].astype(pd.CategoricalDtype(categories))
+    return pd.concat(frames, **concat_kwargs)
+
+
+def hash_sales_data(data: pd.DataFrame) -> pd.Series:
+    """`hash_id` of the rows. The source file is not hashed, so rows which are in
+    both a monthly and a yearly report get the same hash_id and are only loaded once.
+    """
+    columns = [column for column in data.columns if column != "source_file"]
+    return create_int_hash_from_df(
+        data[columns].astype(
+            {
+                column: dtype
+                for column, dtype in HASH_DTYPES.items()
+                if column in columns
+            },
+            copy=False,
+        )
+    )
+
 
-def parse_sales_data_from_amazon_csvs() -> dict:
-    all_amazon_sales_folders = [i[0] for i in os.walk(AMAZON_SALES_DATA_DIR)]
-    sales_data = {}
+def _parse_amazon_csv_in_worker(
+    folder_path: str, country_code: str, country_filename: str
+) -> Tuple[Tuple[pd.DataFrame, pd.DataFrame], List[StageMetrics]]:
+    """Parses a settlement report in a worker process and returns the stages it
+    recorded with the result, so they can be added to the metrics of the main process.
+    """
+    run_metrics.reset()
+    result = parse_amazon_csv(folder_path, country_code, country_filename)
+    return result, run_metrics.stages
+
+
+def parse_sales_data_from_amazon_csvs(
+    rejected_dates_report_path: Optional[str] = None,
+    workers: int = 1,
+) -> dict:
+    """Parses the settlement reports of all countries. Rows whose date cannot be parsed
+    are dropped and written to `rejected_dates_report_path` if it is given.
+
+    With `workers` > 1 the CSV files are parsed on a pool of processes. Countries and
+    files are processed in sorted order, which is also the order of the results.
+    """
+    all_amazon_sales_folders = sorted(i[0] for i in os.walk(AMAZON_SALES_DATA_DIR))
+    tasks = []
+    csv_counts = {}
     for folder_path in all_amazon_sales_folders:
         # all CSVs in folder for each country
         country_code = folder_path.split("/")[-1]
@@ -29,72 +260,48 @@ def parse_sales_data_from_amazon_csvs() -> dict:
             )
             continue
 
-        country_sales_data = {}
-        country_sales_data["files"] = {}
-
         logger.info(f"Parsing CSVs for country: {country_code} in: {folder_path}")
 
         csv_files_count = 0
-        for country_filename in os.listdir(folder_path):
+        for country_filename in sorted(os.listdir(folder_path)):
             if ".DS_Store" in country_filename:
                 continue
-            logger.info(f"\tFile: {country_filename}")
-
-            data = pd.read_csv(
-                os.path.join(AMAZON_SALES_DATA_DIR, folder_path, country_filename),
-                skiprows=7,
-                low_memory=False,
-            )
-            data = data[COUNTRY_TO_COLUMNS_MAPPING[country_code].keys()].copy()
-            data.rename(columns=COUNTRY_TO_COLUMNS_MAPPING[country_code], inplace=True)
-            data["country_code"] = country_code
-            data["date_time"] = data["date_time_original"].apply(
-                lambda date: dateparser.parse(date)
-            )
-            if country_code == "UK":
-                data["currency"] = "GBP"
-                data["total_price"] = (
-                    data["total_price"]
-                    .astype(str)
-                    .str.replace(",", "", regex=False)
-                    .astype(float)
-                )
-            elif country_code == "SE":
-                data["currency"] = "SEK"
-                data["total_price"] = (
-                    data["total_price"]
-                    .str.replace(".", "", regex=False)
-                    .str.replace("\xa0", "", regex=False)
-                    .str.replace(",", ".", regex=False)
-                    .str.replace("−", "-", regex=False)
-                    .astype(float)
-                )
-            elif country_code == "PL":
-                data["currency"] = "PLN"
-                data["total_price"] = (
-                    data["total_price"]
-                    .str.replace(".", "", regex=False)
-                    .str.replace(",", ".", regex=False)
-                    .astype(float)
-                )
-            else:
-                data["currency"] = "EUR"
-                data["total_price"] = (
-                    data["total_price"]
-                    .str.replace(".", "", regex=False)
-                    .str.replace(",", ".", regex=False)
-                    .str.replace("\u202f", "", regex=False)
-                    .str.replace("−", "-", regex=False)
-                    .astype(float)
-                )
-            assert (
-                data["date_time_original"].count() == data["date_time"].count()
-            ), f"Could not convert all dates for: {country_code}."
-
-            country_sales_data["files"][country_filename] = data
+            tasks.append((folder_path, country_code, country_filename))
             csv_files_count += 1
-        country_sales_data["csv_count"] = csv_files_count
-        sales_data[country_code] = country_sales_data
+        csv_counts[country_code] = csv_files_count
+
+    if workers > 1 and tasks:
+        logger.info(f"Parsing {len(tasks)} CSVs using {workers} worker processes.")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = []
+            for result, stages in executor.map(
+                _parse_amazon_csv_in_worker, *zip(*tasks)
+            ):
+                results.append(result)
+                run_metrics.add(stages)
+    else:
+        results = [parse_amazon_csv(*task) for task in tasks]
+
+    sales_data = {
+        country_code: {"files": {}, "csv_count": csv_count}
+        for country_code, csv_count in csv_counts.items()
+    }
+    rejected_dates = []
+    for (_, country_code, country_filename), (data, rejected_data) in zip(
+        tasks, results
+    ):
+        sales_data[country_code]["files"][country_filename] = data
+        if not rejected_data.empty:
+            rejected_dates.append(rejected_data)
+    # the parsed files are only referenced by `sales_data` from here on, so each one
+    # is freed as soon as it is in the combined data of its country.
+    del results
+
+    if rejected_dates and rejected_dates_report_path:
+        logger.warning(f"Saving rejected rows to: {rejected_dates_report_path}")
+        pd.concat(rejected_dates, ignore_index=True).to_csv(
+            rejected_dates_report_path, index=False
+        )
 
     all_data = {}
     for country_code in sales_data.keys():
@@ -108,13 +315,11 @@ def parse_sales_data_from_amazon_csvs() -> dict:
             )
         yearly_data = []
         monthly_data = []
-        yearly_data_df = None
-        monthly_data_df = None
         row_counts = 0
         for file, data in sales_data[country_code]["files"].items():
             rows = len(data)
             if rows > 0:
-                data["source_file"] = file
+                data["source_file"] = pd.Categorical([file] * rows)
                 if "monthly" in file.lower():
                     monthly_data.append(data)
                 else:
@@ -122,6 +327,7 @@ def parse_sales_data_from_amazon_csvs() -> dict:
                 row_counts += rows
             else:
                 logging.warning(f"Skipping file: {file}. Empty file {rows} rows.")
+        sales_data[country_code]["files"].clear()
 
         if len(yearly_data) < 1 and len(monthly_data) < 1:
             logging.warning(
@@ -129,22 +335,19 @@ def parse_sales_data_from_amazon_csvs() -> dict:
                 "Empty yearly and monthly data."
             )
             continue
-        else:
-            yearly_data_df = pd.concat(yearly_data) if yearly_data else pd.DataFrame()
-            monthly_data_df = (
-                pd.concat(monthly_data) if monthly_data else pd.DataFrame()
-            )
 
-        total_data_count = len(yearly_data_df) + len(monthly_data_df)
-        if row_counts != total_data_count:
+        # yearly reports first, each file is copied once.
+        country_data = concat_sales_data(yearly_data + monthly_data)
+        del yearly_data, monthly_data
+        if row_counts != len(country_data):
             raise Exception(
                 f"Total records count does not match."
                 f"Sum of individual data files: {row_counts}"
-                f"Sum of yearly and monthly data: {total_data_count}"
+                f"Sum of yearly and monthly data: {len(country_data)}"
             )
 
         all_data[country_code] = {
-            "all_data": pd.concat([yearly_data_df, monthly_data_df]),
+            "all_data": country_data,
             "row_count": row_counts,
         }
 
@@ -152,6 +355,23 @@ def parse_sales_data_from_amazon_csvs() -> dict:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Combine the Amazon settlement reports of all countries."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes parsing CSV files, 1 parses them sequentially.",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=INTERMEDIATE_FORMATS,
+        default=PARQUET,
+        help="Format of the combined sales data file read by the ingestor.",
+    )
+    args = parser.parse_args()
+
     needed_columns = [
         "hash_id",
         "date_time_original",
@@ -167,24 +387,43 @@ if __name__ == "__main__":
         "source_file",
         "country_code",
     ]
-    country_combined_sales_data = parse_sales_data_from_amazon_csvs()
+    current_date = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    country_combined_sales_data = parse_sales_data_from_amazon_csvs(
+        rejected_dates_report_path=os.path.join(
+            os.getcwd(), "data", "amazon_sales", f"rejected_dates_{current_date}.csv"
+        ),
+        workers=args.workers,
+    )
 
     # save combined data to sales data directory
-    current_date = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"all_sales_data_combined_{current_date}.csv"
-    all_global_data_list = []
-    for country, data in country_combined_sales_data.items():
-        all_global_data_list.append(data["all_data"])
-    all_global_data_df = pd.concat(all_global_data_list, ignore_index=True)
+    filename = f"all_sales_data_combined_{current_date}"
+    all_global_data_df = concat_sales_data(
+        [data["all_data"] for data in country_combined_sales_data.values()],
+        ignore_index=True,
+    )
+    del country_combined_sales_data
+    logger.info(
+        f"Combined sales data: {len(all_global_data_df)} rows, "
+        f"{all_global_data_df.memory_usage(deep=True).sum() / 2**20:.1f} MiB"
+    )
 
     logger.info(f"Final DF column counts: {all_global_data_df.count()}")
 
-    all_global_data_df["hash_id"] = all_global_data_df.apply(
-        lambda row: create_int_hash_from_df_row(row), axis=1
-    )
-    output_csv_path = os.path.join(os.getcwd(), "data", "amazon_sales", filename)
-    logger.info(f"Saving file to: {output_csv_path}")
-    all_global_data_df[needed_columns].to_csv(
-        path_or_buf=output_csv_path,
-        index=False,
-    )
+    with run_metrics.stage(
+        METRICS_SOURCE, HASH, rows_in=len(all_global_data_df)
+    ) as stage:
+        all_global_data_df["hash_id"] = hash_sales_data(all_global_data_df)
+        stage.rows_out = len(all_global_data_df)
+    with run_metrics.stage(
+        METRICS_SOURCE, WRITE, rows_in=len(all_global_data_df)
+    ) as stage:
+        output_path = write_intermediate(
+            all_global_data_df[needed_columns],
+            os.path.join(os.getcwd(), "data", "amazon_sales", filename),
+            [AmazonSalesTable],
+            args.output_format,
+        )
+        stage.rows_out = len(all_global_data_df)
+    logger.info(f"Saved file to: {output_path}")
+    run_metrics.log_summary()
+    run_metrics.write_report("amazon_raw_sales_data")
@@ -97,19 +97,176 @@ COUNTRY_TO_COLUMNS_MAPPING = {
     },
 }
 
+# currency and locale of the amounts (see `utils.amounts`) in the settlement reports.
+COUNTRY_TO_CURRENCY_AND_AMOUNT_LOCALE = {
+    "UK": ("GBP", "en_GB"),
+    "NL": ("EUR", "nl_NL"),
+    "FR": ("EUR", "fr_FR"),
+    "SE": ("SEK", "sv_SE"),
+    "IT": ("EUR", "it_IT"),
+    "DE": ("EUR", "de_DE"),
+    "PL": ("PLN", "pl_PL"),
+    "ES": ("EUR", "es_ES"),
+}
+
+# formats of the settlement report "date/time" column per country, after the localized
+# month names (lower case, without trailing dots) are replaced by their month number
+# and the trailing timezone is removed, e.g. "1 janv. 2021 00:02:15 UTC" -> "1 01 2021
+# 00:02:15". The formats are tried in order, dates matching none of them are parsed
+# with dateparser.
+COUNTRY_DATE_FORMATS = {
+    "UK": {
+        "formats": ["%d %b %Y %H:%M:%S", "%d/%m/%Y %H:%M:%S"],
+        "months": {},
+    },
+    "NL": {
+        "formats": ["%d %m %Y %H:%M:%S", "%d-%m-%Y %H:%M:%S"],
+        "months": {
+            "jan": "01",
+            "feb": "02",
+            "mrt": "03",
+            "apr": "04",
+            "mei": "05",
+            "jun": "06",
+            "jul": "07",
+            "aug": "08",
+            "sep": "09",
+            "okt": "10",
+            "nov": "11",
+            "dec": "12",
+        },
+    },
+    "FR": {
+        "formats": ["%d %m %Y %H:%M:%S", "%d/%m/%Y %H:%M:%S"],
+        "months": {
+            "janv": "01",
+            "févr": "02",
+            "mars": "03",
+            "avr": "04",
+            "mai": "05",
+            "juin": "06",
+            "juil": "07",
+            "août": "08",
+            "sept": "09",
+            "oct": "10",
+            "nov": "11",
+            "déc": "12",
+        },
+    },
+    "SE": {
+        "formats": ["%d %m %Y %H:%M:%S", "%Y-%m-%d %H:%M:%S"],
+        "months": {
+            "jan": "01",
+            "feb": "02",
+            "mars": "03",
+            "apr": "04",
+            "maj": "05",
+            "juni": "06",
+            "juli": "07",
+            "aug": "08",
+            "sep": "09",
+            "okt": "10",
+            "nov": "11",
+            "dec": "12",
+        },
+    },
+    "IT": {
+        "formats": ["%d %m %Y %H:%M:%S", "%d/%m/%Y %H:%M:%S"],
+        "months": {
+            "gen": "01",
+            "feb": "02",
+            "mar": "03",
+            "apr": "04",
+            "mag": "05",
+            "giu": "06",
+            "lug": "07",
+            "ago": "08",
+            "set": "09",
+            "ott": "10",
+            "nov": "11",
+            "dic": "12",
+        },
+    },
+    "DE": {
+        "formats": ["%d.%m.%Y %H:%M:%S", "%d %m %Y %H:%M:%S"],
+        "months": {
+            "jan": "01",
+            "feb": "02",
+            "mär": "03",
+            "apr": "04",
+            "mai": "05",
+            "jun": "06",
+            "jul": "07",
+            "aug": "08",
+            "sep": "09",
+            "okt": "10",
+            "nov": "11",
+            "dez": "12",
+        },
+    },
+    "PL": {
+        "formats": ["%d %m %Y %H:%M:%S", "%d.%m.%Y %H:%M:%S"],
+        "months": {
+            "sty": "01",
+            "lut": "02",
+            "mar": "03",
+            "kwi": "04",
+            "maj": "05",
+            "cze": "06",
+            "lip": "07",
+            "sie": "08",
+            "wrz": "09",
+            "paź": "10",
+            "lis": "11",
+            "gru": "12",
+        },
+    },
+    "ES": {
+        "formats": ["%d %m %Y %H:%M:%S", "%d/%m/%Y %H:%M:%S"],
+        "months": {
+            "ene": "01",
+            "feb": "02",
+            "mar": "03",
+            "abr": "04",
+            "may": "05",
+            "jun": "06",
+            "jul": "07",
+            "ago": "08",
+            "sept": "09",
+            "sep": "09",
+            "oct": "10",
+            "nov": "11",
+            "dic": "12",
+        },
+    },
+}
+# timezone suffixes of the "date/time" column which denote UTC.
+UTC_DATE_SUFFIX_REGX = r"\s+(?:UTC|GMT)(?:\+00:00)?$"
+
+# cache of the text lines extracted from invoice PDFs, keyed by the PDF content.
+# bump the extractor version whenever `extract_text_from_pdfs` changes its output.
+PDF_TEXT_CACHE_DIR = "data/.cache/pdf_text"
+PDF_TEXT_EXTRACTOR_VERSION = 2
+# cache of the monthly RgExport/GsExport workbooks as Parquet, keyed by the workbook.
+EXCEL_CACHE_DIR = "data/.cache/excel"
+
 # regex patterns for parsing PDF files
 file_date_regx = re.compile(r"^(?:.*)?(20[0-9]{6})")
 invoice_nr_regx = re.compile(r"^(?:.*)?(RE[0-9]{6})")
 reimbursement_nr_regx = re.compile(r"^(?:.*)?(GS[0-9]{6})")
-au_order_nr_regx = re.compile(r"^(?:.*)?(AU[0-9]{4,5})")
-real_order_nr_regx = re.compile(r"^(?:.*)?(REAL-ADA-[A-Z0-9]{7})")
-shopify_order_nr_regx = re.compile(r"^(?:.*)?(SHOPIFY-ADA-[0-9]{13})")
-amazon_order_nr_regx = re.compile(r"^(?:.*)?(AMZ-ADA-[0-9]{3}-[0-9]{7}-[0-9]{7})")
-ebay_order_nr_regx = re.compile(r"^(?:.*)?(EBAY-DE-ADA-[0-9]{2}-[0-9]{5}-[0-9]{5})")
+# the order numbers of each platform are extracted by `utils.order_numbers`.
 
 # pattern for date in the invoice
 invoice_date_regx = re.compile(r"^([0-9]{2}\.[0-9]{2}\.[0-9]{4})$")
 
+# start of an invoice table line: "<item_nr> <quantity>" of an item row, the VAT of
+# the last 3 columns of a split row or the net total after the table.
+invoice_table_line_head_regx = re.compile(
+    r"^(?:(?P<item>[0-9]{1,3}\s[0-9])"
+    r"|(?P<vat>[0-9]{1,2}(?:,00)?%\s)"
+    r"|(?P<net_total>Gesamt\sNetto\s))"
+)
+
 # standard complete line case
 standard_row_all_7_columns_regx = re.compile(
     r"^([0-9]{1,3})"  # item_nr
@@ -181,6 +338,13 @@ invoice_total_regx = re.compile(
     r"^Gesamtbetrag\s(?:€\s)?((?:-)?[\.0-9]{1,6},[0-9]{2})(?:\s€)?.*$"
 )
 
+# closing line of a document, the notes end before it.
+notes_end_regx = re.compile(r"^Vielen Dank")
+
+# last text line of a PDF whose pages after the notes were not extracted.
+SKIPPED_PDF_PAGES_LINE = "[{pages} pages after the notes not extracted]"
+skipped_pdf_pages_regx = re.compile(r"^\[[0-9]+ pages after the notes not extracted\]$")
+
 
 # column mapping for RgExport invoice files
 MONTHLY_INVOICE_COLUMN_MAPPING = {
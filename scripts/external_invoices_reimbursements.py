@@ -1,8 +1,14 @@
 import os
 import re
+import argparse
 import datetime
 import math
-from typing import List
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain
+from contextlib import closing
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from pathlib import Path
 import warnings
 
@@ -14,6 +20,7 @@ from scripts.constants import (
     MONTHLY_INVOICE_COLUMN_MAPPING,
     MONTHLY_REIMBURSEMENT_COLUMN_MAPPING,
     invoice_date_regx,
+    invoice_table_line_head_regx,
     standard_row_all_7_columns_regx,
     incomplete_row_4_columns_regx,
     only_article_or_description_in_row_regx,
@@ -23,16 +30,49 @@ from scripts.constants import (
     invoice_net_total_regx,
     vat_amount_regx,
     invoice_total_regx,
+    notes_end_regx,
+    skipped_pdf_pages_regx,
+    SKIPPED_PDF_PAGES_LINE,
     file_date_regx,
     invoice_nr_regx,
     reimbursement_nr_regx,
-    au_order_nr_regx,
-    real_order_nr_regx,
-    shopify_order_nr_regx,
-    amazon_order_nr_regx,
-    ebay_order_nr_regx,
+    PDF_TEXT_CACHE_DIR,
+    PDF_TEXT_EXTRACTOR_VERSION,
+    EXCEL_CACHE_DIR,
+)
+from database.tables import (
+    ExternalInvoices,
+    ExternalReimbursements,
+    ExternalPDFInvoiceHeaders,
+    ExternalPDFInvoiceItems,
+    ExternalPDFInvoiceTexts,
+    ExternalPDFReimbursementHeaders,
+    ExternalPDFReimbursementItems,
+    ExternalPDFReimbursementTexts,
+)
+from definitions.common import (
+    InvoiceHeaderTableColumns,
+    ReimbursementHeaderTableColumns,
+)
+from ingestors.metrics import (
+    HASH,
+    METADATA,
+    READ,
+    TRANSFORM,
+    WRITE,
+    StageMetrics,
+    run_metrics,
+)
+from utils.amounts import parse_amount, parse_amounts
+from utils.common import create_int_hash_from_df
+from utils.excel import get_excel_cache, read_excel_workbook
+from utils.file_cache import ContentAddressedCache, DataFrameCache
+from utils.order_numbers import extract_order_number
+from utils.intermediate_files import (
+    INTERMEDIATE_FORMATS,
+    PARQUET,
+    write_intermediate,
 )
-from utils.common import create_int_hash_from_df_row
 
 import logging
 
@@ -107,16 +147,8 @@ def parse_invoice_reimbursement_info_from_filename(folder_name: str, pdf_filenam
         logger.warning(
             f"Not a valid directory. Not a invoice/reimbursement PDFs folder: {folder_name}"
         )
-    if amazon_order_nr_regx.match(pdf_filename):
-        order_nr = amazon_order_nr_regx.findall(pdf_filename)[0]
-    elif ebay_order_nr_regx.match(pdf_filename):
-        order_nr = ebay_order_nr_regx.findall(pdf_filename)[0]
-    elif shopify_order_nr_regx.match(pdf_filename):
-        order_nr = shopify_order_nr_regx.findall(pdf_filename)[0]
-    elif au_order_nr_regx.match(pdf_filename):
-        order_nr = au_order_nr_regx.findall(pdf_filename)[0]
-    else:
-        order_nr = None
+    order_nr, _ = extract_order_number(pdf_filename)
+    if order_nr is None:
         logger.warning(
             "Unexpected PDF filename. Cannot find Order Nr in "
             f"filename: {pdf_filename}"
@@ -138,40 +170,87 @@ def parse_invoice_reimbursement_info_from_filename(folder_name: str, pdf_filenam
     }
 
 
-def extract_text_from_pdfs(pdf_path: str):
-    text = ""
-    pdf = pdfium.PdfDocument(pdf_path)
-    for i in range(len(pdf)):  # loop over all pages
-        page = pdf.get_page(i)
-        textpage = page.get_textpage()
-        text += textpage.get_text()
-        text += "\n"
-        [g.close() for g in (textpage, page)]
-    pdf.close()
-    return text.split("\r\n")
+def iter_pdf_text_lines(pdf_path: str, all_pages: bool = False) -> Iterator[str]:
+    """Yields the text lines of a PDF page by page. The lines are the same as when the
+    text of all pages, each followed by a newline, is split on "\\r\\n", i.e. the last
+    line of a page and the first line of the next page are one line.
+
+    The pages after the one with the closing line following the invoice total
+    ("Vielen Dank ...") are not extracted unless `all_pages` is set, the notes are
+    complete at that line. The number of skipped pages is then the last line
+    (`SKIPPED_PDF_PAGES_LINE`). The document and its pages are closed once the
+    generator is exhausted or closed, also if extracting a page fails.
+    """
+    with closing(pdfium.PdfDocument(pdf_path)) as pdf:
+        line = ""
+        is_totaled = False
+        is_notes_complete = False
+        for index in range(len(pdf)):
+            with closing(pdf.get_page(index)) as page, closing(
+                page.get_textpage()
+            ) as textpage:
+                page_lines = (line + textpage.get_text() + "\n").split("\r\n")
+            # the last line continues on the next page.
+            line = page_lines.pop()
+            yield from page_lines
+            if all_pages:
+                continue
+            for page_line in page_lines + [line]:
+                if invoice_total_regx.match(page_line):
+                    is_totaled = True
+                elif is_totaled and notes_end_regx.match(page_line):
+                    is_notes_complete = True
+            if is_notes_complete:
+                skipped_pages = len(pdf) - index - 1
+                if skipped_pages:
+                    warnings.warn(
+                        f"Not extracting {skipped_pages} pages after the notes of: "
+                        f"{pdf_path}"
+                    )
+                    yield line
+                    line = SKIPPED_PDF_PAGES_LINE.format(pages=skipped_pages)
+                break
+        yield line
+
+
+def _cache_when_exhausted(
+    lines: Iterator[str], cache: ContentAddressedCache, cache_key: str
+) -> Iterator[str]:
+    extracted_lines = []
+    for line in lines:
+        extracted_lines.append(line)
+        yield line
+    cache.put(cache_key, extracted_lines)
+
+
+def extract_text_from_pdfs(
+    pdf_path: str,
+    cache: Optional[ContentAddressedCache] = None,
+    all_pages: bool = False,
+) -> Iterable[str]:
+    """The text lines of a PDF as `iter_pdf_text_lines` yields them, the PDF is only
+    extracted while they are consumed. With a cache, PDFs whose content was already
+    extracted are served from it without opening them with PDFium, the lines of
+    other PDFs are cached once they were all consumed. The cache holds the lines up
+    to the end of the notes, it is not used with `all_pages`.
+    """
+    if cache is None or all_pages:
+        return iter_pdf_text_lines(pdf_path, all_pages)
+    cache_key = cache.key_for_file(pdf_path)
+    lines = cache.get(cache_key)
+    if lines is None:
+        return _cache_when_exhausted(iter_pdf_text_lines(pdf_path), cache, cache_key)
+    return lines
 
 
 def extract_invoice_metadata_from_pdf_text_line(line: str):
-    invoice_nr_from_pdf = (
-        invoice_nr_regx.findall(line)[0] if invoice_nr_regx.match(line) else None
-    )
+    invoice_nr_match = invoice_nr_regx.match(line)
+    reimbursement_nr_match = reimbursement_nr_regx.match(line)
+    invoice_nr_from_pdf = invoice_nr_match.group(1) if invoice_nr_match else None
     reimbursement_nr_from_pdf = (
-        reimbursement_nr_regx.findall(line)[0]
-        if reimbursement_nr_regx.match(line)
-        else None
+        reimbursement_nr_match.group(1) if reimbursement_nr_match else None
     )
-    if au_order_nr_regx.match(line):
-        order_nr_from_pdf = au_order_nr_regx.findall(line)[0]
-    elif real_order_nr_regx.match(line):
-        order_nr_from_pdf = real_order_nr_regx.findall(line)[0]
-    elif shopify_order_nr_regx.match(line):
-        order_nr_from_pdf = shopify_order_nr_regx.findall(line)[0]
-    elif amazon_order_nr_regx.match(line):
-        order_nr_from_pdf = amazon_order_nr_regx.findall(line)[0]
-    elif ebay_order_nr_regx.match(line):
-        order_nr_from_pdf = ebay_order_nr_regx.findall(line)[0]
-    else:
-        order_nr_from_pdf = None
+    order_nr_from_pdf, _ = extract_order_number(line)
 
     return {
         "invoice_nr_from_pdf": invoice_nr_from_pdf,
@@ -180,23 +259,98 @@ def extract_invoice_metadata_from_pdf_text_line(line: str):
     }
 
 
+class InvoiceTableLine(NamedTuple):
+    """Captured columns of each kind of invoice table row a line matches, the groups
+    are the same as `re.findall(...)[0]` of the corresponding pattern.
+    """
+
+    standard: Optional[tuple] = None
+    incomplete: Optional[tuple] = None
+    remaining_description: bool = False
+    last_3_columns: Optional[tuple] = None
+    neither_article_nor_description: Optional[tuple] = None
+    only_article_or_description: Optional[tuple] = None
+    net_total: Optional[str] = None
+
+
+def _groups(match: Optional[re.Match]) -> Optional[tuple]:
+    # `findall` reports groups which did not participate as "" instead of None.
+    return match.groups(default="") if match else None
+
+
+def classify_invoice_table_line(row: str) -> InvoiceTableLine:
+    """Classifies a line of the invoice table in a single pass.
+
+    The line's prefix (item number and quantity, VAT percentage, "Gesamt Netto" or
+    anything else) decides which of the table row patterns can match at all, so only
+    those are tried and each of them at most once. Every pattern is anchored at the
+    start of the line and its only unbounded parts (description and remainder) are
+    followed by tails of bounded length, so a line is classified in time linear in
+    its length.
+    """
+    head = invoice_table_line_head_regx.match(row)
+    if head is None:
+        return InvoiceTableLine(
+            remaining_description=remaining_description_row_regx.match(row) is not None
+        )
+    if head.lastgroup == "net_total":
+        net_total = invoice_net_total_regx.match(row)
+        return InvoiceTableLine(
+            remaining_description=remaining_description_row_regx.match(row) is not None,
+            net_total=net_total.group(1) if net_total else None,
+        )
+    if head.lastgroup == "vat":
+        return InvoiceTableLine(
+            last_3_columns=_groups(incomplete_row_last_3_columns_regx.match(row))
+        )
+
+    standard = _groups(standard_row_all_7_columns_regx.match(row))
+    if standard:
+        return InvoiceTableLine(standard=standard)
+    incomplete = _groups(incomplete_row_4_columns_regx.match(row))
+    neither_article_nor_description = _groups(
+        neither_article_nor_description_in_row_regx.match(row)
+    )
+    return InvoiceTableLine(
+        incomplete=incomplete,
+        remaining_description=incomplete is None
+        and remaining_description_row_regx.match(row) is not None,
+        neither_article_nor_description=neither_article_nor_description,
+        only_article_or_description=None
+        if neither_article_nor_description
+        else _groups(only_article_or_description_in_row_regx.match(row)),
+    )
+
+
 def get_invoice_reimbursement_table_from_extracted_text(
     file_name: str,
-    pdf_text: List[str],
+    pdf_text: Iterable[str],
 ):
+    """Parses the text lines of an invoice or reimbursement PDF in a single pass, the
+    lines can be a list or the generator `iter_pdf_text_lines`. The invoice and order
+    numbers are read from the lines up to the first "Seite:" line.
+
+    The document body starts at the first "Rechnung" or "RECHNUNGSKORREKTUR" heading,
+    a "Rechnung" line after the heading of a correction is part of its body. Searching
+    the whole document for "Rechnung" first, as before, started the body of such a
+    correction after its table, which was then not found.
+    """
     logger.info(f"Parsing: {file_name}")
-    if "Rechnung" in pdf_text:
-        heading_start_index = pdf_text.index("Rechnung")
-    elif "RECHNUNGSKORREKTUR" in pdf_text:
-        heading_start_index = pdf_text.index("RECHNUNGSKORREKTUR")
-    else:
-        raise Exception("Not able to find body containing table: {file_name}")
-    for line in pdf_text[:heading_start_index]:
+    lines = iter(pdf_text)
+    is_metadata_line = True
+    for line in lines:
+        if line in ("Rechnung", "RECHNUNGSKORREKTUR"):
+            heading = line
+            break
+        if not is_metadata_line:
+            continue
         if invoice_nr_regx.match(line) or reimbursement_nr_regx.match(line):
             extracted_metadata = extract_invoice_metadata_from_pdf_text_line(line)
         if re.match(r"^Seite:", line):
-            break
-    main_data_as_text = pdf_text[heading_start_index:]
+            is_metadata_line = False
+    else:
+        raise Exception(f"Not able to find body containing table: {file_name}")
+    main_data_as_text = chain([heading], lines)
     data_table_started = False
     is_file_totaled = False
     data_table_complete = False
@@ -214,16 +368,18 @@ def get_invoice_reimbursement_table_from_extracted_text(
             and total_amount is not None
         ):
             is_file_totaled = True
-        if invoice_date_regx.match(row):
-            invoice_reimbursement_date = invoice_date_regx.findall(row)[0]
+        invoice_date_match = invoice_date_regx.match(row)
+        if invoice_date_match:
+            invoice_reimbursement_date = invoice_date_match.group(1)
             continue
         if re.match(r"^Pos\.\sMenge", row, re.IGNORECASE) and not data_table_complete:
             data_table_started = True
             is_invoice_item_complete = False
             continue
         if data_table_started and not data_table_complete:
-            if standard_row_all_7_columns_regx.match(row):
-                columns_values = standard_row_all_7_columns_regx.findall(row)[0]
+            line = classify_invoice_table_line(row)
+            if line.standard:
+                columns_values = line.standard
                 table_rows.append(
                     {
                         "item_nr": int(columns_values[0]),
@@ -231,33 +387,21 @@ def get_invoice_reimbursement_table_from_extracted_text(
                         "article_id": columns_values[2],
                         "description": columns_values[3],
                         "vat": columns_values[4],
-                        "item_price": float(
-                            columns_values[5].replace(".", "").replace(",", ".")
-                        ),
-                        "total_price": float(
-                            columns_values[6].replace(".", "").replace(",", ".")
-                        ),
+                        "item_price": parse_amount(columns_values[5]),
+                        "total_price": parse_amount(columns_values[6]),
                     }
                 )
                 is_invoice_item_complete = True
                 continue
-            if incomplete_row_4_columns_regx.match(row):
-                incomplete_columns_values = incomplete_row_4_columns_regx.findall(row)[
-                    0
-                ]
+            if line.incomplete:
+                incomplete_columns_values = line.incomplete
                 is_invoice_item_complete = False
             if not is_invoice_item_complete:
-                if (
-                    remaining_description_row_regx.match(row)
-                    and not incomplete_row_4_columns_regx.match(row)
-                    and not incomplete_row_last_3_columns_regx.match(row)
-                ):
+                if line.remaining_description:
                     remaining_description_column_value = row
                     continue
-                if incomplete_row_last_3_columns_regx.match(row):
-                    last_3_columns_values = incomplete_row_last_3_columns_regx.findall(
-                        row
-                    )[0]
+                if line.last_3_columns:
+                    last_3_columns_values = line.last_3_columns
                     table_rows.append(
                         {
                             "item_nr": int(incomplete_columns_values[0]),
@@ -266,24 +410,14 @@ def get_invoice_reimbursement_table_from_extracted_text(
                             "description": incomplete_columns_values[3]
                             + (" " + remaining_description_column_value or ""),
                             "vat": last_3_columns_values[0],
-                            "item_price": float(
-                                last_3_columns_values[1]
-                                .replace(".", "")
-                                .replace(",", ".")
-                            ),
-                            "total_price": float(
-                                last_3_columns_values[2]
-                                .replace(".", "")
-                                .replace(",", ".")
-                            ),
+                            "item_price": parse_amount(last_3_columns_values[1]),
+                            "total_price": parse_amount(last_3_columns_values[2]),
                         }
                     )
                     is_invoice_item_complete = True
                     continue
-            if neither_article_nor_description_in_row_regx.match(row):
-                columns_values = neither_article_nor_description_in_row_regx.findall(
-                    row
-                )[0]
+            if line.neither_article_nor_description:
+                columns_values = line.neither_article_nor_description
                 table_rows.append(
                     {
                         "item_nr": int(columns_values[0]),
@@ -291,18 +425,14 @@ def get_invoice_reimbursement_table_from_extracted_text(
                         "article_id": "",
                         "description": "",
                         "vat": columns_values[2],
-                        "item_price": float(
-                            columns_values[3].replace(".", "").replace(",", ".")
-                        ),
-                        "total_price": float(
-                            columns_values[4].replace(".", "").replace(",", ".")
-                        ),
+                        "item_price": parse_amount(columns_values[3]),
+                        "total_price": parse_amount(columns_values[4]),
                     }
                 )
                 is_invoice_item_complete = True
                 continue
-            if only_article_or_description_in_row_regx.match(row):
-                columns_values = only_article_or_description_in_row_regx.findall(row)[0]
+            if line.only_article_or_description:
+                columns_values = line.only_article_or_description
                 table_rows.append(
                     {
                         "item_nr": int(columns_values[0]),
@@ -310,43 +440,28 @@ def get_invoice_reimbursement_table_from_extracted_text(
                         "article_id": "",
                         "description": columns_values[2],
                         "vat": columns_values[3],
-                        "item_price": float(
-                            columns_values[4].replace(".", "").replace(",", ".")
-                        ),
-                        "total_price": float(
-                            columns_values[5].replace(".", "").replace(",", ".")
-                        ),
+                        "item_price": parse_amount(columns_values[4]),
+                        "total_price": parse_amount(columns_values[5]),
                     }
                 )
                 is_invoice_item_complete = True
                 continue
-            if invoice_net_total_regx.match(row):
-                net_total_amount = float(
-                    invoice_net_total_regx.findall(row)[0]
-                    .replace(".", "")
-                    .replace(",", ".")
-                )
+            if line.net_total:
+                net_total_amount = parse_amount(line.net_total)
                 data_table_complete = True
                 continue
         if data_table_complete:
-            if invoice_net_total_regx.match(row):
-                net_total_amount = float(
-                    invoice_net_total_regx.findall(row)[0]
-                    .replace(".", "")
-                    .replace(",", ".")
-                )
+            net_total_match = invoice_net_total_regx.match(row)
+            if net_total_match:
+                net_total_amount = parse_amount(net_total_match.group(1))
                 continue
-            if vat_amount_regx.match(row):
-                vat_amount = float(
-                    vat_amount_regx.findall(row)[0].replace(".", "").replace(",", ".")
-                )
+            vat_amount_match = vat_amount_regx.match(row)
+            if vat_amount_match:
+                vat_amount = parse_amount(vat_amount_match.group(1))
                 continue
-            if invoice_total_regx.match(row):
-                total_amount = float(
-                    invoice_total_regx.findall(row)[0]
-                    .replace(".", "")
-                    .replace(",", ".")
-                )
+            total_amount_match = invoice_total_regx.match(row)
+            if total_amount_match:
+                total_amount = parse_amount(total_amount_match.group(1))
             if is_file_totaled:
                 invoice_reimbursement_notes.append(row)
     if data_table_complete and is_file_totaled:
@@ -355,7 +470,9 @@ def get_invoice_reimbursement_table_from_extracted_text(
         notes = [
             note
             for note in invoice_reimbursement_notes
-            if (not re.match("^Vielen Dank", note)) and (not re.match("^.*DE31", note))
+            if not notes_end_regx.match(note)
+            and not re.match("^.*DE31", note)
+            and not skipped_pdf_pages_regx.match(note)
         ]
         if not math.isclose(data_sum_of_total, net_total_amount, rel_tol=0.5):
             warnings.warn(
@@ -403,7 +520,6 @@ def add_metadata_to_extracted_data(
     file_metadata: dict,
     folder: str,
     file_name: str,
-    pdf_text: List[str],
 ):
     table_data = extracted_data["table_data"]
     table_data["filename"] = file_name
@@ -442,53 +558,281 @@ def add_metadata_to_extracted_data(
     table_data["reimbursement_number"] = extracted_data["extracted_metadata"][
         "reimbursement_nr_from_pdf"
     ]
-    table_data["pdf_text"] = "\n".join(pdf_text)
     return table_data
 
 
-def parse_monthly_pdfs_in_folder(folder_name: str, list_of_files: list):
+def _metrics_source(prefix: str, folder_or_file_name: str) -> str:
+    if "RE" in folder_or_file_name or "rgexport" in folder_or_file_name.lower():
+        return f"{prefix}_RE"
+    return f"{prefix}_GS"
+
+
+def get_pdf_text_cache() -> ContentAddressedCache:
+    return ContentAddressedCache(
+        PDF_TEXT_CACHE_DIR,
+        version=(
+            f"extractor{PDF_TEXT_EXTRACTOR_VERSION}"
+            f"-pypdfium2_{pdfium.V_PYPDFIUM2}-pdfium_{pdfium.V_LIBPDFIUM}"
+        ),
+    )
+
+
+def parse_pdf_file(
+    folder_name: str,
+    file_name: str,
+    cache: Optional[ContentAddressedCache] = None,
+    all_pages: bool = False,
+) -> Tuple[pd.DataFrame, List[str]]:
+    """Returns the item rows of the PDF with the header values and the text lines of
+    the PDF, which are joined and stored once per document instead of on every item
+    row by `save_combined_pdf_data`.
+    """
+    pdf_path = os.path.join(INVOICES_DIR, folder_name, file_name)
+    metrics_source = _metrics_source("external_pdfs", folder_name)
+    file_metadata = parse_invoice_reimbursement_info_from_filename(
+        folder_name, file_name
+    )
+    pdf_text_lines = []
+
+    def kept(lines: Iterable[str]) -> Iterator[str]:
+        for line in lines:
+            pdf_text_lines.append(line)
+            yield line
+
+    # the pages are extracted while they are parsed, both are a single stage.
+    with run_metrics.stage(
+        metrics_source, TRANSFORM, rows_in=1, bytes_read=os.path.getsize(pdf_path)
+    ) as stage:
+        extracted_data = get_invoice_reimbursement_table_from_extracted_text(
+            file_name,
+            kept(extract_text_from_pdfs(pdf_path, cache, all_pages)),
+        )
+        stage.rows_out = len(extracted_data["table_data"])
+    with run_metrics.stage(metrics_source, METADATA, rows_in=stage.rows_out) as stage:
+        table_data = add_metadata_to_extracted_data(
+            extracted_data, file_metadata, folder_name, file_name
+        )
+        stage.rows_out = len(table_data)
+    return table_data, pdf_text_lines
+
+
+def _parse_pdf_file_in_worker(
+    folder_name: str,
+    file_name: str,
+    cache: Optional[ContentAddressedCache],
+    all_pages: bool = False,
+) -> Tuple[Tuple[pd.DataFrame, List[str]], List[StageMetrics]]:
+    """Parses a single PDF in a worker process, the stages recorded by the worker are
+    returned with the result.
+    """
+    run_metrics.reset()
+    return parse_pdf_file(folder_name, file_name, cache, all_pages), run_metrics.stages
+
+
+def _terminate_workers(executor: ProcessPoolExecutor) -> None:
+    # a worker stuck in a C call of PDFium never returns and does not handle signals
+    # in Python, its process is killed. `terminate_workers` exists from Python 3.14.
+    if hasattr(executor, "terminate_workers"):
+        executor.terminate_workers()
+        return
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_pdf_files_with_timeout(
+    tasks: List[Tuple[str, str]],
+    workers: int,
+    timeout: int,
+    cache: Optional[ContentAddressedCache],
+    all_pages: bool = False,
+) -> List[Tuple[Optional[Tuple[pd.DataFrame, List[str]]], List[StageMetrics]]]:
+    """Parses the PDFs of `tasks` on `workers` processes and returns their results in
+    the order of `tasks`. A PDF which takes longer than `timeout` seconds is skipped
+    with None instead of its result, so that a single pathological PDF does not stall
+    the whole batch: the workers are killed and the other PDFs which were being
+    parsed are parsed again by new workers.
+
+    At most `workers` PDFs are submitted at a time, so each PDF starts right away and
+    its deadline is kept by the parent process, which also stops PDFium in the middle
+    of a C call.
+    """
+    results = [None] * len(tasks)
+    pending = deque(range(len(tasks)))
+    running = {}
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                index = pending.popleft()
+                future = executor.submit(
+                    _parse_pdf_file_in_worker, *tasks[index], cache, all_pages
+                )
+                running[future] = (index, time.monotonic() + timeout)
+            wait_seconds = None
+            if timeout:
+                next_deadline = min(deadline for _, deadline in running.values())
+                wait_seconds = max(next_deadline - time.monotonic(), 0)
+            done, _ = wait(running, timeout=wait_seconds, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, _ = running.pop(future)
+                results[index] = future.result()
+            now = time.monotonic()
+            timed_out = [
+                future
+                for future, (_, deadline) in running.items()
+                if timeout and deadline <= now
+            ]
+            if not timed_out:
+                continue
+            for future in timed_out:
+                index, _ = running.pop(future)
+                warnings.warn(
+                    f"Parsing timed out after {timeout}s, skipping file: "
+                    f"{os.path.join(*tasks[index])}"
+                )
+                results[index] = (None, [])
+            pending.extendleft(index for index, _ in running.values())
+            running.clear()
+            _terminate_workers(executor)
+            executor = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        executor.shutdown()
+    return results
+
+
+def save_combined_pdf_data(
+    folder_name: str,
+    parsed_pdfs: List[Tuple[pd.DataFrame, List[str]]],
+    output_format: str = PARQUET,
+):
+    """Saves the item rows of all PDFs of a folder as `combined_data` and the text of
+    each PDF once as `pdf_texts`, both keyed by the `internal_id` of the document.
+    """
+    # combine all DFs and save for the ingestor
+    if len(parsed_pdfs) > 0:
+        # the outer index level is the position of the PDF in `parsed_pdfs`.
+        combined_data = pd.concat(
+            [table_data for table_data, _ in parsed_pdfs], keys=range(len(parsed_pdfs))
+        )
+        if not combined_data.empty:
+            if "RE" in folder_name:
+                header_columns = InvoiceHeaderTableColumns
+                tables = [ExternalPDFInvoiceHeaders, ExternalPDFInvoiceItems]
+                text_table = ExternalPDFInvoiceTexts
+            else:
+                header_columns = ReimbursementHeaderTableColumns
+                tables = [
+                    ExternalPDFReimbursementHeaders,
+                    ExternalPDFReimbursementItems,
+                ]
+                text_table = ExternalPDFReimbursementTexts
+            metrics_source = _metrics_source("external_pdfs", folder_name)
+            with run_metrics.stage(
+                metrics_source, HASH, rows_in=len(combined_data)
+            ) as stage:
+                combined_data["hash_id"] = create_int_hash_from_df(combined_data)
+                combined_data["internal_id"] = create_int_hash_from_df(
+                    combined_data, header_columns
+                )
+                stage.rows_out = len(combined_data)
+            document_ids = combined_data["internal_id"].groupby(level=0).first()
+            pdf_texts = pd.DataFrame(
+                {
+                    "internal_id": document_ids.values,
+                    # the text is only joined for the documents which are stored.
+                    "pdf_text": [
+                        "\n".join(parsed_pdfs[i][1]) for i in document_ids.index
+                    ],
+                }
+            ).drop_duplicates("internal_id")
+            folder_path = os.path.join(
+                os.getcwd(), "data/external_invoices/", folder_name
+            )
+            with run_metrics.stage(
+                metrics_source, WRITE, rows_in=len(combined_data)
+            ) as stage:
+                write_intermediate(
+                    combined_data.reset_index(drop=True),
+                    os.path.join(folder_path, "combined_data"),
+                    tables,
+                    output_format,
+                )
+                write_intermediate(
+                    pdf_texts,
+                    os.path.join(folder_path, "pdf_texts"),
+                    [text_table],
+                    output_format,
+                )
+                stage.rows_out = len(combined_data)
+    else:
+        warnings.warn(f"No files found to parse data. folder_name: {folder_name}")
+
+
+def parse_monthly_pdfs_in_folder(
+    folder_name: str,
+    list_of_files: list,
+    cache: Optional[ContentAddressedCache] = None,
+    output_format: str = PARQUET,
+    all_pages: bool = False,
+):
+    """Parses the PDFs of a folder one after the other in this process. There is no
+    time limit per PDF, `--pdf-timeout` only applies to the worker processes of
+    `parse_pdfs_in_folders_in_parallel`.
+    """
     Path(os.path.join(os.getcwd(), "data/external_invoices/", folder_name)).mkdir(
         parents=True, exist_ok=True
     )
-    invoice_tables_list = []
+    parsed_pdfs = []
     for file_name in list_of_files:
         if ".pdf" in file_name.lower():
-            pdf_path = os.path.join(INVOICES_DIR, folder_name, file_name)
-            file_metadata = parse_invoice_reimbursement_info_from_filename(
-                folder_name, file_name
-            )
-            pdf_text_lines = extract_text_from_pdfs(pdf_path)
-            extracted_data = get_invoice_reimbursement_table_from_extracted_text(
-                file_name,
-                pdf_text_lines,
-            )
-            table_data = add_metadata_to_extracted_data(
-                extracted_data, file_metadata, folder_name, file_name, pdf_text_lines
-            )
-            invoice_tables_list.append(table_data)
+            parsed_pdfs.append(parse_pdf_file(folder_name, file_name, cache, all_pages))
         else:
             logger.info(f"Not parsing non PDF file: {file_name}")
-    # combine all DFs and save as CSV
-    if len(invoice_tables_list) > 0:
-        combined_data = pd.concat(invoice_tables_list)
-        if not combined_data.empty:
-            combined_data["hash_id"] = combined_data.apply(
-                lambda row: create_int_hash_from_df_row(row), axis=1
-            )
-            combined_data.to_csv(
-                path_or_buf=os.path.join(
-                    os.getcwd(),
-                    "data/external_invoices/",
-                    folder_name,
-                    "combined_data.csv",
-                ),
-                index=False,
-            )
-    else:
-        warnings.warn(f"No files found to parse data. folder_name: {folder_name}")
+    save_combined_pdf_data(folder_name, parsed_pdfs, output_format)
+
+
+def parse_pdfs_in_folders_in_parallel(
+    pdf_folders: Dict[str, List[str]],
+    workers: int,
+    timeout: int,
+    cache: Optional[ContentAddressedCache] = None,
+    output_format: str = PARQUET,
+    all_pages: bool = False,
+):
+    """Parses the PDFs of all given `YYYYMM/RE` and `YYYYMM/GS` folders on a pool of
+    `workers` processes. Results are collected in the same order as the sequential
+    `parse_monthly_pdfs_in_folder`, so each `combined_data` file is identical.
+    """
+    tasks = []
+    for folder_name, list_of_files in pdf_folders.items():
+        Path(os.path.join(os.getcwd(), "data/external_invoices/", folder_name)).mkdir(
+            parents=True, exist_ok=True
+        )
+        for file_name in list_of_files:
+            if ".pdf" in file_name.lower():
+                tasks.append((folder_name, file_name))
+            else:
+                logger.info(f"Not parsing non PDF file: {file_name}")
+
+    logger.info(f"Parsing {len(tasks)} PDFs using {workers} worker processes.")
+    folder_pdfs = {folder_name: [] for folder_name in pdf_folders}
+    results = _parse_pdf_files_with_timeout(tasks, workers, timeout, cache, all_pages)
+    for (folder_name, _), (parsed_pdf, stages) in zip(tasks, results):
+        run_metrics.add(stages)
+        if parsed_pdf is not None:
+            folder_pdfs[folder_name].append(parsed_pdf)
 
+    for folder_name, parsed_pdfs in folder_pdfs.items():
+        save_combined_pdf_data(folder_name, parsed_pdfs, output_format)
 
-def parse_monthly_parent_folder(folder_name: str, list_of_files: List[str]):
+
+def parse_monthly_parent_folder(
+    folder_name: str,
+    list_of_files: List[str],
+    output_format: str = PARQUET,
+    excel_cache: Optional[DataFrameCache] = None,
+):
     numeric_columns = [
         "total",
         "total_order",
@@ -497,80 +841,95 @@ def parse_monthly_parent_folder(folder_name: str, list_of_files: List[str]):
         "credit_voucher",
     ]
 
-    def save_invoice_reimbursement_data_as_clean_csv(
+    def save_invoice_reimbursement_data_as_clean_file(
         folder: str,
         file: str,
         monthly_df: pd.DataFrame,
     ):
         file = file.replace(" ", "_").replace("-", "")
         logger.info(f"""File columns: {"_".join(sorted(monthly_df.columns))}""")
-        if "rgexport" in file.lower():
-            monthly_df.columns = [column.strip() for column in monthly_df.columns]
-            monthly_df.rename(columns=MONTHLY_INVOICE_COLUMN_MAPPING, inplace=True)
-            monthly_df = monthly_df[MONTHLY_INVOICE_COLUMN_MAPPING.values()].copy()
-            # filter out last row from each file where the monthly total is.
-            exclusion_filter = (
-                monthly_df["platform"].isna()
-                & monthly_df["currency"].isna()
-                & monthly_df["total"].notnull()
-            )
-            monthly_df = monthly_df[~exclusion_filter].copy()
-        elif "gsexport" in file.lower():
-            monthly_df.rename(
-                columns=MONTHLY_REIMBURSEMENT_COLUMN_MAPPING, inplace=True
-            )
-            monthly_df = monthly_df[
-                MONTHLY_REIMBURSEMENT_COLUMN_MAPPING.values()
-            ].copy()
-            # filter out last row from each file where the monthly total is.
-            exclusion_filter = (
-                monthly_df["platform"].isna()
-                & monthly_df["currency"].isna()
-                & monthly_df["total_invoice_correction"].notnull()
-            )
-            monthly_df = monthly_df[~exclusion_filter].copy()
-        else:
-            logger.warning(
-                f"Unknown file type. Should be invoice or reimbursement. File: {file}"
-            )
-        for column in monthly_df.columns:
-            if column in numeric_columns and monthly_df[column].dtype in [str, object]:
-                monthly_df[column] = (
-                    monthly_df[column]
-                    .str.replace(".", "")
-                    .str.replace(",", ".")
-                    .astype(float)
+        metrics_source = _metrics_source("external_invoices", file)
+        with run_metrics.stage(
+            metrics_source, TRANSFORM, rows_in=len(monthly_df)
+        ) as stage:
+            tables = []
+            if "rgexport" in file.lower():
+                tables = [ExternalInvoices]
+                monthly_df.columns = [column.strip() for column in monthly_df.columns]
+                monthly_df.rename(columns=MONTHLY_INVOICE_COLUMN_MAPPING, inplace=True)
+                monthly_df = monthly_df[MONTHLY_INVOICE_COLUMN_MAPPING.values()].copy()
+                # filter out last row from each file where the monthly total is.
+                exclusion_filter = (
+                    monthly_df["platform"].isna()
+                    & monthly_df["currency"].isna()
+                    & monthly_df["total"].notnull()
+                )
+                monthly_df = monthly_df[~exclusion_filter].copy()
+            elif "gsexport" in file.lower():
+                tables = [ExternalReimbursements]
+                monthly_df.rename(
+                    columns=MONTHLY_REIMBURSEMENT_COLUMN_MAPPING, inplace=True
                 )
+                monthly_df = monthly_df[
+                    MONTHLY_REIMBURSEMENT_COLUMN_MAPPING.values()
+                ].copy()
+                # filter out last row from each file where the monthly total is.
+                exclusion_filter = (
+                    monthly_df["platform"].isna()
+                    & monthly_df["currency"].isna()
+                    & monthly_df["total_invoice_correction"].notnull()
+                )
+                monthly_df = monthly_df[~exclusion_filter].copy()
+            else:
+                logger.warning(
+                    f"Unknown file type. Should be invoice or reimbursement. File: {file}"
+                )
+            for column in monthly_df.columns:
+                dtype = monthly_df[column].dtype
+                if column in numeric_columns and dtype in [str, object]:
+                    monthly_df[column], invalid_amounts = parse_amounts(
+                        monthly_df[column]
+                    )
+                    if invalid_amounts.any():
+                        logger.warning(
+                            f"Could not parse {invalid_amounts.sum()} amounts in column: "
+                            f"{column} of file: {file}."
+                        )
+            stage.rows_out = len(monthly_df)
         # create hash for each row from all concatenated column values in the row.
-        monthly_df["hash_id"] = monthly_df.apply(
-            lambda row: create_int_hash_from_df_row(row), axis=1
-        )
+        with run_metrics.stage(metrics_source, HASH, rows_in=len(monthly_df)) as stage:
+            monthly_df["hash_id"] = create_int_hash_from_df(monthly_df)
+            stage.rows_out = len(monthly_df)
         Path(os.path.join(os.getcwd(), "data/external_invoices/", folder)).mkdir(
             parents=True, exist_ok=True
         )
-        csv_out_path = os.path.join(
-            os.getcwd(),
-            "data/external_invoices/",
-            folder,
-            folder + "_" + os.path.splitext(file)[0] + "_cleaned.csv",
-        )
-        monthly_df.to_csv(csv_out_path, index=False)
+        with run_metrics.stage(metrics_source, WRITE, rows_in=len(monthly_df)) as stage:
+            write_intermediate(
+                monthly_df,
+                os.path.join(
+                    os.getcwd(),
+                    "data/external_invoices/",
+                    folder,
+                    folder + "_" + os.path.splitext(file)[0] + "_cleaned",
+                ),
+                tables,
+                output_format,
+            )
+            stage.rows_out = len(monthly_df)
 
     for filename in list_of_files:
         file_path = os.path.join(INVOICES_DIR, folder_name, filename)
         if "rgexport" in filename.lower() or "gsexport" in filename.lower():
             logger.info(f"Will be reading monthly file at: {file_path}")
+            metrics_source = _metrics_source("external_invoices", filename)
             if ".xl" in filename.lower():
-                monthly_invoice = pd.read_excel(
-                    file_path,
-                    sheet_name=None,
-                )
-                if len(monthly_invoice) > 0:
-                    file_tables = []
-                    for sheet_name, excel_table_df in monthly_invoice.items():
-                        file_tables.append(excel_table_df)
-                    monthly_df = pd.concat(file_tables)
-                    save_invoice_reimbursement_data_as_clean_csv(
+                with run_metrics.stage(
+                    metrics_source, READ, bytes_read=os.path.getsize(file_path)
+                ) as stage:
+                    monthly_df = read_excel_workbook(file_path, excel_cache)
+                    stage.rows_out = 0 if monthly_df is None else len(monthly_df)
+                if monthly_df is not None:
+                    save_invoice_reimbursement_data_as_clean_file(
                         folder_name, filename, monthly_df
                     )
                 else:
@@ -578,8 +937,12 @@ def parse_monthly_parent_folder(folder_name: str, list_of_files: List[str]):
                         f"No table found in Excel file: {filename}, path: {file_path}"
                     )
             elif ".csv" in filename.lower():
-                monthly_df = pd.read_csv(file_path, delimiter=";")
-                save_invoice_reimbursement_data_as_clean_csv(
+                with run_metrics.stage(
+                    metrics_source, READ, bytes_read=os.path.getsize(file_path)
+                ) as stage:
+                    monthly_df = pd.read_csv(file_path, delimiter=";")
+                    stage.rows_out = len(monthly_df)
+                save_invoice_reimbursement_data_as_clean_file(
                     folder_name, filename, monthly_df
                 )
             else:
@@ -591,8 +954,51 @@ def parse_monthly_parent_folder(folder_name: str, list_of_files: List[str]):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Parse monthly external invoice exports and invoice PDFs."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes parsing PDFs, 1 parses them sequentially.",
+    )
+    parser.add_argument(
+        "--pdf-timeout",
+        type=int,
+        default=120,
+        help="Seconds after which a single PDF is skipped and its worker process "
+        "killed, only with --workers > 1, PDFs parsed sequentially have no limit.",
+    )
+    parser.add_argument(
+        "--no-pdf-text-cache",
+        action="store_true",
+        help=f"Always extract the PDF text instead of using: {PDF_TEXT_CACHE_DIR}",
+    )
+    parser.add_argument(
+        "--all-pdf-pages",
+        action="store_true",
+        help="Extract all pages of the PDFs instead of stopping after their notes, "
+        "the PDF text cache is not used.",
+    )
+    parser.add_argument(
+        "--no-excel-cache",
+        action="store_true",
+        help=f"Always parse the Excel exports instead of using: {EXCEL_CACHE_DIR}",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=INTERMEDIATE_FORMATS,
+        default=PARQUET,
+        help="Format of the combined and cleaned files read by the ingestors.",
+    )
+    args = parser.parse_args()
+    pdf_text_cache = None if args.no_pdf_text_cache else get_pdf_text_cache()
+    excel_cache = None if args.no_excel_cache else get_excel_cache(EXCEL_CACHE_DIR)
+
     folders_metadata = parse_external_invoices_folder()
     logger.info(f"folders_metadata.keys: {folders_metadata.keys()}")
+    pdf_folders = {}
     for folder_identifier, folder_metadata in folders_metadata.items():
         if len(folder_identifier) > 0 and "archive" not in folder_identifier:
             logger.info(
@@ -600,10 +1006,35 @@ if __name__ == "__main__":
             )
             if folder_identifier:
                 if "RE" in folder_identifier or "GS" in folder_identifier:
-                    parse_monthly_pdfs_in_folder(
-                        folder_identifier, folder_metadata["files"]
-                    )
+                    if args.workers > 1:
+                        pdf_folders[folder_identifier] = folder_metadata["files"]
+                    else:
+                        parse_monthly_pdfs_in_folder(
+                            folder_identifier,
+                            folder_metadata["files"],
+                            pdf_text_cache,
+                            args.output_format,
+                            args.all_pdf_pages,
+                        )
                 else:
                     parse_monthly_parent_folder(
-                        folder_identifier, folder_metadata["files"]
+                        folder_identifier,
+                        folder_metadata["files"],
+                        args.output_format,
+                        excel_cache,
                     )
+    if pdf_folders:
+        parse_pdfs_in_folders_in_parallel(
+            pdf_folders,
+            workers=args.workers,
+            timeout=args.pdf_timeout,
+            cache=pdf_text_cache,
+            output_format=args.output_format,
+            all_pages=args.all_pdf_pages,
+        )
+    if pdf_text_cache is not None:
+        pdf_text_cache.prune()
+    if excel_cache is not None:
+        excel_cache.prune()
+    run_metrics.log_summary()
+    run_metrics.write_report("external_invoices_reimbursements")
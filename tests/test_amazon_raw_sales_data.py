@@ -0,0 +1,73 @@
+import dateparser
+import pandas as pd
+import pytest
+
+from scripts.amazon_raw_sales_data import (
+    compact_dtypes,
+    concat_sales_data,
+    hash_sales_data,
+    parse_amazon_dates,
+)
+from utils.common import create_int_hash_from_df
+
+
+@pytest.mark.parametrize(
+    "country_code, date_strings",
+    [
+        ("UK", ["1 Jan 2021 00:02:15 UTC", "Jan 5, 2021 1:02:03 AM PST"]),
+        ("DE", ["01.01.2021 00:02:15 UTC", "1 Mär. 2021 10:00:00 UTC"]),
+        ("FR", ["1 janv. 2021 00:02:15 UTC", "3 août 2021 01:02:03 UTC"]),
+        ("IT", ["1 gen 2021 00:02:15 UTC", "9 set 2021 23:59:59 UTC"]),
+        ("ES", ["1 ene 2021 0:02:15 UTC", "2 sept 2021 00:02:15 UTC"]),
+        ("NL", ["1 mrt. 2021 00:02:15 UTC", "1 mei 2021 00:02:15 UTC"]),
+        ("PL", ["1 sty 2021 00:02:15 UTC", "1 paź 2021 00:02:15 UTC"]),
+        ("SE", ["1 juni 2021 00:02:15 UTC", "1 maj 2021 00:02:15 UTC"]),
+    ],
+)
+def test_parse_amazon_dates_matches_dateparser(country_code, date_strings):
+    expected = [
+        pd.Timestamp(dateparser.parse(date)).tz_convert("UTC") for date in date_strings
+    ]
+
+    results = parse_amazon_dates(pd.Series(date_strings), country_code)
+
+    assert str(results.dtype) == "datetime64[ns, UTC]"
+    assert results.tolist() == expected
+
+
+def test_parse_amazon_dates_unparsable_dates_are_nat():
+    results = parse_amazon_dates(
+        pd.Series(["1 janv. 2021 00:02:15 UTC", "not a date", None]), "FR"
+    )
+
+    assert results.notna().tolist() == [True, False, False]
+
+
+def test_compact_sales_data_hashes_like_object_columns():
+    files = [
+        pd.DataFrame(
+            {
+                "order_id": ["1", "2"],
+                "sku": ["A-1", None],
+                "quantity": [1.0, -2.0],
+                "total_price": [9.99, -0.01],
+                "source_file": file_name,
+            }
+        )
+        for file_name in ["yearly.csv", "monthly.csv"]
+    ]
+    files[1]["sku"] = ["B-2", "A-1"]
+    expected = pd.concat(files, ignore_index=True)
+
+    combined = concat_sales_data(
+        [compact_dtypes(data.copy()) for data in files], ignore_index=True
+    )
+
+    assert combined["sku"].dtype == "category"
+    assert combined["source_file"].dtype == "category"
+    assert combined["quantity"].dtype == "float32"
+    assert combined["total_price"].dtype == "float64"
+    assert combined.astype(expected.dtypes).equals(expected)
+    assert hash_sales_data(combined).equals(
+        create_int_hash_from_df(expected.drop(columns="source_file"))
+    )
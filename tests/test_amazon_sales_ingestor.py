@@ -0,0 +1,22 @@
+import pandas as pd
+
+from ingestors.source_data_ingestors.amazon_sales_data import (
+    AmazonSalesSourceIngestor,
+)
+
+
+def test_rows_without_date_are_written_to_the_rejected_rows_report(tmp_path):
+    ingestor = AmazonSalesSourceIngestor.__new__(AmazonSalesSourceIngestor)
+    ingestor.data = pd.DataFrame(
+        {
+            "hash_id": [1, 2, 3],
+            "date_time": pd.to_datetime(["2021-01-05", None, "2021-02-01"]),
+            "source_file": ["a.csv", "a.csv", "b.csv"],
+        }
+    )
+
+    ingestor.reject_rows_without_date(str(tmp_path))
+
+    assert ingestor.data["hash_id"].tolist() == [1, 3]
+    (report_path,) = tmp_path.glob("rejected_dates_*.csv")
+    assert pd.read_csv(report_path)["hash_id"].tolist() == [2]
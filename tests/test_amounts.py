@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from utils.amounts import parse_amount, parse_amounts
+
+
+def test_parse_amounts_de_locale():
+    values = pd.Series(
+        ["-1.234,56", "12\xa0345,00", "1 234,5", "−3,00", None, "", "n/a", 4.5]
+    )
+
+    amounts, invalid = parse_amounts(values, "de_DE")
+
+    assert amounts.dtype == "float64"
+    assert amounts.iloc[:4].tolist() == [-1234.56, 12345.0, 1234.5, -3.0]
+    assert amounts.iloc[4:7].isna().all()
+    assert amounts.iloc[7] == 4.5
+    assert invalid.tolist() == [False] * 6 + [True, False]
+
+
+def test_parse_amounts_en_locale_and_numeric_series():
+    amounts, invalid = parse_amounts(pd.Series(["1,234.56", "-0.50"]), "en_GB")
+    assert amounts.tolist() == [1234.56, -0.5]
+    assert not invalid.any()
+
+    amounts, invalid = parse_amounts(pd.Series([1, 2]), "en_GB")
+    assert amounts.tolist() == [1.0, 2.0]
+    assert not invalid.any()
+
+
+def test_parse_amount_scalar():
+    assert parse_amount("-2.469,12") == -2469.12
+    with pytest.raises(Exception, match="Cannot parse amount: 'Gesamt'"):
+        parse_amount("Gesamt")
+    with pytest.raises(Exception, match="Unknown amount locale"):
+        parse_amount("1,00", "xx_XX")
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.common import (
+    MD5_ID_MODULUS,
+    create_int_hash_from_df,
+    create_int_hash_from_df_row,
+)
+
+
+@pytest.fixture
+def mixed_dtypes_df():
+    return pd.DataFrame(
+        {
+            "item_nr": [1, 2, 3],
+            "item_price": [1.11, np.nan, 10.0],
+            "description": ["Versand", None, "GLS-DB"],
+            "date_time": pd.to_datetime(["2021-01-10", "2021-01-10 10:00:00", None]),
+        }
+    )
+
+
+def test_create_int_hash_from_df_md5_compatible(mixed_dtypes_df):
+    for columns in (None, ["item_nr", "item_price"], ["description", "date_time"]):
+        data = mixed_dtypes_df if columns is None else mixed_dtypes_df[columns]
+        expected = data.apply(lambda row: create_int_hash_from_df_row(row), axis=1)
+
+        results = create_int_hash_from_df(
+            mixed_dtypes_df, columns=columns, md5_compatible=True
+        )
+
+        assert expected.tolist() == results.tolist()
+
+
+def test_create_int_hash_from_df_is_deterministic_bigint(mixed_dtypes_df):
+    results = create_int_hash_from_df(mixed_dtypes_df)
+
+    assert results.dtype == np.int64
+    assert results.is_unique
+    assert results.tolist() == create_int_hash_from_df(mixed_dtypes_df).tolist()
+    assert create_int_hash_from_df(mixed_dtypes_df.iloc[:0]).empty
+
+
+def test_md5_ids_are_told_apart_from_the_64_bit_ids(mixed_dtypes_df):
+    md5_ids = create_int_hash_from_df(mixed_dtypes_df, md5_compatible=True)
+    ids = create_int_hash_from_df(mixed_dtypes_df)
+
+    assert md5_ids.between(0, MD5_ID_MODULUS - 1).all()
+    assert not ids.between(0, MD5_ID_MODULUS - 1).any()
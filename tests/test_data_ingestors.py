@@ -0,0 +1,71 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+from definitions.data_ingestors import (
+    SOURCE_DATA_INGESTOR_NAMES,
+    get_ingestor_definitions,
+)
+
+
+def test_importing_the_registry_imports_no_ingestor():
+    loaded_modules = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, definitions.data_ingestors; print(' '.join(sys.modules))",
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.split()
+
+    assert not [
+        module
+        for module in loaded_modules
+        if module.split(".")[0] in ("pandas", "sqlalchemy", "ingestors", "database")
+    ]
+
+
+def test_ingestors_are_selected_by_name():
+    definitions = get_ingestor_definitions(["returns_from_amazon", "external_pdfs_GS"])
+
+    # registry order, not the order of the names.
+    assert [definition.name for definition in definitions] == [
+        "external_pdfs_GS",
+        "returns_from_amazon",
+    ]
+    ingestor = definitions[0].load()
+    assert ingestor.func.__name__ == "ExternalPDFInvoicesReimbursementsIngestor"
+    assert ingestor.keywords == {"file_type": "GS"}
+    assert len(get_ingestor_definitions()) == len(SOURCE_DATA_INGESTOR_NAMES)
+    with pytest.raises(Exception, match="Unknown ingestors"):
+        get_ingestor_definitions(["amazon_sales", "amazon_returns"])
+
+
+@pytest.mark.parametrize(
+    "file_path, ingestor_name",
+    [
+        (
+            "data/external_invoices/202102/202102_RgExport_cleaned.parquet",
+            "external_invoices_RE",
+        ),
+        (
+            "data/external_invoices/202102/202102_GsExport_cleaned.csv",
+            "external_invoices_GS",
+        ),
+        ("data/external_invoices/202102/RE/combined_data.parquet", "external_pdfs_RE"),
+        ("data/external_invoices/202102/GS/pdf_texts.parquet", "external_pdfs_GS"),
+        ("data/returns_amazon/remissions_from_amazon.csv", "returns_from_amazon"),
+        ("data/amazon_sales/all_sales_data_combined.parquet", None),
+    ],
+)
+def test_sources_are_reloaded_by_the_ingestor_of_their_files(file_path, ingestor_name):
+    assert [
+        definition.name
+        for definition in get_ingestor_definitions()
+        if definition.loads_file(file_path)
+    ] == ([ingestor_name] if ingestor_name else [])
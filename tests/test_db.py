@@ -0,0 +1,50 @@
+from database.db import get_schema_drift
+from database.tables import ExternalPDFInvoiceHeaders
+
+
+class Inspector:
+    """The tables as they were created before the model changed."""
+
+    def __init__(self, columns, primary_key, unique_constraints, indexes):
+        self.columns = columns
+        self.primary_key = primary_key
+        self.unique_constraints = unique_constraints
+        self.indexes = indexes
+
+    def get_columns(self, table_name, schema):
+        return [{"name": name} for name in self.columns]
+
+    def get_pk_constraint(self, table_name, schema):
+        return {"constrained_columns": self.primary_key}
+
+    def get_unique_constraints(self, table_name, schema):
+        return [{"column_names": columns} for columns in self.unique_constraints]
+
+    def get_indexes(self, table_name, schema):
+        return self.indexes
+
+
+def test_schema_drift_of_an_existing_table():
+    table = ExternalPDFInvoiceHeaders.__table__
+    columns = [column.name for column in table.columns]
+    indexes = [
+        {
+            "name": index.name,
+            "column_names": [c.name for c in index.columns],
+            "unique": index.unique,
+        }
+        for index in table.indexes
+    ]
+
+    assert (
+        get_schema_drift(
+            table, Inspector(columns, ["unique_id"], [["internal_id"]], indexes)
+        )
+        == []
+    )
+    assert get_schema_drift(
+        table, Inspector([*columns, "pdf_text"], ["unique_id"], [], indexes)
+    ) == [
+        "columns ['pdf_text'] not in the model",
+        "['internal_id'] not unique",
+    ]
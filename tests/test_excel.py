@@ -0,0 +1,48 @@
+import datetime
+
+import openpyxl
+import pandas as pd
+
+from utils.excel import get_excel_cache, read_excel_sheets, read_excel_workbook
+
+
+def _write_export(path, second_total="7,50"):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Belegnummer", "Gesamtsumme", "Datum", "Plattform", "Belegnummer"])
+    sheet.append(["R1", 12.0, datetime.datetime(2021, 2, 1, 10), "Amazon", "x"])
+    sheet.append(["R2", second_total, None, None, None, None])
+    sheet.append([None, 19.5])
+    sheet["B5"] = "=1/0"
+    sheet.append([])
+    second_sheet = workbook.create_sheet("Gutschriften")
+    second_sheet.append(["Belegnummer", "Gesamtsumme"])
+    second_sheet.append(["G1", 3])
+    workbook.create_sheet("Leer")
+    workbook.save(path)
+
+
+def test_read_excel_sheets_like_read_excel(tmp_path):
+    path = str(tmp_path / "RgExport.xlsx")
+    _write_export(path)
+
+    expected = pd.read_excel(path, sheet_name=None)
+    sheets = read_excel_sheets(path)
+
+    assert list(sheets) == list(expected)
+    for sheet_name, sheet in sheets.items():
+        pd.testing.assert_frame_equal(sheet, expected[sheet_name])
+
+
+def test_unchanged_workbook_is_read_from_cache(tmp_path, monkeypatch):
+    path = str(tmp_path / "GsExport.xlsx")
+    _write_export(path, second_total=7.5)
+    cache = get_excel_cache(str(tmp_path / "cache"))
+    workbook = read_excel_workbook(path, cache)
+
+    def parse_again(file_path):
+        raise AssertionError(f"parsed cached workbook: {file_path}")
+
+    monkeypatch.setattr("utils.excel.read_excel_sheets", parse_again)
+    pd.testing.assert_frame_equal(read_excel_workbook(path, cache), workbook)
+    assert len(workbook) == 4
@@ -0,0 +1,90 @@
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import inspect, select
+from sqlalchemy.exc import OperationalError
+
+from database.base import engine
+from database.manifest import delete_all_rows_of_sources
+from database.tables import ExternalInvoices, SourceMetaDataTable
+from ingestors.reload import get_source_id
+from ingestors.source_data_ingestors.external_invoices_ingestor import (
+    ExternalInvoicesReimbursementsIngestor,
+)
+
+# far from the hash_ids of real exports, the rows are loaded into the raw table.
+HASH_ID = -9_100_000_000_000_000_000
+
+
+@pytest.fixture
+def connection(tmp_path, monkeypatch):
+    """A connection to the database whose transaction is rolled back after the test."""
+    try:
+        connection = engine.connect()
+    except OperationalError:
+        pytest.skip("No database to load into.")
+    if not inspect(connection).has_table(
+        ExternalInvoices.__tablename__, ExternalInvoices.__table__.schema
+    ):
+        connection.close()
+        pytest.skip("The database is not initialised.")
+    transaction = connection.begin()
+    monkeypatch.chdir(tmp_path)
+    yield connection
+    transaction.rollback()
+    connection.close()
+
+
+def write_export(folder, hash_ids):
+    os.makedirs(os.path.join("data/external_invoices", folder), exist_ok=True)
+    file_path = f"data/external_invoices/{folder}/rgexport_{folder}_cleaned.parquet"
+    pd.DataFrame(
+        {
+            "hash_id": hash_ids,
+            "invoice_number": [f"R{hash_id}" for hash_id in hash_ids],
+        }
+    ).to_parquet(file_path)
+    return file_path
+
+
+def get_row_sources(connection, file_paths):
+    return dict(
+        connection.execute(
+            select(ExternalInvoices.hash_id, SourceMetaDataTable.source_filename)
+            .join(
+                SourceMetaDataTable,
+                ExternalInvoices.source_id == SourceMetaDataTable.source_id,
+            )
+            .where(SourceMetaDataTable.source_filename.in_(file_paths))
+        ).all()
+    )
+
+
+def test_reloading_one_of_two_overlapping_exports_keeps_their_shared_rows(
+    connection,
+):
+    monthly = write_export("209901", [HASH_ID + 1, HASH_ID + 2])
+    yearly = write_export("2099", [HASH_ID + 2, HASH_ID + 3])
+    for file_path in [monthly, yearly]:
+        ExternalInvoicesReimbursementsIngestor(
+            file_type="RE", source_files=[file_path], connection=connection
+        )
+    assert get_row_sources(connection, [monthly, yearly]) == {
+        HASH_ID + 1: monthly,
+        HASH_ID + 2: monthly,
+        HASH_ID + 3: yearly,
+    }
+
+    # the corrected monthly export no longer has the row of the yearly one.
+    write_export("209901", [HASH_ID + 1])
+    delete_all_rows_of_sources([get_source_id(monthly, connection)], connection)
+    ExternalInvoicesReimbursementsIngestor(
+        file_type="RE", source_files=[monthly], connection=connection
+    )
+
+    assert get_row_sources(connection, [monthly, yearly]) == {
+        HASH_ID + 1: monthly,
+        HASH_ID + 2: yearly,
+        HASH_ID + 3: yearly,
+    }
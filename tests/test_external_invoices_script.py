@@ -1,8 +1,20 @@
+import os
+import time
+
+import pandas as pd
 import pytest
 
+from benchmarks.synthetic_data import write_text_pdf
+import scripts.external_invoices_reimbursements as external_invoices_script
 from scripts.external_invoices_reimbursements import (
+    add_metadata_to_extracted_data,
+    extract_text_from_pdfs,
     get_invoice_reimbursement_table_from_extracted_text,
+    iter_pdf_text_lines,
+    save_combined_pdf_data,
 )
+from utils.file_cache import ContentAddressedCache
+from utils.intermediate_files import read_intermediate
 
 
 @pytest.fixture
@@ -92,3 +104,139 @@ def test_get_invoice_reimbursement_table_from_extracted_text(extracted_pdf_text)
     results["table_data"] = results["table_data"].to_dict(orient="list")
 
     assert expected == results
+
+
+def test_body_starts_at_the_first_heading(extracted_pdf_text):
+    # a correction referring to the corrected invoice by a "Rechnung" line after its
+    # own table, the body is not searched for the "Rechnung" heading first.
+    lines = [
+        "RECHNUNGSKORREKTUR" if line == "Rechnung" else line
+        for line in extracted_pdf_text
+    ]
+    lines.insert(lines.index("Additional"), "Rechnung")
+
+    results = get_invoice_reimbursement_table_from_extracted_text("test_file", lines)
+
+    assert len(results["table_data"]) == 6
+    assert results["total"] == 133.27
+    assert results["notes"].startswith("Rechnung Additional Notes")
+
+
+def test_pdf_pages_are_streamed_into_the_parser(extracted_pdf_text, tmp_path):
+    # the last line of a page and the first line of the next one are extracted as a
+    # single line, the pages break at lines whose parsing does not depend on it.
+    lines = [line.rstrip("\n") for line in extracted_pdf_text]
+    table_start = lines.index("Pos. Menge ArtNr Bezeichnung Ust. E-Preis G-Preis")
+    notes_start = lines.index("Additional")
+    pdf_path = str(tmp_path / "20210110_RE123456_AMZ-ADA-123-1234567-1234567.pdf")
+    write_text_pdf(
+        pdf_path,
+        lines[:table_start],
+        ["Seite: 2", *lines[table_start:notes_start]],
+        ["Seite: 3", *lines[notes_start:]],
+        ["Seite: 4", "Allgemeine Geschäftsbedingungen"],
+    )
+
+    extracted_lines = list(extract_text_from_pdfs(pdf_path, all_pages=True))
+    streamed = get_invoice_reimbursement_table_from_extracted_text(
+        "test_file", iter_pdf_text_lines(pdf_path, all_pages=True)
+    )
+    cache = ContentAddressedCache(str(tmp_path / "cache"), version="test")
+    with pytest.warns(UserWarning, match="Not extracting 1 pages after the notes"):
+        stopped_after_notes = get_invoice_reimbursement_table_from_extracted_text(
+            "test_file", extract_text_from_pdfs(pdf_path, cache)
+        )
+    stopped_lines = cache.get(cache.key_for_file(pdf_path))
+
+    assert list(iter_pdf_text_lines(pdf_path, all_pages=True)) == extracted_lines
+    # the lines up to the end of the notes are served from the cache.
+    assert extract_text_from_pdfs(pdf_path, cache) == stopped_lines
+    assert extracted_lines[-2:] == [
+        "Vielen Dank für Ihren Auftrag.\nSeite: 4",
+        "Allgemeine Geschäftsbedingungen\n",
+    ]
+    assert stopped_lines[-2:] == [
+        "Vielen Dank für Ihren Auftrag.\n",
+        "[1 pages after the notes not extracted]",
+    ]
+    expected = get_invoice_reimbursement_table_from_extracted_text(
+        "test_file", extracted_lines
+    )
+    notes = (
+        "Additional Notes about the invoice which need to be extracted completely "
+        "as notes."
+    )
+    # "Seite: 3" is part of the line with the VAT ID, which is not a note.
+    assert streamed["notes"] == expected["notes"]
+    assert expected["notes"] == f"{notes} Allgemeine Geschäftsbedingungen\n"
+    assert stopped_after_notes["notes"] == notes
+    for extracted in (streamed, stopped_after_notes):
+        assert extracted["total"] == 133.27
+        assert extracted["table_data"].equals(expected["table_data"])
+        assert len(extracted["table_data"]) == 6
+
+
+def test_save_combined_pdf_data_stores_text_once_per_document(
+    tmp_path, monkeypatch, extracted_pdf_text
+):
+    monkeypatch.chdir(tmp_path)
+    folder = os.path.join(tmp_path, "data/external_invoices/202101/RE")
+    os.makedirs(folder)
+    parsed_pdfs = []
+    for file_name in ["first.pdf", "second.pdf"]:
+        extracted_data = get_invoice_reimbursement_table_from_extracted_text(
+            file_name, extracted_pdf_text
+        )
+        file_metadata = {
+            "type": "RE",
+            "date_filename": "20210105",
+            "invoice_reimbursement_nr": "RE123456",
+            "order_nr": "AMZ-ADA-123-1234567-1234567",
+        }
+        table_data = add_metadata_to_extracted_data(
+            extracted_data, file_metadata, "202101/RE", file_name
+        )
+        parsed_pdfs.append((table_data, ["text of", file_name]))
+
+    save_combined_pdf_data("202101/RE", parsed_pdfs)
+
+    items = read_intermediate(os.path.join(folder, "combined_data.parquet"))
+    texts = read_intermediate(os.path.join(folder, "pdf_texts.parquet"))
+    assert "pdf_text" not in items.columns
+    assert len(items) == sum(len(table_data) for table_data, _ in parsed_pdfs)
+    assert texts["pdf_text"].tolist() == ["text of\nfirst.pdf", "text of\nsecond.pdf"]
+    document_texts = items.merge(texts, on="internal_id")
+    assert (
+        document_texts["pdf_text"] == "text of\n" + document_texts["filename"]
+    ).all()
+
+
+def _parse_or_hang(folder_name, file_name, cache, all_pages=False):
+    if file_name == "hanging.pdf":
+        time.sleep(60)
+    return (pd.DataFrame({"filename": [file_name]}), [file_name]), []
+
+
+def test_pdfs_which_take_too_long_are_skipped_by_killing_their_worker(monkeypatch):
+    # the workers are forked and run the patched function.
+    monkeypatch.setattr(
+        external_invoices_script, "_parse_pdf_file_in_worker", _parse_or_hang
+    )
+    file_names = ["first.pdf", "hanging.pdf", "second.pdf", "third.pdf"]
+    start = time.monotonic()
+
+    with pytest.warns(UserWarning, match="skipping file: 202101/RE/hanging.pdf"):
+        results = external_invoices_script._parse_pdf_files_with_timeout(
+            [("202101/RE", file_name) for file_name in file_names],
+            workers=2,
+            timeout=1,
+            cache=None,
+        )
+
+    assert time.monotonic() - start < 30
+    assert [parsed_pdf and parsed_pdf[1] for parsed_pdf, _ in results] == [
+        ["first.pdf"],
+        None,
+        ["second.pdf"],
+        ["third.pdf"],
+    ]
@@ -0,0 +1,33 @@
+import os
+
+from utils.file_cache import ContentAddressedCache
+
+
+def test_content_addressed_cache_round_trip_and_invalidation(tmp_path):
+    pdf_path = tmp_path / "invoice.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 some content")
+    lines = ["Rechnung", "10.01.2021", "Vielen Dank für Ihren Auftrag.\n"]
+
+    cache = ContentAddressedCache(str(tmp_path / "cache"), version="v1")
+    key = cache.key_for_file(str(pdf_path))
+    assert cache.get(key) is None
+    cache.put(key, lines)
+    assert cache.get(key) == lines
+
+    # a copy of the same PDF, e.g. in an archive folder, reuses the entry.
+    copy_path = tmp_path / "archive_copy.pdf"
+    copy_path.write_bytes(pdf_path.read_bytes())
+    assert cache.get(cache.key_for_file(str(copy_path))) == lines
+
+    new_version_cache = ContentAddressedCache(str(tmp_path / "cache"), version="v2")
+    assert new_version_cache.get(key) is None
+    new_version_cache.prune()
+    assert os.listdir(tmp_path / "cache") == []
+
+
+def test_content_addressed_cache_prune_evicts_least_recently_used(tmp_path):
+    cache = ContentAddressedCache(str(tmp_path), version="v1", max_size_mb=0)
+    cache.put("aa11", ["first"])
+    cache.prune()
+
+    assert cache.get("aa11") is None
@@ -0,0 +1,57 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from database.tables import AmazonSalesTable
+from utils.intermediate_files import (
+    find_intermediate_file,
+    intermediate_file_variants,
+    read_intermediate,
+    write_intermediate,
+)
+
+
+def test_parquet_is_typed_with_table_schema_and_replaces_csv(tmp_path):
+    stem = os.path.join(tmp_path, "all_sales_data_combined")
+    df = pd.DataFrame(
+        {
+            "hash_id": [1, 2],
+            "date_time": pd.to_datetime(
+                ["2021-01-01 10:00:00+00:00", "2021-02-01 11:00:00+00:00"], utc=True
+            ),
+            # pandas reads numeric ids of a string column as numbers.
+            "settlement_id": [123, 456],
+            "quantity": [1.0, None],
+            "sku": ["SKU1", None],
+            "not_a_column": ["a", "b"],
+        }
+    )
+    write_intermediate(df, stem, [AmazonSalesTable], "csv")
+
+    path = write_intermediate(df, stem, [AmazonSalesTable])
+
+    assert find_intermediate_file(tmp_path, "all_sales_data_combined") == path
+    assert not os.path.exists(f"{stem}.csv")
+    schema = pq.read_schema(path)
+    assert schema.field("date_time").type == pa.timestamp("us", tz="UTC")
+    assert schema.field("settlement_id").type == pa.string()
+    assert schema.field("quantity").type == pa.int32()
+    assert schema.field("not_a_column").type == pa.string()
+
+    data = read_intermediate(path, columns=["hash_id", "settlement_id", "source_id"])
+    assert list(data.columns) == ["hash_id", "settlement_id"]
+    assert data["settlement_id"].tolist() == ["123", "456"]
+
+
+def test_hand_off_files_have_a_path_in_every_format():
+    assert intermediate_file_variants(
+        "data/external_invoices/202101/202101_RgExport_cleaned.csv"
+    ) == [
+        "data/external_invoices/202101/202101_RgExport_cleaned.parquet",
+        "data/external_invoices/202101/202101_RgExport_cleaned.csv",
+    ]
+    assert intermediate_file_variants("data/returns_amazon/report.txt") == [
+        "data/returns_amazon/report.txt"
+    ]
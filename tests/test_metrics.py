@@ -0,0 +1,58 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ingestors.metrics import LOAD, READ, RunMetrics, StageMetrics
+
+
+def test_stages_are_summed_per_source_and_stage():
+    metrics = RunMetrics()
+
+    def read_file(rows):
+        with metrics.stage("amazon_sales", READ, bytes_read=100) as stage:
+            stage.rows_out = rows
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(read_file, range(1, 9)))
+    metrics.add([StageMetrics("amazon_sales", LOAD, 2.0, rows_in=36, calls=1)])
+    with pytest.raises(ValueError):
+        with metrics.stage("amazon_sales", LOAD):
+            raise ValueError("load failed")
+
+    read, load = metrics.stages
+    assert (read.stage, read.calls, read.rows_out, read.bytes_read) == (
+        READ,
+        8,
+        36,
+        800,
+    )
+    assert (load.stage, load.calls, load.rows_per_second) == (LOAD, 1, 18.0)
+
+
+def test_write_report(tmp_path):
+    metrics = RunMetrics()
+    metrics.add([StageMetrics('external_pdfs_"RE"', READ, 0.5, rows_out=4, calls=1)])
+
+    json_path, prometheus_path = metrics.write_report(
+        "ingestion",
+        tasks=[{"name": "amazon_sales", "status": "succeeded", "seconds": 1.5}],
+        directory=str(tmp_path),
+    )
+
+    report = json.load(open(json_path))
+    assert report["stages"][0]["rows_per_second"] == 8.0
+    assert report["tasks"][0]["name"] == "amazon_sales"
+    lines = open(prometheus_path).read().splitlines()
+    assert (
+        'carpet_invoices_stage_seconds{run="ingestion",source="external_pdfs_\\"RE\\"",'
+        'stage="read"} 0.5'
+    ) in lines
+    assert (
+        'carpet_invoices_task_seconds{run="ingestion",task="amazon_sales",'
+        'status="succeeded"} 1.5'
+    ) in lines
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "ingestion.json",
+        "ingestion.prom",
+    ]
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from utils.order_numbers import extract_order_number, extract_order_numbers
+
+
+def test_the_first_order_number_and_its_platform_are_extracted():
+    values = pd.Series(
+        [
+            "20210203_RE123456_AMZ-ADA-123-1234567-1234567.pdf",
+            "Bestellung AU12345 zu EBAY-DE-ADA-12-12345-12345",
+            "REAL-ADA-AB12C34",
+            "SHOPIFY-ADA-1234567890123_Kopie.pdf",
+            "20210203_GS123456_Kopie.pdf",
+            np.nan,
+        ],
+        index=[5, 3, 8, 1, 0, 9],
+    )
+
+    extracted = extract_order_numbers(values)
+
+    expected = pd.DataFrame(
+        {
+            "order_number": [
+                "AMZ-ADA-123-1234567-1234567",
+                "AU12345",
+                "REAL-ADA-AB12C34",
+                "SHOPIFY-ADA-1234567890123",
+                None,
+                None,
+            ],
+            "platform": ["amazon", "au", "real", "shopify", None, None],
+        },
+        index=values.index,
+    )
+    pd.testing.assert_frame_equal(extracted, expected)
+    assert [extract_order_number(value) for value in values.iloc[:5]] == list(
+        expected.iloc[:5].itertuples(index=False, name=None)
+    )
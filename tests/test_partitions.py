@@ -0,0 +1,58 @@
+import pandas as pd
+
+from database.partitions import _is_unchanged, swap_month_partitions
+from database.tables import AmazonSalesTable
+
+
+class RecordingConnection:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.statements = []
+
+    def execute(self, statement, *args):
+        self.statements.append(" ".join(str(statement).split()))
+        return self
+
+    def all(self):
+        return self.rows
+
+
+def test_swaps_lock_the_source_metadata_before_the_table():
+    connection = RecordingConnection()
+    month = pd.Period("2021-01", "M")
+
+    swap_month_partitions(
+        AmazonSalesTable,
+        {month: ["amazon_sales_data_y2021m01"]},
+        {"amazon_sales_data_y2021m01"},
+        connection,
+    )
+
+    assert connection.statements[:3] == [
+        'LOCK TABLE "raw"."dim_raw_source_metadata" IN ACCESS EXCLUSIVE MODE',
+        'LOCK TABLE "raw"."amazon_sales_data" IN ACCESS EXCLUSIVE MODE',
+        'ALTER TABLE "raw"."amazon_sales_data" DETACH PARTITION '
+        '"raw"."amazon_sales_data_y2021m01"',
+    ]
+    assert sum("LOCK TABLE" in s for s in connection.statements) == 2
+
+
+def test_month_with_rows_of_overlapping_sources_is_unchanged():
+    # row 2 is in the monthly (1) and the yearly report (2) and was stored once,
+    # row 4 of the yearly report is stored for a source which is not reloaded.
+    connection = RecordingConnection([(1, 1), (2, 1), (3, 2), (4, 9)])
+    month_data = pd.DataFrame(
+        {"hash_id": [1, 2, 2, 3, 4], "source_id": [1, 1, 2, 2, 2]}
+    )
+
+    assert _is_unchanged(
+        month_data, "partition", AmazonSalesTable, "hash_id", [1, 2], connection
+    )
+    assert not _is_unchanged(
+        month_data.iloc[1:],
+        "partition",
+        AmazonSalesTable,
+        "hash_id",
+        [1, 2],
+        connection,
+    )
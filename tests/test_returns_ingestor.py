@@ -0,0 +1,51 @@
+import logging
+
+import pandas as pd
+
+from ingestors.source_data_ingestors.remissions_from_amazon_ingestor import (
+    ReturnsFromAmazonIngestor,
+)
+
+
+def test_read_remissions_report_in_blocks(tmp_path, monkeypatch, caplog):
+    csv_path = tmp_path / "remissions_from_amazon.csv"
+    csv_path.write_text(
+        '"request-date","order-id","sku","requested-quantity","removal-fee",'
+        '"currency";\n'
+        '"2021-03-23T23:38:43+00:00","S1","A,1","2","2.08","EUR";\n'
+        '"2021-03-24T10:00:00+01:00","S2","B-2","","n/a","EUR";\n'
+        '"2021-03-25T00:00:00+00:00","S3","C-3","1";\n'
+        '"2021-03-26T00:00:00+00:00","S4","D-4","1","0.5","EUR","extra";\n'
+        '"2021-03-27T00:00:00+00:00","S5","E-5","x","","GBP";\n'
+    )
+    monkeypatch.setattr(
+        "ingestors.source_data_ingestors.remissions_from_amazon_ingestor"
+        ".CSV_BLOCK_SIZE",
+        128,
+    )
+    ingestor = ReturnsFromAmazonIngestor.__new__(ReturnsFromAmazonIngestor)
+
+    with caplog.at_level(logging.WARNING, logger="root"):
+        chunks = list(ingestor._read_and_transform_data(str(csv_path)))
+
+    assert len(chunks) > 1
+    data = pd.concat(chunks, ignore_index=True)
+    assert list(data.columns) == [
+        "request_date",
+        "order_id",
+        "sku",
+        "requested_quantity",
+        "removal_fee",
+        "currency",
+    ]
+    assert data["order_id"].tolist() == ["S1", "S2", "S5"]
+    assert data["sku"].tolist() == ["A,1", "B-2", "E-5"]
+    assert data["request_date"].tolist() == [
+        pd.Timestamp("2021-03-23 23:38:43", tz="UTC"),
+        pd.Timestamp("2021-03-24 09:00:00", tz="UTC"),
+        pd.Timestamp("2021-03-27 00:00:00", tz="UTC"),
+    ]
+    assert data["requested_quantity"].tolist() == [2, 0, 0]
+    assert data["removal_fee"].tolist() == [2.08, 0.0, 0.0]
+    assert data["currency"].tolist() == ["EUR", "EUR", "GBP"]
+    assert "Skipped 2 rows" in caplog.text
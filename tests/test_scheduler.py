@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from ingestors.scheduler import Task, TaskStatus, run_tasks
+
+
+def test_run_tasks_respects_dependencies_and_concurrency_limit():
+    lock = threading.Lock()
+    running = []
+    max_running = []
+    finished = []
+
+    def work(name):
+        def run():
+            with lock:
+                running.append(name)
+                max_running.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(name)
+                finished.append(name)
+
+        return run
+
+    tasks = [Task("init", work("init"))] + [
+        Task(f"load_{i}", work(f"load_{i}"), ["init"]) for i in range(4)
+    ]
+
+    results = run_tasks(tasks, max_concurrency=2)
+
+    assert list(results) == [task.name for task in tasks]
+    assert all(r.status == TaskStatus.succeeded for r in results.values())
+    assert finished[0] == "init"
+    assert max(max_running) == 2
+
+
+def test_run_tasks_skips_dependents_of_failed_tasks():
+    def fail():
+        raise Exception("source file missing")
+
+    tasks = [
+        Task("init", lambda: None),
+        Task("failing", fail, ["init"]),
+        Task("dependent", lambda: None, ["failing"]),
+        Task("indirect", lambda: None, ["dependent", "failing"]),
+        Task("independent", lambda: None, ["init"]),
+    ]
+
+    results = run_tasks(tasks)
+
+    assert results["failing"].status == TaskStatus.failed
+    assert str(results["failing"].error) == "source file missing"
+    assert results["dependent"].status == TaskStatus.skipped
+    assert results["indirect"].status == TaskStatus.skipped
+    assert results["independent"].status == TaskStatus.succeeded
+
+
+def test_run_tasks_rejects_cycles():
+    tasks = [Task("a", lambda: None, ["b"]), Task("b", lambda: None, ["a"])]
+
+    with pytest.raises(Exception, match="Cyclic"):
+        run_tasks(tasks)
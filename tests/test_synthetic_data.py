@@ -0,0 +1,50 @@
+import os
+import glob
+
+import pandas as pd
+
+from benchmarks.synthetic_data import (
+    AMAZON_DIR,
+    INVOICES_DIR,
+    RUN_DIR,
+    SyntheticScale,
+    generate,
+)
+from scripts.amazon_raw_sales_data import parse_amazon_dates
+from scripts.external_invoices_reimbursements import (
+    extract_text_from_pdfs,
+    get_invoice_reimbursement_table_from_extracted_text,
+)
+
+
+def test_generated_files_parse_like_real_sources(tmp_path):
+    scale = SyntheticScale(
+        amazon_rows_per_country=50, pdfs_per_month=4, returns_rows=5, months=2
+    )
+    counts = generate(str(tmp_path), scale)
+
+    assert counts["pdfs"] == 2 * (4 + 1)
+    for country_code in ["DE", "FR", "UK"]:
+        report = pd.read_csv(
+            os.path.join(
+                tmp_path,
+                AMAZON_DIR,
+                country_code,
+                "2021Jan1-2021Dec31CustomTransaction.csv",
+            ),
+            skiprows=7,
+        )
+        assert len(report) == 50
+        assert parse_amazon_dates(report.iloc[:, 0], country_code).notna().all()
+
+    pdf_paths = glob.glob(
+        os.path.join(tmp_path, RUN_DIR, INVOICES_DIR, "*", "*", "*.pdf")
+    )
+    assert len(pdf_paths) == counts["pdfs"]
+    for pdf_path in pdf_paths:
+        extracted = get_invoice_reimbursement_table_from_extracted_text(
+            os.path.basename(pdf_path), extract_text_from_pdfs(pdf_path)
+        )
+        items = extracted["table_data"]
+        assert not items.empty
+        assert round(items["total_price"].sum(), 2) == extracted["net_total"]
@@ -0,0 +1,363 @@
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from sqlalchemy import bindparam, delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection
+
+from database.base import engine
+from database.dwh_tables import RefreshWatermarks, RefreshedSources
+from database.tables import (
+    AmazonSalesTable,
+    ArticleShipmentInfo,
+    ExternalInvoices,
+    ExternalPDFInvoiceHeaders,
+    ExternalPDFReimbursementHeaders,
+    ReturnedFromAmazon,
+)
+from definitions.common import ExternalDocumentType
+
+logger = logging.getLogger("root")
+
+
+@dataclass
+class SourceRefresh:
+    """The statements which transform the rows of the sources of a raw table that were
+    inserted after the watermark. All statements get the changed `source_ids`, the
+    delete statement also gets the sources which were removed from the raw table.
+    """
+
+    raw_table: object
+    dimension_sql: List[str] = field(default_factory=list)
+    fact_delete_sql: Optional[str] = None
+    fact_insert_sql: Optional[str] = None
+
+
+# new SKUs and orders are filtered with NOT EXISTS first, so that the serial keys are
+# not drawn for every row which already is in the dimension.
+AMAZON_SALES_REFRESH = SourceRefresh(
+    raw_table=AmazonSalesTable,
+    dimension_sql=[
+        """
+        INSERT INTO dwh.dim_sku (sku)
+        SELECT DISTINCT s.sku FROM raw.amazon_sales_data s
+        WHERE s.source_id IN :source_ids AND s.sku IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM dwh.dim_sku d WHERE d.sku = s.sku)
+        ON CONFLICT (sku) DO NOTHING
+        """,
+        """
+        INSERT INTO dwh.dim_order (
+            order_number, platform, country_code, marketplace, order_date
+        )
+        SELECT s.order_id, 'amazon', min(s.country_code), min(s.marketplace),
+            min(s.date_time)::date
+        FROM raw.amazon_sales_data s
+        WHERE s.source_id IN :source_ids AND s.order_id IS NOT NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM dwh.dim_order o WHERE o.order_number = s.order_id
+            )
+        GROUP BY s.order_id
+        ON CONFLICT (order_number) DO NOTHING
+        """,
+    ],
+    fact_delete_sql="DELETE FROM dwh.fact_sales WHERE source_id IN :source_ids",
+    fact_insert_sql="""
+        INSERT INTO dwh.fact_sales (
+            hash_id, date_key, date_time, sku_key, order_key, type, marketplace,
+            fulfilment, country_code, currency, quantity, total_price, source_id
+        )
+        SELECT s.hash_id, to_char(s.date_time, 'YYYYMMDD')::integer, s.date_time,
+            k.sku_key, o.order_key, s.type, s.marketplace, s.fulfilment,
+            s.country_code, s.currency, s.quantity, s.total_price, s.source_id
+        FROM raw.amazon_sales_data s
+        LEFT JOIN dwh.dim_sku k ON k.sku = s.sku
+        LEFT JOIN dwh.dim_order o ON o.order_number = s.order_id
+        WHERE s.source_id IN :source_ids
+        ON CONFLICT (hash_id) DO NOTHING
+        """,
+)
+
+ARTICLE_SHIPMENT_INFO_REFRESH = SourceRefresh(
+    raw_table=ArticleShipmentInfo,
+    dimension_sql=[
+        """
+        INSERT INTO dwh.dim_sku (
+            sku, article_type, shipment_type, article_net_price,
+            max_items_per_shipment
+        )
+        SELECT DISTINCT ON (sku) sku, article_type, shipment_type, article_net_price,
+            max_items_per_shipment
+        FROM raw.article_shipment_info
+        WHERE source_id IN :source_ids
+        ORDER BY sku, unique_id DESC
+        ON CONFLICT (sku) DO UPDATE SET
+            article_type = EXCLUDED.article_type,
+            shipment_type = EXCLUDED.shipment_type,
+            article_net_price = EXCLUDED.article_net_price,
+            max_items_per_shipment = EXCLUDED.max_items_per_shipment
+        """
+    ],
+)
+
+EXTERNAL_INVOICES_REFRESH = SourceRefresh(
+    raw_table=ExternalInvoices,
+    dimension_sql=[
+        """
+        INSERT INTO dwh.dim_order (order_number, platform, order_date)
+        SELECT DISTINCT ON (order_number) order_number, platform, order_create_date
+        FROM raw.external_invoices
+        WHERE source_id IN :source_ids AND order_number IS NOT NULL
+        ORDER BY order_number, order_create_date
+        ON CONFLICT (order_number) DO UPDATE SET
+            platform = COALESCE(dim_order.platform, EXCLUDED.platform),
+            order_date = COALESCE(dim_order.order_date, EXCLUDED.order_date)
+        """
+    ],
+)
+
+
+def _pdf_items_refresh(header_table, item_table: str, number_column: str):
+    document_type = (
+        ExternalDocumentType.invoice.value
+        if header_table is ExternalPDFInvoiceHeaders
+        else ExternalDocumentType.reimbursement.value
+    )
+    headers = f"raw.{header_table.__tablename__}"
+    return SourceRefresh(
+        raw_table=header_table,
+        dimension_sql=[
+            f"""
+            INSERT INTO dwh.dim_order (order_number)
+            SELECT DISTINCT h.order_number FROM {headers} h
+            WHERE h.source_id IN :source_ids AND h.order_number IS NOT NULL
+                AND NOT EXISTS (
+                    SELECT 1 FROM dwh.dim_order o WHERE o.order_number = h.order_number
+                )
+            ON CONFLICT (order_number) DO NOTHING
+            """,
+            f"""
+            INSERT INTO dwh.dim_sku (sku)
+            SELECT DISTINCT i.article_id FROM raw.{item_table} i
+            JOIN {headers} h ON h.internal_id = i.internal_id
+            WHERE h.source_id IN :source_ids AND i.article_id <> ''
+                AND NOT EXISTS (SELECT 1 FROM dwh.dim_sku d WHERE d.sku = i.article_id)
+            ON CONFLICT (sku) DO NOTHING
+            """,
+        ],
+        fact_delete_sql=f"""
+            DELETE FROM dwh.fact_invoice_items
+            WHERE document_type = '{document_type}' AND source_id IN :source_ids
+            """,
+        fact_insert_sql=f"""
+            INSERT INTO dwh.fact_invoice_items (
+                document_type, hash_id, document_number, internal_id, date_key,
+                order_key, sku_key, item_nr, quantity, description, vat, item_price,
+                total_price, source_id
+            )
+            SELECT '{document_type}', i.hash_id, h.{number_column}, i.internal_id,
+                to_char(h.date_document, 'YYYYMMDD')::integer, o.order_key, k.sku_key,
+                i.item_nr, i.quantity, i.description, i.vat, i.item_price,
+                i.total_price, h.source_id
+            FROM raw.{item_table} i
+            JOIN {headers} h ON h.internal_id = i.internal_id
+            LEFT JOIN dwh.dim_order o ON o.order_number = h.order_number
+            LEFT JOIN dwh.dim_sku k ON k.sku = i.article_id
+            WHERE h.source_id IN :source_ids
+            ON CONFLICT (document_type, hash_id) DO NOTHING
+            """,
+    )
+
+
+RETURNS_REFRESH = SourceRefresh(
+    raw_table=ReturnedFromAmazon,
+    dimension_sql=[
+        """
+        INSERT INTO dwh.dim_sku (sku)
+        SELECT DISTINCT r.sku FROM raw.returned_from_amazon r
+        WHERE r.source_id IN :source_ids AND r.sku IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM dwh.dim_sku d WHERE d.sku = r.sku)
+        ON CONFLICT (sku) DO NOTHING
+        """,
+        """
+        INSERT INTO dwh.dim_order (order_number, platform)
+        SELECT DISTINCT r.order_id, 'amazon' FROM raw.returned_from_amazon r
+        WHERE r.source_id IN :source_ids AND r.order_id IS NOT NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM dwh.dim_order o WHERE o.order_number = r.order_id
+            )
+        ON CONFLICT (order_number) DO NOTHING
+        """,
+    ],
+    fact_delete_sql="DELETE FROM dwh.fact_returns WHERE source_id IN :source_ids",
+    fact_insert_sql="""
+        INSERT INTO dwh.fact_returns (
+            return_id, date_key, request_date, sku_key, order_key, order_type,
+            order_status, disposition, requested_quantity, cancelled_quantity,
+            disposed_quantity, shipped_quantity, removal_fee, currency, source_id
+        )
+        SELECT r.unique_id, to_char(r.request_date, 'YYYYMMDD')::integer,
+            r.request_date, k.sku_key, o.order_key, r.order_type, r.order_status,
+            r.disposition, r.requested_quantity, r.cancelled_quantity,
+            r.disposed_quantity, r.shipped_quantity, r.removal_fee, r.currency,
+            r.source_id
+        FROM raw.returned_from_amazon r
+        LEFT JOIN dwh.dim_sku k ON k.sku = r.sku
+        LEFT JOIN dwh.dim_order o ON o.order_number = r.order_id
+        WHERE r.source_id IN :source_ids
+        """,
+)
+
+# dimensions are filled before the facts which look up their keys, the SKU attributes
+# and order platforms before the sources which only add missing SKUs and orders.
+SOURCE_REFRESHES = [
+    ARTICLE_SHIPMENT_INFO_REFRESH,
+    EXTERNAL_INVOICES_REFRESH,
+    AMAZON_SALES_REFRESH,
+    _pdf_items_refresh(
+        ExternalPDFInvoiceHeaders, "external_invoice_items", "invoice_number"
+    ),
+    _pdf_items_refresh(
+        ExternalPDFReimbursementHeaders,
+        "external_reimbursement_items",
+        "reimbursement_number",
+    ),
+    RETURNS_REFRESH,
+]
+
+# calendar without gaps between the first and last date of all facts.
+DIM_DATE_SQL = """
+    INSERT INTO dwh.dim_date (
+        date_key, date, year, quarter, month, day, iso_week, iso_weekday
+    )
+    SELECT to_char(day, 'YYYYMMDD')::integer, day::date, extract(year FROM day),
+        extract(quarter FROM day), extract(month FROM day), extract(day FROM day),
+        extract(week FROM day), extract(isodow FROM day)
+    FROM (
+        SELECT min(date_key) AS first_key, max(date_key) AS last_key FROM (
+            SELECT min(date_key) AS date_key FROM dwh.fact_sales
+            UNION ALL SELECT max(date_key) FROM dwh.fact_sales
+            UNION ALL SELECT min(date_key) FROM dwh.fact_invoice_items
+            UNION ALL SELECT max(date_key) FROM dwh.fact_invoice_items
+            UNION ALL SELECT min(date_key) FROM dwh.fact_returns
+            UNION ALL SELECT max(date_key) FROM dwh.fact_returns
+        ) date_keys
+    ) bounds,
+    generate_series(
+        to_date(first_key::text, 'YYYYMMDD'),
+        to_date(last_key::text, 'YYYYMMDD'),
+        interval '1 day'
+    ) AS day
+    ON CONFLICT (date_key) DO NOTHING
+"""
+
+
+def _execute_for_sources(connection: Connection, sql: str, source_ids: List[int]):
+    statement = text(sql).bindparams(bindparam("source_ids", expanding=True))
+    return connection.execute(statement, {"source_ids": source_ids})
+
+
+def _refresh_source_table(connection: Connection, refresh: SourceRefresh) -> None:
+    raw_table = refresh.raw_table
+    table_name = raw_table.__tablename__
+    watermark = connection.execute(
+        select(RefreshWatermarks.last_date_inserted).where(
+            RefreshWatermarks.source_table == table_name
+        )
+    ).scalar()
+
+    changed_sources = (
+        select(raw_table.source_id, func.max(raw_table.date_inserted))
+        .where(raw_table.source_id.isnot(None))
+        .group_by(raw_table.source_id)
+    )
+    if watermark is not None:
+        changed_sources = changed_sources.where(raw_table.date_inserted > watermark)
+    last_inserted_by_source = dict(connection.execute(changed_sources).all())
+    changed_source_ids = list(last_inserted_by_source)
+    removed_source_ids = [
+        source_id
+        for (source_id,) in connection.execute(
+            select(RefreshedSources.source_id).where(
+                RefreshedSources.source_table == table_name,
+                ~select(raw_table.source_id)
+                .where(raw_table.source_id == RefreshedSources.source_id)
+                .exists(),
+            )
+        )
+    ]
+    if not changed_source_ids and not removed_source_ids:
+        logger.info(f"No new rows in {table_name}, dwh tables are up to date.")
+        return
+
+    start = time.perf_counter()
+    if changed_source_ids:
+        for sql in refresh.dimension_sql:
+            _execute_for_sources(connection, sql, changed_source_ids)
+    deleted_rows = inserted_rows = 0
+    if refresh.fact_delete_sql:
+        deleted_rows = _execute_for_sources(
+            connection,
+            refresh.fact_delete_sql,
+            changed_source_ids + removed_source_ids,
+        ).rowcount
+    if refresh.fact_insert_sql and changed_source_ids:
+        inserted_rows = _execute_for_sources(
+            connection, refresh.fact_insert_sql, changed_source_ids
+        ).rowcount
+
+    connection.execute(
+        delete(RefreshedSources).where(
+            RefreshedSources.source_table == table_name,
+            RefreshedSources.source_id.in_(removed_source_ids),
+        )
+    )
+    if changed_source_ids:
+        connection.execute(
+            insert(RefreshedSources)
+            .values(
+                [
+                    {"source_table": table_name, "source_id": source_id}
+                    for source_id in changed_source_ids
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+        last_date_inserted = max(last_inserted_by_source.values())
+        connection.execute(
+            insert(RefreshWatermarks)
+            .values(source_table=table_name, last_date_inserted=last_date_inserted)
+            .on_conflict_do_update(
+                index_elements=[RefreshWatermarks.source_table],
+                set_={
+                    "last_date_inserted": last_date_inserted,
+                    "date_refreshed": text("current_timestamp"),
+                },
+            )
+        )
+    logger.info(
+        f"Refreshed {len(changed_source_ids)} changed and {len(removed_source_ids)} "
+        f"removed sources of {table_name} in {time.perf_counter() - start:.2f}s, "
+        f"deleted {deleted_rows} and inserted {inserted_rows} fact rows."
+    )
+
+
+def refresh_dwh(connection: Optional[Connection] = None) -> None:
+    """Incrementally refreshes the star schema in the dwh schema from the raw tables.
+
+    Only the sources of each raw table with rows inserted after the table's watermark
+    (the latest `date_inserted` refreshed before) are transformed again: their fact
+    rows are deleted and inserted from the raw rows, new SKUs, orders and dates are
+    added to the dimensions. Fact rows of sources removed from a raw table are deleted.
+    The refresh has to run after the ingestors committed, which `entry_point` ensures.
+    """
+    if connection is None:
+        with engine.begin() as connection:
+            return refresh_dwh(connection)
+
+    start = time.perf_counter()
+    for refresh in SOURCE_REFRESHES:
+        _refresh_source_table(connection, refresh)
+    connection.execute(text(DIM_DATE_SQL))
+    logger.info(f"Refreshed dwh tables in {time.perf_counter() - start:.2f}s.")
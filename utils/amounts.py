@@ -0,0 +1,80 @@
+from typing import Iterable, Tuple, Union
+
+import pandas as pd
+
+# minus signs written instead of "-" in some exports, e.g. U+2212 by Amazon.
+MINUS_SIGNS = "\u2212\u2013"
+# decimal separator and the digit group separators of the amounts in each locale.
+AMOUNT_LOCALES = {
+    "de_DE": (",", ".\xa0\u202f "),
+    "fr_FR": (",", ".\xa0\u202f "),
+    "it_IT": (",", ".\xa0\u202f "),
+    "es_ES": (",", ".\xa0\u202f "),
+    "nl_NL": (",", ".\xa0\u202f "),
+    "pl_PL": (",", ".\xa0\u202f "),
+    "sv_SE": (",", ".\xa0\u202f "),
+    "en_GB": (".", ",\xa0\u202f "),
+}
+
+
+def _translation_table(decimal_separator: str, group_separators: str) -> dict:
+    table = {ord(separator): None for separator in group_separators}
+    table[ord(decimal_separator)] = "."
+    table.update({ord(minus): "-" for minus in MINUS_SIGNS})
+    return table
+
+
+_TRANSLATION_TABLES = {
+    locale: _translation_table(*separators)
+    for locale, separators in AMOUNT_LOCALES.items()
+}
+
+
+def _get_translation_table(locale: str) -> dict:
+    if locale not in _TRANSLATION_TABLES:
+        raise Exception(
+            f"Unknown amount locale: {locale}. Known: {list(_TRANSLATION_TABLES)}"
+        )
+    return _TRANSLATION_TABLES[locale]
+
+
+def parse_amounts(
+    values: Union[pd.Series, Iterable[str]], locale: str = "de_DE"
+) -> Tuple[pd.Series, pd.Series]:
+    """Converts formatted amounts, e.g. "-1.234,56" in `de_DE`, to float64.
+
+    The group separators are removed, the decimal separator and minus signs are
+    normalized by a single `str.translate` per value and the result is converted by
+    `pd.to_numeric`. Values which already are numbers are kept as they are.
+
+    Returns the amounts and a boolean mask of the values which could not be parsed,
+    these are NaN in the amounts. Missing values and empty strings are NaN but are not
+    flagged as invalid.
+    """
+    table = _get_translation_table(locale)
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype("float64"), pd.Series(False, index=values.index)
+
+    # the str accessor returns NaN for non string values (numbers in Excel columns).
+    normalized = values.str.translate(table).str.strip()
+    amounts = pd.to_numeric(normalized, errors="coerce")
+    is_string = normalized.notna()
+    if not is_string.all():
+        amounts = amounts.where(
+            is_string, pd.to_numeric(values.where(~is_string), errors="coerce")
+        )
+    amounts = amounts.astype("float64")
+    invalid = amounts.isna() & values.notna() & normalized.ne("")
+    return amounts, invalid
+
+
+def parse_amount(value: str, locale: str = "de_DE") -> float:
+    """Scalar version of `parse_amounts` for single values, e.g. the cells of invoice
+    PDF tables. Raises for values which cannot be parsed, so that a wrong price or
+    total of a document is not loaded as missing.
+    """
+    try:
+        return float(value.translate(_get_translation_table(locale)))
+    except ValueError:
+        raise Exception(f"Cannot parse amount: {value!r} ({locale})")
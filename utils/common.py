@@ -1,4 +1,11 @@
 import hashlib
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+# the MD5 ids are below this bound, the 64-bit ids almost never.
+MD5_ID_MODULUS = 10**12
 
 
 def create_int_hash_from_df_row(row):
@@ -6,4 +13,46 @@ def create_int_hash_from_df_row(row):
     representation of MD5 hash.
     """
     row_string = "-".join(row.values.astype(str))
-    return int(hashlib.md5(row_string.encode("utf-16")).hexdigest(), 16) % 10**12
+    return (
+        int(hashlib.md5(row_string.encode("utf-16")).hexdigest(), 16) % MD5_ID_MODULUS
+    )
+
+
+def create_int_hash_from_df(
+    df: pd.DataFrame,
+    columns: Optional[List[str]] = None,
+    md5_compatible: bool = False,
+) -> pd.Series:
+    """Hash all rows of a DataFrame (or a subset of its columns) in one batch.
+
+    By default every row is hashed column-wise with pandas' 64-bit SipHash based
+    `hash_pandas_object` and the result is reinterpreted as a signed int64 so it fits
+    a Postgres BIGINT without truncation. The hash is deterministic across runs but
+    depends on the column dtypes, i.e. 1 and 1.0 do not hash to the same value.
+
+    With `md5_compatible=True` the ids are identical to the ones produced by
+    `create_int_hash_from_df_row` via `DataFrame.apply(..., axis=1)`, for data that
+    was already loaded with the old ids. The rows are stringified in one go but MD5
+    still runs once per row, so this mode is slower than the default one.
+    """
+    if columns is not None:
+        df = df[columns]
+    if df.empty:
+        return pd.Series([], index=df.index, dtype="int64")
+
+    if md5_compatible:
+        # `df.values` has the same interleaved dtype as each row passed by `apply`,
+        # so stringifying it matches `row.values.astype(str)` value for value.
+        row_strings = ["-".join(values) for values in df.values.astype(str).tolist()]
+        return pd.Series(
+            [
+                int(hashlib.md5(row_string.encode("utf-16")).hexdigest(), 16)
+                % MD5_ID_MODULUS
+                for row_string in row_strings
+            ],
+            index=df.index,
+            dtype="int64",
+        )
+
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return pd.Series(hashes.view(np.int64), index=df.index)
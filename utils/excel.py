@@ -0,0 +1,110 @@
+import os
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import openpyxl
+import pandas as pd
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
+
+from utils.file_cache import DataFrameCache
+
+logger = logging.getLogger("root")
+
+# bump the reader version whenever `read_excel_sheets` changes its output.
+EXCEL_READER_VERSION = 1
+
+
+def _convert_value(value):
+    # the conversions of the openpyxl reader of `pd.read_excel` for plain values.
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value in ERROR_CODES:
+        return float("nan")
+    return value
+
+
+def iter_excel_rows(file_path: str) -> Iterator[Tuple[str, Iterator[tuple]]]:
+    """Yields the name and the row values of each sheet of a workbook opened in
+    read-only mode, which streams the rows from the file instead of loading the
+    cells of all sheets. The workbook is closed once all sheets were iterated.
+    """
+    workbook = openpyxl.load_workbook(
+        file_path, read_only=True, data_only=True, keep_links=False
+    )
+    try:
+        for sheet in workbook.worksheets:
+            # the dimensions saved by some exporters are wrong.
+            sheet.reset_dimensions()
+            yield sheet.title, sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _sheet_to_dataframe(rows: Iterator[tuple]) -> pd.DataFrame:
+    data: List[list] = []
+    last_row_with_data = -1
+    for row_number, row in enumerate(rows):
+        converted_row = [_convert_value(value) for value in row]
+        while converted_row and converted_row[-1] == "":
+            converted_row.pop()
+        if converted_row:
+            last_row_with_data = row_number
+        data.append(converted_row)
+    row_count = last_row_with_data + 1
+    del data[row_count:]
+    if not data:
+        return pd.DataFrame()
+    width = max(len(row) for row in data)
+    for row in data:
+        row.extend([""] * (width - len(row)))
+    # the header and the dtypes are parsed like `pd.read_excel` parses them.
+    return TextParser(data, header=0, skip_blank_lines=False).read()
+
+
+def read_excel_sheets(file_path: str) -> Dict[str, pd.DataFrame]:
+    """The sheets of a workbook like `pd.read_excel(file_path, sheet_name=None)`
+    returns them, read from the streamed row values instead of openpyxl cells.
+    """
+    return {
+        sheet_name: _sheet_to_dataframe(rows)
+        for sheet_name, rows in iter_excel_rows(file_path)
+    }
+
+
+def get_excel_cache(cache_dir: str) -> DataFrameCache:
+    return DataFrameCache(
+        cache_dir,
+        version=f"reader{EXCEL_READER_VERSION}-openpyxl_{openpyxl.__version__}",
+    )
+
+
+def read_excel_workbook(
+    file_path: str, cache: Optional[DataFrameCache] = None
+) -> Optional[pd.DataFrame]:
+    """All sheets of a workbook concatenated, None if it has no sheets. With a
+    `cache` the concatenated sheets are kept as Parquet keyed by the checksum of the
+    workbook, an unchanged workbook is read from there without parsing it.
+    """
+    if cache is not None:
+        key = cache.key_for_file(file_path)
+        cached_workbook = cache.get(key)
+        if cached_workbook is not None:
+            logger.info(f"Read cached workbook of: {file_path}")
+            return cached_workbook
+    sheets = read_excel_sheets(file_path)
+    if not sheets:
+        return None
+    workbook = pd.concat(sheets.values())
+    if cache is not None:
+        try:
+            cache.put(key, workbook)
+        except (ValueError, TypeError):
+            # e.g. columns mixing numbers and text, which Parquet cannot store.
+            logger.warning(
+                f"Could not cache workbook: {os.path.basename(file_path)}, it is "
+                "parsed again on the next run."
+            )
+    return workbook
@@ -0,0 +1,132 @@
+import os
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+from typing import Any, Callable, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+logger = logging.getLogger("root")
+
+
+class ContentAddressedCache:
+    """On-disk cache of JSON serialisable values keyed by the SHA-256 of a file's
+    content, stored gzip compressed below `cache_dir/version/`.
+
+    Entries written by another `version` (e.g. a different extractor or library
+    version) are never read and are removed by `prune`, which also evicts entries
+    older than `max_age_days` and then the least recently used ones until the cache
+    is smaller than `max_size_mb`.
+    """
+
+    suffix = ".json.gz"
+
+    def __init__(
+        self,
+        cache_dir: str,
+        version: str,
+        max_size_mb: int = 512,
+        max_age_days: int = 365,
+    ):
+        self.cache_dir = cache_dir
+        self.version = version
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.max_age_seconds = max_age_days * 24 * 3600
+
+    @staticmethod
+    def key_for_file(file_path: str) -> str:
+        checksum = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                checksum.update(chunk)
+        return checksum.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, self.version, key[:2], key + self.suffix)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry_path = self._entry_path(key)
+        try:
+            with gzip.open(entry_path, "rt", encoding="utf-8") as file:
+                value = json.load(file)
+        except (FileNotFoundError, EOFError, OSError, ValueError):
+            return None
+        # mark the entry as recently used for the size based eviction.
+        os.utime(entry_path)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        def write_json(raw_file):
+            with gzip.GzipFile(fileobj=raw_file, mode="wb") as file:
+                file.write(json.dumps(value).encode("utf-8"))
+
+        self._write_entry(key, write_json)
+
+    def _write_entry(self, key: str, write: Callable) -> None:
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        # write to a temporary file first so that concurrent readers (e.g. parallel
+        # workers) never see a partially written entry.
+        file_descriptor, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(entry_path), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(file_descriptor, "wb") as raw_file:
+                write(raw_file)
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def prune(self) -> None:
+        if not os.path.isdir(self.cache_dir):
+            return
+        for version in os.listdir(self.cache_dir):
+            if version != self.version:
+                logger.info(f"Removing outdated cache version: {version}")
+                shutil.rmtree(os.path.join(self.cache_dir, version))
+
+        now = time.time()
+        entries = []
+        for folder, _, files in os.walk(os.path.join(self.cache_dir, self.version)):
+            for file in files:
+                entry_path = os.path.join(folder, file)
+                stat = os.stat(entry_path)
+                if now - stat.st_mtime > self.max_age_seconds:
+                    os.remove(entry_path)
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        cache_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if cache_size <= self.max_size_bytes:
+                break
+            os.remove(entry_path)
+            cache_size -= size
+
+
+class DataFrameCache(ContentAddressedCache):
+    """`ContentAddressedCache` of DataFrames, stored as zstd compressed Parquet files
+    which keep the dtypes and the index of the cached frame.
+    """
+
+    suffix = ".parquet"
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        entry_path = self._entry_path(key)
+        try:
+            value = pq.read_table(entry_path).to_pandas()
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        os.utime(entry_path)
+        return value
+
+    def put(self, key: str, value: pd.DataFrame) -> None:
+        self._write_entry(
+            key, lambda raw_file: value.to_parquet(raw_file, compression="zstd")
+        )
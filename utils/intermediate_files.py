@@ -0,0 +1,175 @@
+import os
+import logging
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import BigInteger, Date, DateTime, Float, Integer, SmallInteger
+
+logger = logging.getLogger("root")
+
+PARQUET = "parquet"
+CSV = "csv"
+INTERMEDIATE_FORMATS = [PARQUET, CSV]
+PARQUET_COMPRESSION = "zstd"
+
+
+def _arrow_type(column_type) -> pa.DataType:
+    if isinstance(column_type, BigInteger):
+        return pa.int64()
+    if isinstance(column_type, SmallInteger):
+        return pa.int16()
+    if isinstance(column_type, Integer):
+        return pa.int32()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        # naive timestamps are UTC, like in `database.loader`.
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def arrow_schema_for_tables(tables) -> pa.Schema:
+    """Arrow schema with the columns of the `database.tables` models, the first model
+    defining a column wins.
+    """
+    fields = {}
+    for table in tables:
+        for column in table.__table__.columns:
+            fields.setdefault(
+                column.name, pa.field(column.name, _arrow_type(column.type))
+            )
+    return pa.schema(list(fields.values()))
+
+
+def _to_arrow_array(values: pd.Series, arrow_type: pa.DataType) -> pa.Array:
+    """Converts a column to the type of its table column. Values which pandas parsed
+    differently, e.g. numeric settlement ids or dates as ISO strings, are converted
+    first. Columns which still do not fit are kept as inferred (or as strings), the
+    database parses them on load like it parses the CSV text.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # only the categories are converted, not one Python object per row.
+        codes = values.cat.codes.to_numpy()
+        categories = _to_arrow_array(
+            pd.Series(values.cat.categories, name=values.name), arrow_type
+        )
+        return pa.DictionaryArray.from_arrays(
+            pa.array(codes, mask=codes < 0), categories
+        ).dictionary_decode()
+    try:
+        return pa.array(values, type=arrow_type, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+    try:
+        if pa.types.is_string(arrow_type):
+            converted = values.astype(str).where(values.notna())
+        elif pa.types.is_timestamp(arrow_type):
+            converted = pd.to_datetime(values, utc=True)
+        elif pa.types.is_date(arrow_type):
+            converted = pd.to_datetime(values).dt.date
+        else:
+            converted = pd.to_numeric(values)
+        return pa.array(converted, type=arrow_type, from_pandas=True)
+    except (ValueError, TypeError, pa.ArrowInvalid, pa.ArrowTypeError):
+        logger.warning(
+            f"Column {values.name} does not convert to {arrow_type}, keeping its type."
+        )
+    return _inferred_arrow_array(values)
+
+
+def _inferred_arrow_array(values: pd.Series) -> pa.Array:
+    try:
+        return pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # object columns mixing e.g. numbers and strings.
+        return pa.array(values.astype(str).where(values.notna()), from_pandas=True)
+
+
+def dataframe_to_arrow(df: pd.DataFrame, tables) -> pa.Table:
+    """Arrow table of `df` typed with the columns of the given models, columns which
+    are in none of the models keep the type inferred from pandas.
+    """
+    schema = arrow_schema_for_tables(tables)
+    arrays = [
+        _to_arrow_array(df[column], schema.field(column).type)
+        if column in schema.names
+        else _inferred_arrow_array(df[column])
+        for column in df.columns
+    ]
+    return pa.Table.from_arrays(arrays, names=[str(column) for column in df.columns])
+
+
+def write_intermediate(
+    df: pd.DataFrame, path_without_extension: str, tables, file_format: str = PARQUET
+) -> str:
+    """Writes a hand-off file of the extraction scripts for the ingestors, either as
+    zstd compressed Parquet typed with the schema of the `database.tables` models or
+    as CSV. A file with the same name in the other format is removed, so ingestors
+    never read stale data. Returns the path of the written file.
+    """
+    if file_format not in INTERMEDIATE_FORMATS:
+        raise Exception(f"Unknown intermediate file format: {file_format}")
+    path = f"{path_without_extension}.{file_format}"
+    if file_format == PARQUET:
+        pq.write_table(
+            dataframe_to_arrow(df, tables), path, compression=PARQUET_COMPRESSION
+        )
+    else:
+        df.to_csv(path_or_buf=path, index=False)
+    for other_format in INTERMEDIATE_FORMATS:
+        other_path = f"{path_without_extension}.{other_format}"
+        if other_format != file_format and os.path.exists(other_path):
+            os.remove(other_path)
+    return path
+
+
+def is_intermediate_file(file_name: str) -> bool:
+    return os.path.splitext(file_name)[1].lstrip(".") in INTERMEDIATE_FORMATS
+
+
+def intermediate_file_variants(file_path: str) -> List[str]:
+    """The path of a hand-off file in every intermediate format, e.g. of the CSV file a
+    Parquet file replaced when the `--output-format` changed. Other files only have
+    their own path.
+    """
+    if not is_intermediate_file(file_path):
+        return [file_path]
+    path_without_extension = os.path.splitext(file_path)[0]
+    return [
+        f"{path_without_extension}.{file_format}"
+        for file_format in INTERMEDIATE_FORMATS
+    ]
+
+
+def find_intermediate_file(folder: str, stem: str) -> Optional[str]:
+    """Path of the hand-off file `stem` in `folder`, Parquet before CSV."""
+    for file_format in INTERMEDIATE_FORMATS:
+        path = os.path.join(folder, f"{stem}.{file_format}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_intermediate(
+    path: str, columns: Optional[List[str]] = None, **csv_kwargs
+) -> pd.DataFrame:
+    """Reads a hand-off file written by `write_intermediate` (or by hand). Only the
+    given `columns` which are in the file are read, Parquet skips the other columns
+    on disk.
+    """
+    if path.endswith(f".{PARQUET}"):
+        if columns is not None:
+            available = set(pq.read_schema(path).names)
+            columns = [
+                column for column in dict.fromkeys(columns) if column in available
+            ]
+        return pq.read_table(path, columns=columns).to_pandas()
+    return pd.read_csv(
+        path,
+        usecols=(lambda column: column in columns) if columns is not None else None,
+        **csv_kwargs,
+    )
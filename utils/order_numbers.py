@@ -0,0 +1,63 @@
+import re
+from typing import Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pa_compute
+
+# order numbers of each platform, AU numbers are the orders of the shop itself.
+ORDER_NUMBER_PATTERNS = {
+    "au": r"AU[0-9]{4,5}",
+    "real": r"REAL-ADA-[A-Z0-9]{7}",
+    "shopify": r"SHOPIFY-ADA-[0-9]{13}",
+    "amazon": r"AMZ-ADA-[0-9]{3}-[0-9]{7}-[0-9]{7}",
+    "ebay": r"EBAY-DE-ADA-[0-9]{2}-[0-9]{5}-[0-9]{5}",
+}
+# one named group per platform, a single search finds the first order number.
+ORDER_NUMBER_PATTERN = "|".join(
+    f"(?P<{platform}>{pattern})" for platform, pattern in ORDER_NUMBER_PATTERNS.items()
+)
+# the literal prefix of the order numbers of each platform, the platform of an order
+# number found by a single group is told apart by its prefix.
+ORDER_NUMBER_PREFIXES = {
+    platform: re.match(r"[A-Z-]+", pattern).group()
+    for platform, pattern in ORDER_NUMBER_PATTERNS.items()
+}
+order_number_regx = re.compile(ORDER_NUMBER_PATTERN)
+
+
+def extract_order_number(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """The first order number in `text` and its platform, None for both if there is
+    no order number.
+    """
+    match = order_number_regx.search(text)
+    if match is None:
+        return None, None
+    return match.group(), match.lastgroup
+
+
+def extract_order_numbers(values: pd.Series) -> pd.DataFrame:
+    """`extract_order_number` of each value as the columns `order_number` and
+    `platform`, e.g. of the `external_order_number` of the exports or a list of PDF
+    filenames. The values are matched by the RE2 engine of Arrow in one call instead
+    of one Python call per value.
+    """
+    strings = pa.array(
+        values.astype(str).where(values.notna()), type=pa.string(), from_pandas=True
+    )
+    # RE2 is about twice as fast when it only has to track a single capture group.
+    order_numbers = pa_compute.struct_field(
+        pa_compute.extract_regex(strings, f"(?P<order_number>{ORDER_NUMBER_PATTERN})"),
+        [0],
+    )
+    platforms = pa.nulls(len(strings), pa.string())
+    for platform, prefix in ORDER_NUMBER_PREFIXES.items():
+        platforms = pa_compute.if_else(
+            pa_compute.starts_with(order_numbers, prefix), platform, platforms
+        )
+    return pd.DataFrame(
+        {
+            "order_number": order_numbers.to_pandas(),
+            "platform": platforms.to_pandas(),
+        }
+    ).set_index(values.index)